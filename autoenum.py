@@ -5,267 +5,297 @@ Symphona LLP
 
 Enumeration and script scanning automation script
 
+Command line front end for the scan pipeline in modules.api; importing this file has
+no side effects (run main() to run it)
+
 See README.md for licensing information and credits
 
 '''
-import configparser
 import argparse
 import logging
-import time
-import datetime
-import subprocess
+import cProfile
+import sys
 import os
 
+import modules.api
+import modules.batch
 import modules.core
+import modules.distributed
 import modules.nmap
-import modules.output
-
-#Change the working directory to the main program directory just in case...
-os.chdir(os.path.dirname(os.path.realpath(__file__)))
+import modules.results
+import modules.scheduler
+import modules.slots
 
 #------------------------------------------------------------------------------
 # Configure Argparse to handle command line arguments
 #------------------------------------------------------------------------------
-desc = "Network enumeration and script scanning automation script"
-
-parser = argparse.ArgumentParser(description=desc)
-parser.add_argument('target', action='store',
-                    help='Scan target'
-)
-parser.add_argument('-c','--config',
-                    help='Configuration file. (default: config/default.cfg)',
-                    action='store', default='config/default.cfg'
-)
-parser.add_argument('-o','--output',
-                    help='Output directory (overrides default relative path: "output")',
-                    action='store', default='output'
-)
-parser.add_argument('-q','--quiet',
-                    help='Quiet scan (no service scans, nikto, etc)',
-                    action='store_true'
-)
-parser.add_argument('-d','--debug',
-                    help='Print lots of debugging statements',
-                    action="store_const",dest="loglevel",const=logging.DEBUG,
-                    default=logging.WARNING
-)
-parser.add_argument('-v','--verbose',
-                    help='Be verbose',
-                    action="store_const",dest="loglevel",const=logging.INFO
-)
-args = parser.parse_args()
-
-target = args.target
-config_file = args.config
-output_dir = args.output
-quiet = args.quiet
-
-logging.basicConfig(level=args.loglevel)
-logging.info('verbose mode enabled')
-logging.debug('Debug mode enabled')
-
-#------------------------------------------------------------------------------
-# Get general config file parameters
-#------------------------------------------------------------------------------
-modules.core.check_config(config_file)
-config = configparser.ConfigParser()
-config.read(config_file)
-
-try:
-    output_dir_info = os.path.join(output_dir, config.get("main_config", "output_dir_info"))
-    output_dir_nmap_xml = os.path.join(output_dir, config.get("main_config", "output_dir_nmap_xml"))
-    output_dir_nmap_enum = os.path.join(output_dir, config.get("main_config", "output_dir_nmap_enum"))
-    output_dir_service_info = os.path.join(output_dir, config.get("main_config", "output_dir_service_info"))
-    output_dir_target_lists = os.path.join(output_dir, config.get("main_config", "output_dir_target_lists"))
-except:
-    print("Missing required config file sections. Check running config file against provided example\n")
-    modules.core.exit_program()
-    
-#------------------------------------------------------------------------------
-# Main Program
-#------------------------------------------------------------------------------
+def build_parser():
+    desc = "Network enumeration and script scanning automation script"
+
+    parser = argparse.ArgumentParser(description=desc)
+    parser.add_argument('target', action='store', nargs='?',
+                        help='Scan target (may be omitted with --resume)'
+    )
+    parser.add_argument('-c','--config',
+                        help='Configuration file. (default: config/default.cfg)',
+                        action='store', default='config/default.cfg'
+    )
+    parser.add_argument('-o','--output',
+                        help='Output directory (overrides default relative path: "output")',
+                        action='store', default='output'
+    )
+    parser.add_argument('-q','--quiet',
+                        help='Quiet scan (no service scans, nikto, etc)',
+                        action='store_true'
+    )
+    parser.add_argument('-j','--jobs',
+                        help='Number of script scans to run at once (overrides script_concurrency in config file)',
+                        action='store', type=int
+    )
+    parser.add_argument('--shards',
+                        help='Split live host and enumeration scan targets across this many parallel nmap processes (overrides enum_shards in config file)',
+                        action='store', type=int
+    )
+    parser.add_argument('--pipeline',
+                        help='Start script scans for each host group as soon as its enumeration scans finish',
+                        action='store_true'
+    )
+    parser.add_argument('--plan-only',
+                        help='Run enumeration, then print the script scan plan instead of running script scans',
+                        action='store_true'
+    )
+    parser.add_argument('--resume',
+                        help='Resume an interrupted run with the given timestamp (e.g. 2014-01-01_12.00.00), skipping completed stages',
+                        action='store', metavar='TIMESTAMP'
+    )
+    parser.add_argument('--delta',
+                        help='Only script scan services which are new or changed since the previous run against the same target',
+                        action='store_true'
+    )
+    parser.add_argument('--stream',
+                        help='Parse scan XML one host at a time instead of loading it into a libnmap report (less memory on very large scans)',
+                        action='store_true'
+    )
+    parser.add_argument('--batch',
+                        help='Scan every target listed in this file (one per line, - for stdin) in its own output subdirectory; implies --no-prompt',
+                        action='store', metavar='FILE'
+    )
+    parser.add_argument('--batch-jobs',
+                        help='Number of batch targets to scan at once (default: 4)',
+                        action='store', type=int, default=4
+    )
+    parser.add_argument('--max-nmap',
+                        help='Maximum number of nmap processes running at once (across all targets of a batch)',
+                        action='store', type=int
+    )
+    parser.add_argument('--max-rate',
+                        help='Total packets per second shared by all running nmap scans (overrides max_rate in the config file)',
+                        action='store', type=int
+    )
+    parser.add_argument('--coordinator',
+                        help='Hand all nmap scans out to autoenum workers connecting to this address ([HOST:]PORT) instead of running them locally',
+                        action='store', metavar='ADDRESS'
+    )
+    parser.add_argument('--worker',
+                        help='Run as a worker for the coordinator at HOST:PORT; -j sets the number of scans run at once',
+                        action='store', metavar='ADDRESS'
+    )
+    parser.add_argument('--token',
+                        help='Shared token for --coordinator / --worker (default: AUTOENUM_TOKEN environment variable; generated by the coordinator if unset)',
+                        action='store', default=os.environ.get("AUTOENUM_TOKEN")
+    )
+    parser.add_argument('--no-prompt',
+                        help='Never prompt; questions not answered by the options below get their default answer',
+                        action='store_true'
+    )
+    parser.add_argument('--allow-non-root',
+                        help='Continue without asking when not running as root',
+                        action='store_true'
+    )
+    parser.add_argument('--clean',
+                        help='Delete the existing contents of a non-empty output directory (default: ask, or no with --no-prompt)',
+                        action='store', choices=['ask', 'yes', 'no'], default='ask'
+    )
+    parser.add_argument('--nikto',
+                        help='Run Nikto against detected web hosts (overrides nikto in config file; ask is answered yes with --no-prompt)',
+                        action='store', choices=['ask', 'yes', 'no']
+    )
+    parser.add_argument('--profile',
+                        help='Dump cProfile statistics for the main thread to the info output directory',
+                        action='store_true'
+    )
+    parser.add_argument('-d','--debug',
+                        help='Print lots of debugging statements',
+                        action="store_const",dest="loglevel",const=logging.DEBUG,
+                        default=logging.WARNING
+    )
+    parser.add_argument('-v','--verbose',
+                        help='Be verbose',
+                        action="store_const",dest="loglevel",const=logging.INFO
+    )
+
+    return parser
+
+def caller_paths(parser, args, names):
+    '''
+    Makes the file / directory arguments given on the command line absolute, relative to the
+    directory autoenum was started from; defaults stay relative to the program directory
+    '''
+    for name in names:
+        value = getattr(args, name)
+        if value and value != "-" and value != parser.get_default(name):
+            setattr(args, name, os.path.abspath(value))
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    program_dir = os.path.dirname(os.path.realpath(__file__))
+
+    #Searching the results of earlier runs (autoenum.py query -h) needs none of the scan setup
+    if argv[:1] == ["query"]:
+        os.chdir(program_dir)
+        return modules.results.query_main(argv[1:])
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    caller_paths(parser, args, ("config", "output", "batch"))
+
+    #Change the working directory to the main program directory just in case...
+    os.chdir(program_dir)
+    if args.batch and (args.target or args.resume):
+        parser.error("--batch cannot be combined with a scan target or --resume")
+    if args.worker and (args.target or args.resume or args.batch or args.coordinator):
+        parser.error("--worker takes no scan target and cannot be combined with --resume, --batch or --coordinator")
+    if args.coordinator and args.batch:
+        parser.error("--coordinator cannot be combined with --batch")
+    if args.worker and not args.token:
+        parser.error("--worker needs the coordinator's --token")
+    if not args.target and not args.resume and not args.batch and not args.worker:
+        parser.error("a scan target is required unless resuming a previous run or using --batch / --worker")
+
+    config_file = args.config
+    output_dir = args.output
+    quiet = args.quiet
+    stream = args.stream
+    plan_only = args.plan_only
+    delta_mode = args.delta
+
+    #Prompts are answered by policy flags; without a terminal to ask at (--no-prompt / --batch)
+    #every question left at "ask" gets its default answer
+    no_prompt = args.no_prompt or bool(args.batch)
+    def prompt_policy(policy, default):
+        return default if policy == "ask" and no_prompt else policy
+    clean_policy = prompt_policy(args.clean, "no")
+    root_policy = "yes" if args.allow_non_root else prompt_policy("ask", "no")
+
+    logging.basicConfig(level=args.loglevel)
+    logging.info('verbose mode enabled')
+    logging.debug('Debug mode enabled')
 
-#Wait a sec for debug messages to display
-time.sleep(1)
-
-#Check target input
-if "," in target:
-    print("Commas found in input target list and will not parse correctly in libnmap")
-    modules.core.exit_program()
-
-#Check root
-if os.getuid()!=0:
-    print("Script not running as root...this breaks stuff with nmap...")
-    response = input("Are you sure you wish to continue?!? [no]")
-    if "y" in response or "Y" in response:
-        pass
-    else:
+    #------------------------------------------------------------------------------
+    # Get general config file parameters
+    #------------------------------------------------------------------------------
+    modules.core.check_config(config_file)
+    try:
+        config = modules.api.load_config(config_file)
+        settings = modules.api.ScanSettings(config, jobs=args.jobs, shards=args.shards, max_rate=args.max_rate)
+    except modules.api.AutoenumError as exception:
+        print(str(exception) + "\n")
         modules.core.exit_program()
+    modules.distributed.lease_timeout = settings.worker_lease_timeout
 
-is_output_dir_clean = modules.core.cleanup_routine(output_dir)
-
-timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H.%M.%S")
-
-# Log scan info to history file
-if os.path.exists(os.path.join(output_dir_info, "scan_history.csv")):
-    output_text = ""
-else:
-    output_text = "Timestamp,Scan Target,Config\n"
-    
-output_text += timestamp + "," + target + "," + config_file + "\n"
-modules.output.write_outfile(output_dir_info, "scan_history.csv", output_text)
-
-#------------------------------------------------------------------------------
-# Live host detection scan
-
-if os.getuid()!=0:
-    logging.warn("Script not running as root which prevents proper live host detection...")
-    logging.warn("We will continue and scan all targets, but you should really re-run as root!")
-else:
-    print("Scanning for live hosts in specified target range...")
-    scan_options = config.get("scan_config", "live_hosts")
-    live_host_scan = modules.nmap.run_nmap_scan(target, scan_options)
-    
-    outfile_name = "nmap_live_host_scan_"+timestamp
-    modules.nmap.nmap_out_to_html(live_host_scan, output_dir_nmap_enum, outfile_name+".html")
-    modules.output.write_outfile(output_dir_nmap_xml, outfile_name+".xml", live_host_scan.stdout)
-    
-    live_hosts = modules.nmap.nmap_parse_live_hosts(live_host_scan.stdout)
-    logging.debug(live_hosts)
-
-    modules.output.write_target_list(live_hosts, os.path.join(output_dir,"target_lists"))
-    target = live_hosts
+    #Nikto can be enabled / disabled in the config file; --nikto overrides it
+    nikto_policy = prompt_policy(args.nikto or settings.nikto, "yes")
 
-#------------------------------------------------------------------------------
-# Service enumeration scan
-
-print("Performing initial enumeration scan on live hosts...")
-
-scan_options = config.get("scan_config", "tcp_enum")
-tcp_enum_scan = modules.nmap.run_nmap_scan(target, scan_options)
-scan_output = tcp_enum_scan.stdout
-outfile_name = "nmap_tcp_enum_scan_"+timestamp
-modules.nmap.nmap_out_to_html(tcp_enum_scan, output_dir_nmap_enum, outfile_name+".html")
-modules.output.write_outfile(output_dir_nmap_xml, outfile_name+".xml", tcp_enum_scan.stdout)
-
-hosts = modules.nmap.nmap_parse_ports_by_host(scan_output)
-ports = modules.nmap.nmap_parse_hosts_by_port(scan_output)
-webhosts = modules.nmap.nmap_parse_webhosts(scan_output)
-
-scan_options = config.get("scan_config", "udp_enum")
-udp_enum_scan = modules.nmap.run_nmap_scan(target, scan_options)
-scan_output = udp_enum_scan.stdout
-outfile_name = "nmap_udp_enum_scan_"+timestamp
-modules.nmap.nmap_out_to_html(udp_enum_scan, output_dir_nmap_enum, outfile_name+".html")
-modules.output.write_outfile(output_dir_nmap_xml, outfile_name+".xml", udp_enum_scan.stdout)
-
-hosts.update(modules.nmap.nmap_parse_ports_by_host(scan_output))
-ports.update(modules.nmap.nmap_parse_hosts_by_port(scan_output))
-
-logging.debug(hosts)
-logging.debug(ports)
-logging.debug(webhosts)
-
-modules.output.write_target_lists_by_port(ports, output_dir_target_lists)
-modules.output.write_outfile(output_dir_target_lists, "all_webhosts.txt", webhosts)
-
-if not quiet:
     #------------------------------------------------------------------------------
-    # Nmap script scans
-
-    #Loop through script scan config file sections and perform script scans
-    for section in config.sections():
-        #skip over to the script scan sections
-        if section == "scan_config" or section == "main_config":
-            pass
-        else:
-            scan_options = config.get("scan_config","script")
-            config_ports = config.get(section, "ports")
-            config_scripts = config.get(section, "scripts")
-            if config.has_option(section, "scan_args"):
-                config_scan_args = config.get(section, "scan_args")
-            else: config_scan_args = ""
-            if config.has_option(section, "script_args"):
-                config_script_args = config.get(section, "script_args")
-            else: config_script_args = ""
-        
-            target_list = []
-            
-            for config_port in map(int,config_ports.split(",")):    #convert ports from to int using map function
-                logging.debug(config_port)
-
-                #Loop through the port dictionary and look for each port from the service scan config. If
-                #present, then add all hosts associated to the target list for this service scan
-                for key,value in ports.items():
-                    if config_port in key:
-                        for host in ports[key]:
-                            logging.debug(host)
-                            target_list.append(host)
-            target_list = list(set(target_list))                    #convert list to set and back to remove duplicates
-            logging.debug(target_list)
-            
-            if target_list:
-                #Target list is not empty - proceed with script scan
-                print("Script scanning from config file section " + section + "...\n")
-                        
-                
-                if config_scan_args:
-                    scan_options += " " + config_scan_args
-                scan_options += " -p"+config_ports
-                scan_options += " --script "+config_scripts
-                if config_script_args:
-                    scan_options += " --script-args "+config_script_args
-                
-                script_scan = modules.nmap.run_nmap_scan(target_list, scan_options)
-                
-                outfile_name = section+"_"+timestamp
-                modules.nmap.nmap_out_to_html(script_scan, output_dir_service_info, outfile_name+".html")
-                modules.output.write_outfile(output_dir_nmap_xml, outfile_name+".xml", script_scan.stdout)
-                
-            else:
-                print("No "+section+" services found during enumeration scan...skipping...\n")
-
-
+    # Main Program
     #------------------------------------------------------------------------------
-    # Other scans
-
-    if webhosts:
-        run_nikto_scan =input("\nWebhosts detected - run Nikto scan? [yes] ")
-        if "n" in run_nikto_scan or "N" in run_nikto_scan:
-            pass
-        else:
-            path = output_dir_service_info
-            if not os.path.exists(path):
-                os.makedirs(path)
-            try:
-                p1 = subprocess.Popen(['echo', webhosts], stdout=subprocess.PIPE) #Set up the echo command and direct the output to a pipe
-                p2 = subprocess.Popen(['nikto','-h', '-', '-o' , os.path.join(path, "http-nikto_"+timestamp+".html")], stdin=p1.stdout) #send p1's output to p2
-                p1.stdout.close() #make sure we close the output so p2 doesn't hang waiting for more input
-                output = p2.communicate()[0] #run our commands
-            except KeyboardInterrupt:
-                print("Keyboard Interrupt - Nikto Scan Operation Killed")
-            except:
-                print("Nikto could not be executed - ensure it is installed and in your path")
-
-
-#------------------------------------------------------------------------------
-# Wrap it all up
-
-#Write html index of all output files
-modules.output.write_html_index(output_dir, config)
-
-#If output directory has old scans in it, merge target lists to prevent duplicates
-if is_output_dir_clean == False:
-    list_dir = output_dir_target_lists
-    for fname in os.listdir(list_dir):
-        output_text = ""
-        fpath = os.path.join(list_dir, fname)
-        lines = open(fpath,'r').read().splitlines()
-        unique_lines = sorted(set(lines))
-        for line in unique_lines:
-            output_text += line + "\n"
-        os.remove(fpath)
-        modules.output.write_outfile(list_dir, fname, output_text)
 
-#This is the end...beautiful friend...the end...
-print("\nOutput files located at " + output_dir + " with timestamp " + timestamp)
+    #Check root
+    if os.getuid()!=0:
+        print("Script not running as root...this breaks stuff with nmap...")
+        if not modules.core.confirm("Are you sure you wish to continue?!? [no]", root_policy):
+            if no_prompt:
+                print("Use --allow-non-root to continue anyway")
+            modules.core.exit_program()
+
+    #Worker mode - run scans handed out by a coordinator until it goes away
+    if args.worker:
+        if args.max_nmap:
+            modules.nmap.limit_nmap_processes(modules.slots.NmapSlots(os.path.join(output_dir, ".nmap_slots"), args.max_nmap))
+        modules.nmap.set_rate_budget(modules.api.rate_budget(settings))
+        modules.distributed.run_worker(args.worker, args.token, args.jobs or 1)
+        return 0
+
+    #Batch mode - run every target as its own unattended autoenum process and exit
+    if args.batch:
+        try:
+            batch_targets = modules.batch.read_targets(args.batch)
+        except (OSError, UnicodeDecodeError) as exception:
+            print("Unable to read batch target file " + args.batch + ": " + str(exception))
+            modules.core.exit_program()
+        if not batch_targets:
+            print("No targets found in " + args.batch)
+            modules.core.exit_program()
+        command = [sys.executable, os.path.realpath(__file__), "-c", os.path.abspath(config_file), "--no-prompt",
+                   "--allow-non-root", "--clean", clean_policy, "--nikto", nikto_policy]
+        for flag, enabled in (("--quiet", quiet), ("--pipeline", args.pipeline), ("--plan-only", plan_only),
+                              ("--delta", delta_mode), ("--stream", stream), ("--profile", args.profile),
+                              ("--debug", args.loglevel == logging.DEBUG), ("--verbose", args.loglevel == logging.INFO)):
+            if enabled:
+                command.append(flag)
+        #each target running at once gets an equal part of the packet rate ceiling
+        batch_rate = max(1, settings.max_rate // max(1, args.batch_jobs)) if settings.max_rate > 0 else None
+        for flag, value in (("--jobs", args.jobs), ("--shards", args.shards), ("--max-rate", batch_rate)):
+            if value:
+                command += [flag, str(value)]
+        nmap_slots = None
+        if args.max_nmap:
+            nmap_slots = modules.slots.NmapSlots(os.path.join(os.path.abspath(output_dir), ".nmap_slots"), args.max_nmap)
+        batch = modules.batch.run_batch(batch_targets, output_dir, command, args.batch_jobs, nmap_slots)
+        print("\nCombined index of %d target(s) written to %s" % (len(batch), os.path.join(output_dir, "index.html")))
+        return 0 if all(entry['status'] == 'complete' for entry in batch) else 1
+
+    #nmap process limit, either shared with the other targets of a batch or for this run only
+    if args.max_nmap:
+        modules.nmap.limit_nmap_processes(modules.slots.NmapSlots(os.path.join(output_dir, ".nmap_slots"), args.max_nmap))
+    else:
+        modules.nmap.limit_nmap_processes(modules.slots.slots_from_env())
+
+    #All nmap scans are run by remote workers in distributed mode; the scan output comes back
+    #to this process and is written out as usual
+    coordinator = None
+    if args.coordinator:
+        coordinator = modules.distributed.start_coordinator(args.coordinator, args.token)
+        modules.scheduler.use_coordinator(coordinator)
+
+    run = modules.api.AutoenumRun(args.target, output_dir, config, settings, config_file=config_file, quiet=quiet,
+                                  pipeline=args.pipeline, plan_only=plan_only, delta=delta_mode, stream=stream,
+                                  resume=args.resume, clean=clean_policy, nikto=nikto_policy,
+                                  confirm=modules.core.confirm)
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run.run()
+    except modules.api.AutoenumError as exception:
+        print(exception)
+        modules.core.exit_program()
+    finally:
+        if coordinator:
+            coordinator.close()
+
+    print("\nRun profile written to " + run.run_profile.path)
+    if profiler:
+        profiler.disable()
+        profile_path = os.path.join(run.output_dir_info, "profile_"+run.timestamp+".pstats")
+        profiler.dump_stats(profile_path)
+        print("Python profile written to " + profile_path + " (view with: python -m pstats <file>)")
+
+    #This is the end...beautiful friend...the end...
+    print("\nOutput files located at " + output_dir + " with timestamp " + run.timestamp)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+HTML report rendering benchmark
+
+Compares the in-process renderer (modules.render) with the original xsltproc path
+on synthetic scans with script output. The xsltproc runs are skipped if xsltproc or
+the nmap stylesheet are not installed.
+
+usage: python -m benchmarks.bench_render [max_hosts]
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import nmap_xml_file, STYLESHEET
+from modules.nmap import nmap_xml_to_html_xsltproc
+from modules.render import render_nmap_html
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def main(max_hosts=10000):
+    have_xsltproc = shutil.which("xsltproc") and os.path.exists(STYLESHEET.replace("file://", ""))
+    if not have_xsltproc:
+        print("xsltproc or nmap stylesheet not found - only timing the native renderer\n")
+    sizes = [size for size in (100, 1000, 10000, 100000) if size <= max_hosts]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print("%10s %12s %12s %10s" % ("hosts", "native (s)", "xsltproc (s)", "speedup"))
+        for size in sizes:
+            path = os.path.join(tmpdir, "scan_%d.xml" % size)
+            nmap_xml_file(path, hosts=size, ports_per_host=4, scripts_per_port=2)
+            native = timed(lambda: render_nmap_html(path, os.path.join(tmpdir, "native.html")))
+            if have_xsltproc:
+                with open(path) as xml_file:
+                    xml_text = xml_file.read()
+                xslt = timed(lambda: nmap_xml_to_html_xsltproc(xml_text, tmpdir, "xslt.html"))
+                print("%10d %12.2f %12.2f %9.1fx" % (size, native, xslt, xslt / native))
+            else:
+                print("%10d %12.2f %12s %10s" % (size, native, "-", "-"))
+            os.remove(path)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
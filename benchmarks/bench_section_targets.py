@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Micro-benchmark for matching script scan config sections to target hosts
+
+Builds a synthetic hosts-by-port dict and times resolving the targets of every
+section in the example config with the (port, protocol) lookups used by
+modules.sections.section_targets against the previous nested loop over every
+port key.
+
+usage: python -m benchmarks.bench_section_targets [hosts]
+
+See README.md for licensing information and credits
+
+'''
+
+import configparser
+import random
+import sys
+import time
+
+from benchmarks.synthetic import COMMON_PORTS, host_address
+from modules.sections import script_sections, section_spec, section_options, section_protocols, section_targets
+
+CONFIG_FILE = "config/default.example"
+
+def synthetic_ports(hosts, ports_per_host=4, high_ports=2, seed=0):
+    '''
+    Returns a nmap_parse_hosts_by_port style dict for the number of hosts; each host has
+    some common service ports plus a few random high ports, as with full port scans
+    '''
+    rand = random.Random(seed)
+    ports = {}
+    for index in range(hosts):
+        address = host_address(index)
+        for port, protocol, name in rand.sample(COMMON_PORTS, ports_per_host):
+            ports.setdefault((port, protocol), []).append(address)
+        for count in range(high_ports):
+            ports.setdefault((rand.randint(1024, 65535), rand.choice(('tcp', 'udp'))), []).append(address)
+    return ports
+
+def loop_targets(config_ports, ports):
+    '''The previous section target loop, for comparison'''
+    target_list = []
+    for config_port in map(int,config_ports.split(",")):
+        for key,value in ports.items():
+            if config_port in key:
+                for host in ports[key]:
+                    target_list.append(host)
+    return list(set(target_list))
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def main(hosts=50000):
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    base_options = config.get("scan_config", "script")
+    specs = [section_spec(config, section) for section in script_sections(config)]
+    ports = synthetic_ports(hosts)
+
+    def resolve_index():
+        return [section_targets(spec['ports'], ports, section_protocols(section_options(base_options, spec)))
+                for spec in specs]
+    def resolve_loop():
+        return [loop_targets(spec['ports'], ports) for spec in specs]
+
+    indexed, index_seconds = timed(resolve_index)
+    looped, loop_seconds = timed(resolve_loop)
+
+    print("%d hosts, %d (port, protocol) keys, %d sections" % (hosts, len(ports), len(specs)))
+    print("%-10s %10s %14s" % ("method", "seconds", "total targets"))
+    print("%-10s %10.3f %14d" % ("index", index_seconds, sum(map(len, indexed))))
+    print("%-10s %10.3f %14d" % ("loop", loop_seconds, sum(map(len, looped))))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
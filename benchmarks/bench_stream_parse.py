@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Memory benchmark for the streaming nmap XML parser
+
+Generates synthetic scans of increasing size and records the peak Python heap
+(tracemalloc) while indexing them the ways a run does: ScanIndex with --stream (host
+records from modules.nmapxml), ScanIndex without it (libnmap NmapReport, measured at
+the smaller sizes only) and CompactScanIndex (compact_index). Streaming removes the
+cost of the parsed document, but the index itself still grows with the scan; the
+bare record reader is included as the floor.
+
+usage: python -m benchmarks.bench_stream_parse [max_hosts]
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import nmap_xml_file
+from modules.compact import CompactScanIndex
+from modules.nmap import ScanIndex
+from modules.nmapxml import iter_host_records
+
+DOM_MAX_HOSTS = 10000
+
+def measure(function):
+    '''Returns (peak heap bytes, elapsed seconds) for a call to function'''
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, elapsed
+
+def record_count(path):
+    count = 0
+    for record in iter_host_records(path):
+        count += 1
+    return count
+
+def mib(peak):
+    return "%.1f MiB" % (peak / 1048576.0)
+
+def main(max_hosts=100000):
+    sizes = [size for size in (1000, 10000, 100000, 1000000) if size <= max_hosts]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print("%10s %12s %16s %10s %16s %16s" % ("hosts", "records", "--stream index", "seconds",
+                                                "libnmap index", "compact index"))
+        for size in sizes:
+            path = os.path.join(tmpdir, "scan_%d.xml" % size)
+            nmap_xml_file(path, hosts=size)
+            records_peak = measure(lambda: record_count(path))[0]
+            stream_peak, elapsed = measure(lambda: ScanIndex(path, stream=True))
+            compact_peak = measure(lambda: CompactScanIndex(path))[0]
+            if size <= DOM_MAX_HOSTS:
+                dom_peak = mib(measure(lambda: ScanIndex(path))[0])
+            else:
+                dom_peak = "skipped"
+            print("%10d %12s %16s %10.2f %16s %16s" % (size, mib(records_peak), mib(stream_peak), elapsed,
+                                                       dom_peak, mib(compact_peak)))
+            os.remove(path)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Benchmark suite runner for autoenum
+
+Times the scan output parsers, target list and HTML index writers, report rendering
+and a full autoenum.py run against the stand-in nmap / xsltproc / nikto executables
+in benchmarks/fakebin, all on synthetic scan data (see benchmarks.synthetic).
+
+Results are saved as JSON in benchmarks/results, named after the git revision and
+time of the run, and compared with the previous results file so regressions between
+versions stand out.
+
+usage: python -m benchmarks.run [--hosts N] [--quick] [--suite NAME ...] [--compare FILE]
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tracemalloc
+import tempfile
+import subprocess
+import configparser
+
+from benchmarks.synthetic import nmap_xml_file, host_address, host_ports
+import modules.nmap
+import modules.output
+import modules.render
+import modules.sections
+import modules.state
+import modules.manifest
+from modules.targets import TargetStore
+from modules.results import ResultStore, query
+from modules.compact import CompactScanIndex
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FAKEBIN_DIR = os.path.join(BENCH_DIR, "fakebin")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+CONFIG_FILE = os.path.join(REPO_DIR, "config", "default.example")
+
+#slowdown (as a fraction of the previous time) reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+def timed(function, repeat=1):
+    '''Returns the best wall clock time of repeat calls to function'''
+    best = None
+    for count in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+#-----------------------------------------------------------
+# Benchmark suites - each returns a dict of benchmark name -> seconds
+
+def bench_parse(tmpdir, hosts, repeat):
+    path = os.path.join(tmpdir, "parse.xml")
+    nmap_xml_file(path, hosts=hosts, ports_per_host=4)
+    results = {}
+    for stream in (False, True):
+        name = "stream" if stream else "dom"
+        results["scan_index_" + name] = timed(lambda: modules.nmap.ScanIndex(path, stream=stream), repeat)
+    index = modules.nmap.ScanIndex(path, stream=True)
+    for function in (modules.nmap.nmap_parse_ports_by_host, modules.nmap.nmap_parse_hosts_by_port,
+                     modules.nmap.nmap_parse_webhosts, modules.nmap.nmap_parse_live_hosts):
+        results[function.__name__] = timed(lambda: function(path), repeat)
+        results[function.__name__ + "_indexed"] = timed(lambda: function(index), repeat)
+    return results
+
+def bench_target_lists(tmpdir, hosts, repeat):
+    path = os.path.join(tmpdir, "targets.xml")
+    nmap_xml_file(path, hosts=hosts, ports_per_host=4)
+    ports = modules.nmap.nmap_parse_hosts_by_port(path)
+    results = {}
+
+    def write_lists():
+        target_dir = os.path.join(tmpdir, "lists")
+        shutil.rmtree(target_dir, ignore_errors=True)
+        os.makedirs(target_dir)
+        modules.output.write_target_lists_by_port(ports, target_dir)
+    results["write_target_lists_by_port"] = timed(write_lists, repeat)
+
+    store_dir = os.path.join(tmpdir, "store")
+    def store_lists():
+        shutil.rmtree(store_dir, ignore_errors=True)
+        store = TargetStore(os.path.join(store_dir, "info"), os.path.join(store_dir, "lists"))
+        store.add_hosts_by_port(ports)
+        store.export()
+        store.close()
+    results["target_store_export"] = timed(store_lists, repeat)
+
+    def store_unchanged():
+        store = TargetStore(os.path.join(store_dir, "info"), os.path.join(store_dir, "lists"))
+        store.add_hosts_by_port(ports)
+        store.export()
+        store.close()
+    results["target_store_export_unchanged"] = timed(store_unchanged, repeat)
+    return results
+
+def bench_html_index(tmpdir, hosts, repeat):
+    '''Index over one run per 100 hosts of scale, each with a handful of reports'''
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    output_dir = os.path.join(tmpdir, "index")
+    output_dir_info = os.path.join(output_dir, config.get("main_config", "output_dir_info"))
+    os.makedirs(output_dir_info)
+    run_state = modules.manifest.open_manifest(modules.state.open_run_state(output_dir_info))
+    modules.manifest.import_existing_output(run_state, output_dir, output_dir_info, {})
+    runs = max(1, hosts // 100)
+    timestamps = ["2026-01-01_00.00.00"]
+    for number in range(runs):
+        timestamp = time.strftime("%Y-%m-%d_%H.%M.%S", time.gmtime(1767225600 + number * 3600))
+        timestamps.append(timestamp)
+        modules.state.record_run(run_state, timestamp, host_address(number) + "/24", CONFIG_FILE)
+        for kind, directory, names in ((modules.manifest.ENUM_REPORTS, "nmap_enum", ("tcp", "udp")),
+                                       (modules.manifest.SERVICE_REPORTS, "service_info", ("http", "smb", "ssh"))):
+            for name in names:
+                modules.manifest.record_artifact(run_state, timestamp, kind,
+                                                 directory + "/" + name + "_" + timestamp + ".html")
+
+    results = {}
+    results["write_html_index_first"] = timed(
+        lambda: modules.output.write_html_index(output_dir, config, run_state, timestamps[-1]))
+    results["write_html_index"] = timed(
+        lambda: modules.output.write_html_index(output_dir, config, run_state, timestamps[-1]), repeat)
+    run_state.close()
+    return results
+
+def bench_render(tmpdir, hosts, repeat):
+    path = os.path.join(tmpdir, "render.xml")
+    nmap_xml_file(path, hosts=hosts, ports_per_host=3, scripts_per_port=2)
+    scan = modules.nmap.NmapResult.from_xml(path, command="nmap -sV")
+    html_dir = os.path.join(tmpdir, "html")
+    os.makedirs(html_dir)
+    modules.render.start_render_pool()
+
+    def render():
+        modules.nmap.nmap_out_to_html(scan, html_dir, "render")
+        modules.render.wait_for_renders()
+    return {"nmap_out_to_html": timed(render, repeat)}
+
+def bench_results(tmpdir, hosts, repeat):
+    '''Loading script scan output into the results database, and indexed lookups on it'''
+    path = os.path.join(tmpdir, "results.xml")
+    nmap_xml_file(path, hosts=hosts, ports_per_host=4, scripts_per_port=2)
+    store = ResultStore(os.path.join(tmpdir, "results"))
+    results = {"results_ingest": timed(lambda: store.ingest("run", "script:bench", path), repeat)}
+    for name, filters in (("script", {'script': "ssh-info-0"}), ("host", {'host': host_address(hosts // 2)}),
+                          ("port", {'port': 21, 'script': "ftp-*"})):
+        results["results_query_" + name] = timed(lambda: list(query(store.conn, **filters)), repeat)
+    store.close()
+    return results
+
+def bench_compact(tmpdir, hosts, repeat):
+    '''
+    ScanIndex against CompactScanIndex on hosts * 100 open host-port pairs (1M at the
+    default scale): building the index, merging two halves (as with TCP and UDP results),
+    section targeting and listing the hosts of every port (as written to the target lists);
+    *_mb results are the memory held by the built index
+    '''
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    records = []
+    pairs = 0
+    while pairs < hosts * 100:
+        address = host_address(len(records))
+        open_ports = [(port, proto) for port, proto, service in host_ports(address, ("tcp", "udp"), ports_per_host=4)]
+        web_ports = [port for port, proto, service in host_ports(address, ports_per_host=4) if service[:4] == "http"]
+        records.append({'address': address, 'open_ports': open_ports, 'web_ports': web_ports})
+        pairs += len(open_ports)
+    half = len(records) // 2
+
+    results = {}
+    for name, index_class in (("dict", lambda: modules.nmap.ScanIndex()), ("compact", CompactScanIndex)):
+        def build(part=records):
+            index = index_class()
+            index.add_records(part)
+            return index
+        results["build_" + name] = timed(build, repeat)
+        results["merge_" + name] = timed(lambda: build(records[:half]).merge(build(records[half:])), repeat)
+        index = build()
+        results["section_targets_" + name] = timed(lambda: modules.sections.build_section_jobs(config, index.ports, False),
+                                                   repeat)
+        results["host_lists_" + name] = timed(lambda: [len(hosts) for port, hosts in index.ports.items()], repeat)
+        del index
+        tracemalloc.start()
+        index = build()
+        index.live_hosts if name == "dict" else index.live.values   #sorted arrays are built on first use
+        results["index_memory_mb_" + name] = tracemalloc.get_traced_memory()[0] / 1048576.0
+        tracemalloc.stop()
+        del index
+    return results
+
+def bench_pipeline(tmpdir, hosts, repeat):
+    '''
+    Full autoenum.py runs against the stand-in executables, in the default batch flow and
+    with --pipeline; the target network is sized to the host scale (at least a /28)
+    '''
+    prefix = 32 - max(4, (max(hosts, 16) - 1).bit_length())
+    target = "10.0.0.0/%d" % prefix
+    env = dict(os.environ, PATH=FAKEBIN_DIR + os.pathsep + os.environ.get("PATH", ""))
+    env.setdefault("FAKE_NMAP_DELAY", "0.1")
+    env.setdefault("FAKE_NIKTO_DELAY", "0.01")
+    results = {}
+    for mode, extra_args in (("batch", []), ("pipeline", ["--pipeline"])):
+        def run():
+            output_dir = os.path.join(tmpdir, "pipeline_" + mode)
+            shutil.rmtree(output_dir, ignore_errors=True)
+            process = subprocess.run([sys.executable, os.path.join(REPO_DIR, "autoenum.py"), target,
+                                      "-o", output_dir, "-c", CONFIG_FILE] + extra_args,
+                                     cwd=REPO_DIR, env=env, input=b"y\ny\n",
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if process.returncode != 0:
+                raise RuntimeError("autoenum.py failed: " + process.stderr.decode(errors="replace")[-2000:])
+        results["autoenum_" + mode] = timed(run, repeat)
+    return results
+
+SUITES = {
+    "parse": bench_parse,
+    "target_lists": bench_target_lists,
+    "html_index": bench_html_index,
+    "render": bench_render,
+    "results": bench_results,
+    "compact": bench_compact,
+    "pipeline": bench_pipeline,
+}
+
+#-----------------------------------------------------------
+# Stored results
+
+def previous_results(results_dir=RESULTS_DIR):
+    '''Returns the path of the most recent results file in results_dir, if any'''
+    if not os.path.exists(results_dir):
+        return None
+    paths = [os.path.join(results_dir, name) for name in os.listdir(results_dir) if name.endswith(".json")]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+def compare(results, baseline):
+    '''Prints the change in time for every benchmark also in the baseline results'''
+    if baseline['params'] != results['params']:
+        print("\nParameters differ from the previous run %s (%s) - not compared" %
+              (baseline['revision'], baseline['params']))
+        return []
+    regressions = []
+    print("\nCompared with %s (%s):\n" % (baseline['revision'], baseline['timestamp']))
+    print("%-42s %10s %10s %8s" % ("benchmark", "before", "after", "change"))
+    for suite, timings in results['suites'].items():
+        before_timings = baseline['suites'].get(suite, {})
+        for name, seconds in timings.items():
+            before = before_timings.get(name)
+            if before is None:
+                continue
+            change = (seconds - before) / before if before else 0.0
+            flag = ""
+            if change > REGRESSION_THRESHOLD:
+                flag = "  [!] regression"
+                regressions.append(suite + "." + name)
+            print("%-42s %10.3f %10.3f %+7.0f%%%s" % (suite + "." + name, before, seconds, change * 100, flag))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="autoenum benchmark suite")
+    parser.add_argument('--hosts', type=int, default=10000,
+                        help='Host scale for the synthetic scans (default 10000)')
+    parser.add_argument('--quick', action='store_true',
+                        help='Small scale, single repetition run for a fast check')
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES),
+                        help='Run only the named suite(s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Repetitions per benchmark; the best time is kept (default 3)')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='Results file to compare against (default: the previous run)')
+    parser.add_argument('--no-save', action='store_true',
+                        help='Do not store the results')
+    parser.add_argument('--results-dir', default=RESULTS_DIR,
+                        help='Directory results are stored in and compared from (default: benchmarks/results, '
+                             'which is ignored by git)')
+    args = parser.parse_args()
+
+    hosts = 500 if args.quick else args.hosts
+    repeat = 1 if args.quick else args.repeat
+    suites = args.suite or list(SUITES)
+
+    results = {
+        'revision': git_revision(),
+        'timestamp': time.strftime("%Y-%m-%d_%H.%M.%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'hosts': hosts, 'repeat': repeat},
+        'suites': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for suite in suites:
+            print("Running %s benchmarks (%d hosts)..." % (suite, hosts))
+            suite_dir = os.path.join(tmpdir, suite)
+            os.makedirs(suite_dir)
+            timings = SUITES[suite](suite_dir, hosts, repeat)
+            results['suites'][suite] = timings
+            for name, seconds in timings.items():
+                print("  %-40s %10.3f %s" % (name, seconds, "MB" if "_mb" in name else "s"))
+
+    baseline_path = args.compare or previous_results(args.results_dir)
+    regressions = []
+    if baseline_path:
+        with open(baseline_path) as baseline_file:
+            regressions = compare(results, json.load(baseline_file))
+
+    if not args.no_save:
+        if not os.path.exists(args.results_dir):
+            os.makedirs(args.results_dir)
+        path = os.path.join(args.results_dir, "%s_%s.json" % (results['revision'], results['timestamp']))
+        with open(path, 'w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+        print("\nResults saved to " + os.path.relpath(path))
+
+    if regressions:
+        print("\n[!] %d benchmark(s) more than %d%% slower: %s" %
+              (len(regressions), REGRESSION_THRESHOLD * 100, ", ".join(regressions)))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Synthetic nmap XML generator for autoenum benchmarks
+
+See README.md for licensing information and credits
+
+'''
+
+import random
+import zlib
+import ipaddress
+
+COMMON_PORTS = [(21, 'tcp', 'ftp'), (22, 'tcp', 'ssh'), (23, 'tcp', 'telnet'), (25, 'tcp', 'smtp'),
+                (53, 'udp', 'domain'), (80, 'tcp', 'http'), (111, 'tcp', 'rpcbind'),
+                (135, 'tcp', 'msrpc'), (137, 'udp', 'netbios-ns'), (139, 'tcp', 'netbios-ssn'),
+                (161, 'udp', 'snmp'), (443, 'tcp', 'https'), (445, 'tcp', 'microsoft-ds'),
+                (1433, 'tcp', 'ms-sql-s'), (3306, 'tcp', 'mysql'), (3389, 'tcp', 'ms-wbt-server'),
+                (5900, 'tcp', 'vnc'), (8080, 'tcp', 'http-proxy'), (8443, 'tcp', 'https-alt')]
+
+def host_address(index, base=(10 << 24)):
+    '''Returns the dotted IPv4 address for the index'th synthetic host'''
+    value = base + index
+    return "%d.%d.%d.%d" % (value >> 24 & 255, value >> 16 & 255, value >> 8 & 255, value & 255)
+
+STYLESHEET = "file:///usr/share/nmap/nmap.xsl"
+
+def write_nmap_xml(outfile, hosts=1000, ports_per_host=3, down_ratio=0.1, scripts_per_port=0, seed=0):
+    '''
+    Writes nmap-style XML output for the requested number of hosts to an open text
+    file; hosts are generated one at a time so the document never sits in memory
+    '''
+    rand = random.Random(seed)
+    outfile.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    outfile.write('<?xml-stylesheet href="%s" type="text/xsl"?>\n' % STYLESHEET)
+    outfile.write('<nmaprun scanner="nmap" args="nmap -sS" start="0" startstr="" version="7.94" xmloutputversion="1.05">\n')
+    outfile.write('<scaninfo type="syn" protocol="tcp" numservices="1000" services="1-1000"/>\n')
+    up = 0
+    for index in range(hosts):
+        address = host_address(index)
+        if rand.random() < down_ratio:
+            outfile.write('<host><status state="down" reason="no-response" reason_ttl="0"/>'
+                          '<address addr="%s" addrtype="ipv4"/></host>\n' % address)
+            continue
+        up += 1
+        outfile.write('<host starttime="0" endtime="0"><status state="up" reason="syn-ack" reason_ttl="64"/>\n'
+                      '<address addr="%s" addrtype="ipv4"/>\n<hostnames></hostnames>\n<ports>' % address)
+        for port, proto, service in rand.sample(COMMON_PORTS, min(ports_per_host, len(COMMON_PORTS))):
+            outfile.write('<port protocol="%s" portid="%d"><state state="open" reason="syn-ack" reason_ttl="64"/>'
+                          '<service name="%s" method="table" conf="3"/>' % (proto, port, service))
+            for script in range(scripts_per_port):
+                outfile.write('<script id="%s-info-%d" output="&#xa;  %s banner %d&#xa;  version: %d.%d&#xa;"/>' %
+                              (service, script, service, script, rand.randint(1, 9), rand.randint(0, 20)))
+            outfile.write('</port>\n')
+        outfile.write('</ports>\n<times srtt="100" rttvar="100" to="100000"/>\n</host>\n')
+    outfile.write('<runstats><finished time="0" timestr="" elapsed="1.00" summary="Nmap done at ; %d IP addresses (%d hosts up) scanned in 1.00 seconds" exit="success"/>'
+                  '<hosts up="%d" down="%d" total="%d"/></runstats>\n</nmaprun>\n' % (hosts, up, up, hosts - up, hosts))
+    return up
+
+def expand_targets(targets):
+    '''
+    Yields the addresses of nmap target specifications (single addresses, CIDR networks
+    and last octet ranges such as 10.0.0.1-20)
+    '''
+    for target in targets:
+        if "/" in target:
+            network = ipaddress.ip_network(target, strict=False)
+            for address in (network.hosts() if network.num_addresses > 2 else network):
+                yield str(address)
+        elif "-" in target.rsplit(".", 1)[-1]:
+            prefix, last = target.rsplit(".", 1)
+            first, final = last.split("-")
+            for octet in range(int(first), int(final) + 1):
+                yield "%s.%d" % (prefix, octet)
+        else:
+            yield target
+
+def host_ports(address, protocols=("tcp",), port_filter=None, ports_per_host=3, seed=0):
+    '''
+    Returns the open (port, protocol, service) tuples of a synthetic host; the same address
+    always gets the same ports, so enumeration and script scans of a host agree
+    '''
+    rand = random.Random(zlib.crc32(address.encode()) + seed)
+    ports = rand.sample(COMMON_PORTS, min(ports_per_host, len(COMMON_PORTS)))
+    return [(port, proto, service) for port, proto, service in ports
+            if proto in protocols and (port_filter is None or port in port_filter)]
+
+def host_is_up(address, down_ratio=0.1, seed=0):
+    return random.Random(zlib.crc32(address.encode()) + seed + 1).random() >= down_ratio
+
+def write_scan_xml(outfile, addresses, args="", protocols=("tcp",), port_filter=None, ping_only=False,
+                   ports_per_host=3, down_ratio=0.1, scripts_per_port=0, seed=0, before_hosts=None):
+    '''
+    Writes nmap-style XML output for a scan of specific addresses, as produced by the
+    fake nmap executable in benchmarks/fakebin; hosts are generated one at a time
+
+    before_hosts is called after the XML header has been written (e.g. to emit progress
+    updates while simulating scan time)
+    '''
+    outfile.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    outfile.write('<?xml-stylesheet href="%s" type="text/xsl"?>\n' % STYLESHEET)
+    outfile.write('<nmaprun scanner="nmap" args="nmap %s" start="0" startstr="" version="7.94" xmloutputversion="1.05">\n'
+                  % args.replace("&", "&amp;").replace('"', "&quot;").replace("<", "&lt;"))
+    if before_hosts:
+        before_hosts()
+    total = up = 0
+    for address in addresses:
+        total += 1
+        if not host_is_up(address, down_ratio, seed):
+            continue
+        up += 1
+        outfile.write('<host starttime="0" endtime="0"><status state="up" reason="syn-ack" reason_ttl="64"/>\n'
+                      '<address addr="%s" addrtype="ipv4"/>\n<hostnames></hostnames>\n<ports>' % address)
+        if not ping_only:
+            for port, proto, service in host_ports(address, protocols, port_filter, ports_per_host, seed):
+                outfile.write('<port protocol="%s" portid="%d"><state state="open" reason="syn-ack" reason_ttl="64"/>'
+                              '<service name="%s" method="table" conf="3"/>' % (proto, port, service))
+                for script in range(scripts_per_port):
+                    outfile.write('<script id="%s-info-%d" output="&#xa;  %s banner %d&#xa;"/>' %
+                                  (service, script, service, script))
+                outfile.write('</port>\n')
+        outfile.write('</ports>\n<times srtt="100" rttvar="100" to="100000"/>\n</host>\n')
+    outfile.write('<runstats><finished time="0" timestr="" elapsed="1.00" summary="Nmap done at ; %d IP addresses (%d hosts up) scanned in 1.00 seconds" exit="success"/>'
+                  '<hosts up="%d" down="%d" total="%d"/></runstats>\n</nmaprun>\n' % (total, up, up, total - up, total))
+    return up
+
+def nmap_xml_file(path, **kwargs):
+    '''Writes synthetic nmap XML to path and returns the number of live hosts'''
+    with open(path, 'w') as outfile:
+        return write_nmap_xml(outfile, **kwargs)
+
+if __name__ == '__main__':
+    import sys
+    write_nmap_xml(sys.stdout, hosts=int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Library interface to the autoenum scan pipeline
+
+autoenum.py is a thin command line wrapper around AutoenumRun, which can also be used
+from a long running process (e.g. a job scheduler) that imports autoenum once and
+runs many scans. Runs take a ConfigParser and answer their questions through a
+callback instead of prompting, and problems are raised as AutoenumError rather than
+exiting the process:
+
+    import modules.api
+    config = modules.api.load_config("config/default.cfg")
+    run = modules.api.run("192.168.0.0/24", "output/lab", config, nikto="yes")
+    print(run.timestamp, run.ports)
+
+The stages (start, discover_live_hosts, enumerate_services, run_script_scans,
+run_nikto, write_outputs, finish) can also be called one at a time. Runs set up module
+level state (XML spool, run profile, rate budget, render pool) when they start, so one
+run can be in progress per process at a time.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import logging
+import datetime
+import configparser
+import xml.etree.ElementTree as ET
+
+from libnmap.parser import NmapParserException
+
+import modules.compact
+import modules.core
+import modules.delta
+import modules.manifest
+import modules.metrics
+import modules.nikto
+import modules.nmap
+import modules.nmapxml
+import modules.output
+import modules.pipeline
+import modules.plan
+import modules.rate
+import modules.render
+import modules.results
+import modules.scheduler
+import modules.sections
+import modules.shard
+import modules.state
+import modules.targets
+
+class AutoenumError(Exception):
+    pass
+
+def load_config(config_file):
+    '''Reads a config file; raises AutoenumError if it cannot be read'''
+    config = configparser.ConfigParser()
+    if not config.read(config_file):
+        raise AutoenumError("Config file " + config_file + " not found")
+    return config
+
+def answer_default(question, policy="ask", default=False):
+    '''Unattended stand-in for modules.core.confirm - questions left at "ask" get their default'''
+    if policy in ("yes", "no"):
+        return policy == "yes"
+    return default
+
+def rate_budget(settings):
+    '''Returns the packet rate budget for the max_rate setting, or None if there is no limit'''
+    if settings.max_rate > 0:
+        return modules.rate.RateBudget(settings.max_rate, min_rate_fraction=settings.min_rate_fraction)
+    return None
+
+class ScanSettings(object):
+    '''Run settings from the config file; jobs, shards and max_rate override the config values'''
+
+    def __init__(self, config, jobs=None, shards=None, max_rate=None):
+        try:
+            self.output_dir_info = config.get("main_config", "output_dir_info")
+            self.output_dir_nmap_xml = config.get("main_config", "output_dir_nmap_xml")
+            self.output_dir_nmap_enum = config.get("main_config", "output_dir_nmap_enum")
+            self.output_dir_service_info = config.get("main_config", "output_dir_service_info")
+            self.output_dir_target_lists = config.get("main_config", "output_dir_target_lists")
+            self.script_concurrency = jobs or config.getint("scan_config", "script_concurrency", fallback=1)
+            self.enum_shards = shards or config.getint("scan_config", "enum_shards", fallback=1)
+            self.shard_min_hostgroup = config.get("scan_config", "shard_min_hostgroup", fallback="")
+            self.pipeline_hostgroup = config.getint("scan_config", "pipeline_hostgroup", fallback=256)
+            self.render_workers = config.getint("scan_config", "render_workers", fallback=0)
+            self.coalesce_sections = config.getboolean("scan_config", "coalesce_sections", fallback=True)
+            self.port_precise_sections = config.getboolean("scan_config", "port_precise_sections", fallback=True)
+            self.xml_compression = config.get("main_config", "xml_compression", fallback="")
+            self.metrics_textfile = config.get("main_config", "metrics_textfile", fallback="")
+            self.worker_lease_timeout = config.getint("scan_config", "worker_lease_timeout", fallback=60)
+            self.nikto = config.get("scan_config", "nikto", fallback="ask")
+            self.nikto_workers = config.getint("scan_config", "nikto_workers", fallback=4)
+            self.nikto_host_timeout = config.getint("scan_config", "nikto_host_timeout", fallback=600)
+            self.max_rate = max_rate if max_rate is not None else config.getint("scan_config", "max_rate", fallback=0)
+            self.min_rate_fraction = config.getfloat("scan_config", "min_rate_fraction", fallback=0.0)
+            self.compact_index = config.getboolean("scan_config", "compact_index", fallback=False)
+        except (configparser.Error, ValueError) as exception:
+            raise AutoenumError("Missing required config file sections (%s). Check running config file against "
+                                "provided example" % exception)
+
+class AutoenumRun(object):
+    '''
+    One enumeration run of a target into an output directory
+
+    target may be omitted when resuming (resume is the timestamp of the interrupted run).
+    clean and nikto are confirm() policies ("ask", "yes" or "no"; nikto defaults to the
+    config file setting) and confirm(question, policy, default) answers them - pass
+    modules.core.confirm to prompt at the terminal. on_scan_saved(stage, xml_path) is
+    called as each scan's XML artifact is written.
+
+    Results are kept on the run: timestamp, live_hosts, hosts (ports by host), ports
+    (hosts by port), webhosts and delta
+    '''
+
+    def __init__(self, target, output_dir, config, settings=None, config_file="", quiet=False, pipeline=False,
+                 plan_only=False, delta=False, stream=False, resume=None, clean="no", nikto=None,
+                 confirm=answer_default, on_scan_saved=None):
+        self.config = config
+        self.settings = settings or ScanSettings(config)
+        self.target = target
+        self.config_file = config_file
+        self.output_dir = output_dir
+        self.quiet = quiet
+        self.plan_only = plan_only
+        self.delta_mode = delta
+        self.stream = stream
+        self.resume = resume
+        self.pipelined = pipeline and not quiet and not plan_only and not delta
+        self.clean = clean
+        self.nikto = nikto or self.settings.nikto
+        self.confirm = confirm
+        self.on_scan_saved = on_scan_saved
+
+        self.output_dir_info = os.path.join(output_dir, self.settings.output_dir_info)
+        self.output_dir_nmap_xml = os.path.join(output_dir, self.settings.output_dir_nmap_xml)
+        self.output_dir_nmap_enum = os.path.join(output_dir, self.settings.output_dir_nmap_enum)
+        self.output_dir_service_info = os.path.join(output_dir, self.settings.output_dir_service_info)
+        self.output_dir_nikto = os.path.join(self.output_dir_service_info, "nikto")
+        self.output_dir_target_lists = os.path.join(output_dir, self.settings.output_dir_target_lists)
+
+        self.timestamp = None
+        self.run_state = None
+        self.run_profile = None
+        self.target_store = None
+        self.result_store = None
+        self.live_hosts = None
+        self.hosts = None
+        self.ports = None
+        self.webhosts = None
+        self.delta = None
+        self.script_ports = None
+        self.pipelined_scans = None
+
+    def run(self):
+        '''Runs every stage of the scan; returns the run'''
+        try:
+            self.start()
+            self.discover_live_hosts()
+            self.enumerate_services()
+            self.run_script_scans()
+            self.run_nikto()
+            self.write_outputs()
+            self.finish()
+        finally:
+            self.close()
+        return self
+
+    #-----------------------------------------------------------
+    # Setup
+
+    def start(self):
+        '''Checks the target and opens the output directory, run state and stores'''
+        settings = self.settings
+
+        #Resumed runs pick up the target and timestamp of the interrupted run
+        if self.resume:
+            self.run_state = modules.state.open_run_state(self.output_dir_info)
+            run = modules.state.get_run(self.run_state, self.resume)
+            if run is None:
+                self.close()
+                raise AutoenumError("No run with timestamp " + self.resume + " found in " + self.output_dir_info)
+            if self.target and self.target != run[0]:
+                logging.warning("Ignoring target " + self.target + " - resuming scan of " + run[0])
+            self.target = run[0]
+
+        #Check target input
+        if not self.target:
+            raise AutoenumError("No scan target given")
+        if "," in self.target:
+            raise AutoenumError("Commas found in input target list and will not parse correctly in libnmap")
+
+        if not self.resume:
+            modules.core.cleanup_routine(self.output_dir, self.clean, self.confirm)
+
+        #HTML reports are rendered on background workers so they never hold up the next scan
+        modules.render.start_render_pool(settings.render_workers)
+
+        if self.resume:
+            self.timestamp = self.resume
+            print("Resuming run " + self.timestamp + " - completed stages will be skipped\n")
+        else:
+            self.timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H.%M.%S")
+
+            # Log scan info to history file
+            if os.path.exists(os.path.join(self.output_dir_info, "scan_history.csv")):
+                output_text = ""
+            else:
+                output_text = "Timestamp,Scan Target,Config\n"
+
+            output_text += self.timestamp + "," + self.target + "," + self.config_file + "\n"
+            modules.output.write_outfile(self.output_dir_info, "scan_history.csv", output_text)
+
+            self.run_state = modules.state.open_run_state(self.output_dir_info)
+            modules.state.record_run(self.run_state, self.timestamp, self.target, self.config_file)
+
+        #Packet rate ceiling split across the nmap scans running at any one time
+        modules.nmap.set_rate_budget(rate_budget(settings))
+
+        #Stage timings, child process usage and output sizes go to the run profile in the info
+        #directory (see modules.metrics)
+        self.run_profile = modules.metrics.start_run_profile(self.output_dir_info, self.timestamp)
+
+        #Reports are recorded in the output manifest as they are written (see write_html_index)
+        modules.manifest.open_manifest(self.run_state)
+
+        #Target lists are deduplicated on insert; only lists that gain entries are rewritten
+        self.target_store = modules.targets.TargetStore(self.output_dir_info, self.output_dir_target_lists)
+
+        #Port and script results are loaded into the results database as each scan is saved
+        #(searched with autoenum.py query)
+        self.result_store = modules.results.ResultStore(self.output_dir_info, self.run_state)
+        self.result_store.record_run(self.timestamp, self.target)
+
+        #Scan XML is written to disk as it arrives and moved into place as the final artifact
+        modules.nmap.start_xml_spool(self.output_dir_nmap_xml, settings.xml_compression)
+
+        #original target specification, before it is narrowed down to the live hosts
+        self.scan_target = self.target
+        return self
+
+    def scan_index(self, xml_source, scan_name="scan"):
+        '''
+        Parses scan output into a ScanIndex, or a CompactScanIndex with compact_index set;
+        raises AutoenumError if the output cannot be parsed (e.g. every shard was interrupted)
+        '''
+        try:
+            if self.settings.compact_index:
+                return modules.compact.CompactScanIndex(xml_source)
+            return modules.nmap.ScanIndex(xml_source, stream=self.stream)
+        except (NmapParserException, ET.ParseError) as exception:
+            raise AutoenumError("Unable to parse " + scan_name + " scan output (" + str(exception).strip() + ") - "
+                                "the scan was probably interrupted before producing any results. Resume the run "
+                                "with --resume " + str(self.timestamp) + " to scan again")
+
+    def record_report(self, html_dir, filename):
+        kind = modules.manifest.ENUM_REPORTS if html_dir == self.output_dir_nmap_enum else modules.manifest.SERVICE_REPORTS
+        modules.manifest.record_artifact(self.run_state, self.timestamp, kind,
+                                         os.path.relpath(os.path.join(html_dir, filename), self.output_dir))
+
+    def load_completed_scan(self, stage, html_dir, outfile_name):
+        '''Returns the saved scan output of a stage completed before a resume, or None'''
+        if not self.resume:
+            return None
+        xml_path = modules.state.completed_stage(self.run_state, self.timestamp, stage)
+        if xml_path is None:
+            return None
+        print("Resuming - using completed " + stage + " results from " + xml_path)
+        if not os.path.exists(os.path.join(html_dir, outfile_name+".html")):
+            modules.nmap.nmap_xml_to_html(xml_path, html_dir, outfile_name+".html")
+        return modules.nmap.NmapResult.from_xml(xml_path)
+
+    def save_scan_output(self, stage, html_dir, outfile_name, xml_source, complete=True):
+        '''
+        Writes the XML / HTML artifacts of a scan and records the stage as completed; returns
+        the path of the XML artifact
+
+        Scans that were interrupted or failed (complete=False, see NmapResult.complete) still
+        have their artifacts written, but the stage is left unrecorded so it runs again on resume
+        '''
+        #partial output left behind by an interrupted run (possibly with another compression)
+        stale_path = modules.nmapxml.find_xml_file(self.output_dir_nmap_xml, outfile_name)
+        while stale_path is not None:
+            os.remove(stale_path)
+            stale_path = modules.nmapxml.find_xml_file(self.output_dir_nmap_xml, outfile_name)
+        xml_path = os.path.join(self.output_dir_nmap_xml,
+                                outfile_name + modules.nmapxml.xml_extension(self.settings.xml_compression))
+        modules.nmap.store_xml(xml_source, xml_path)
+        modules.nmap.nmap_xml_to_html(xml_path, html_dir, outfile_name+".html")
+        self.record_report(html_dir, outfile_name+".html")
+        self.result_store.ingest(self.timestamp, stage, xml_path)
+        if complete:
+            modules.state.record_stage(self.run_state, self.timestamp, stage, xml_path)
+        else:
+            print("[!] " + stage + " scan did not complete - partial results saved; the stage will be re-run on resume")
+        if self.on_scan_saved:
+            self.on_scan_saved(stage, xml_path)
+        return xml_path
+
+    #-----------------------------------------------------------
+    # Live host detection scan
+
+    def discover_live_hosts(self):
+        '''
+        Narrows the target down to the hosts found to be up; returns them, or None when not
+        running as root (all targets are then scanned)
+        '''
+        if os.getuid()!=0:
+            logging.warning("Script not running as root which prevents proper live host detection...")
+            logging.warning("We will continue and scan all targets, but you should really re-run as root!")
+            return None
+
+        settings = self.settings
+        outfile_name = "nmap_live_host_scan_"+self.timestamp
+        live_host_scan = self.load_completed_scan("live_hosts", self.output_dir_nmap_enum, outfile_name)
+        if live_host_scan is None:
+            with modules.metrics.stage("live hosts") as metrics:
+                print("Scanning for live hosts in specified target range...")
+                scan_options = self.config.get("scan_config", "live_hosts")
+                live_host_scan = modules.shard.run_sharded_nmap_scan(self.target, scan_options, settings.enum_shards,
+                                                                     settings.shard_min_hostgroup)
+
+                xml_path = self.save_scan_output("live_hosts", self.output_dir_nmap_enum, outfile_name,
+                                                 live_host_scan.xml_source, live_host_scan.complete)
+                live_hosts = self.scan_index(xml_path, "live host").live_hosts
+                metrics.update(hosts=len(live_hosts), nmap_seconds=round(live_host_scan.elapsed, 3),
+                               bytes=modules.metrics.file_bytes(xml_path))
+            self._update_target_lists(live_hosts=live_hosts)
+        else:
+            live_hosts = self.scan_index(live_host_scan.xml_source, "live host").live_hosts
+        logging.debug(live_hosts)
+
+        self.live_hosts = live_hosts
+        self.target = live_hosts
+        return live_hosts
+
+    def _update_target_lists(self, live_hosts=None, ports=None, webhosts=None):
+        with modules.metrics.stage("target lists") as metrics:
+            if live_hosts is not None:
+                self.target_store.add_live_hosts(live_hosts)
+            if ports is not None:
+                self.target_store.add_hosts_by_port(ports)
+            if webhosts is not None:
+                self.target_store.add_webhosts(webhosts)
+            written = self.target_store.export()
+            metrics.update(lists=len(written), bytes=modules.metrics.file_bytes(
+                *[os.path.join(self.output_dir_target_lists, name) for name in written]))
+
+    #-----------------------------------------------------------
+    # Service enumeration scan
+
+    def enumerate_services(self):
+        '''Runs the TCP and UDP enumeration scans and writes the target lists; returns ports by host'''
+        settings = self.settings
+        enum_stages = {'tcp enum': ("tcp_enum", "nmap_tcp_enum_scan_"+self.timestamp),
+                       'udp enum': ("udp_enum", "nmap_udp_enum_scan_"+self.timestamp)}
+        enum_scans = {}
+        for name, (stage, outfile_name) in enum_stages.items():
+            completed_scan = self.load_completed_scan(stage, self.output_dir_nmap_enum, outfile_name)
+            if completed_scan is not None:
+                enum_scans[name] = completed_scan
+        #nothing is left to pipeline once the enumeration scans have completed
+        self.pipelined = self.pipelined and len(enum_scans) < len(enum_stages)
+
+        if self.pipelined:
+            #Enumeration and script scans run together over host groups; the merged results are
+            #written out below exactly as in the batch flow
+            print("Performing pipelined enumeration and script scans on live hosts...")
+            with modules.metrics.stage("pipeline"):
+                tcp_scan, udp_scan, self.pipelined_scans = modules.pipeline.run_pipelined_scans(
+                    self.target, self.config, settings.pipeline_hostgroup, settings.enum_shards,
+                    settings.script_concurrency, coalesce=settings.coalesce_sections,
+                    port_precise=settings.port_precise_sections, scan_index=self.scan_index)
+            enum_scans = {}
+            new_enum_scans = {'tcp enum': tcp_scan, 'udp enum': udp_scan}
+        else:
+            #TCP and UDP enumeration scans run at the same time; UDP is much slower so starting it
+            #alongside TCP saves most of the TCP scan time
+            print("Performing initial TCP and UDP enumeration scans on live hosts...")
+
+            scan_options = {}
+            for name in enum_stages:
+                if name not in enum_scans:
+                    scan_options[name] = self.config.get("scan_config", enum_stages[name][0])
+            new_enum_scans = {}
+            if scan_options:
+                with modules.metrics.stage("enum"):
+                    new_enum_scans = modules.shard.run_concurrent_nmap_scans(self.target, scan_options, settings.enum_shards,
+                                                                             settings.shard_min_hostgroup)
+
+        for name, enum_scan in new_enum_scans.items():
+            stage, outfile_name = enum_stages[name]
+            xml_path = self.save_scan_output(stage, self.output_dir_nmap_enum, outfile_name, enum_scan.xml_source,
+                                             enum_scan.complete)
+            enum_scans[name] = modules.nmap.NmapResult.from_xml(xml_path)
+            modules.metrics.record(name, nmap_seconds=round(enum_scan.elapsed, 3), bytes=modules.metrics.file_bytes(xml_path))
+        tcp_enum_scan = enum_scans['tcp enum']
+        udp_enum_scan = enum_scans['udp enum']
+
+        with modules.metrics.stage("enum parse") as metrics:
+            #Parse once and keep the index around; TCP and UDP results are merged so that each host
+            #keeps the union of its open ports
+            scan_index = self.scan_index(tcp_enum_scan.xml_source, "TCP enumeration")
+            self.webhosts = modules.nmap.nmap_parse_webhosts(scan_index)
+
+            scan_index.merge(self.scan_index(udp_enum_scan.xml_source, "UDP enumeration"))
+            self.hosts = modules.nmap.nmap_parse_ports_by_host(scan_index)
+            self.ports = modules.nmap.nmap_parse_hosts_by_port(scan_index)
+            metrics.update(hosts=len(self.hosts), ports=scan_index.open_port_count())
+
+        logging.debug(self.hosts)
+        logging.debug(self.ports)
+        logging.debug(self.webhosts)
+
+        self._update_target_lists(ports=self.ports, webhosts=self.webhosts)
+
+        #Delta against the previous run of this target
+        self.script_ports = self.ports
+        if self.delta_mode:
+            output_dir_nmap_xml = self.output_dir_nmap_xml
+            previous = modules.delta.previous_run(self.output_dir_info, output_dir_nmap_xml, self.scan_target,
+                                                  self.timestamp)
+            if previous:
+                old_services = modules.delta.service_tuples(modules.delta.enum_xml_files(output_dir_nmap_xml, previous))
+                new_services = modules.delta.service_tuples([tcp_enum_scan.xml_source, udp_enum_scan.xml_source])
+                added, removed = modules.delta.diff_services(old_services, new_services)
+                modules.delta.write_delta_summary(self.output_dir_info, self.timestamp, previous, added, removed)
+                self.delta = {'timestamp': self.timestamp, 'previous': previous, 'added': added, 'removed': removed}
+                self.script_ports = modules.delta.delta_ports(added)
+                print("%d service(s) added or changed and %d removed since run %s - script scanning changes only\n" %
+                      (len(added), len(removed), previous))
+            else:
+                print("No previous run against " + self.scan_target + " found - script scanning all services\n")
+        return self.hosts
+
+    #-----------------------------------------------------------
+    # Nmap script scans
+
+    def write_section_output(self, section, xml_source, complete=True, **metrics):
+        xml_path = self.save_scan_output("script:"+section, self.output_dir_service_info, section+"_"+self.timestamp,
+                                         xml_source, complete)
+        modules.metrics.record("script:"+section, bytes=modules.metrics.file_bytes(xml_path), **metrics)
+
+    def write_script_scan_output(self, job, script_scan):
+        if script_scan is None:
+            print("[!] No output for " + job['section'] + " - the section will be re-run on resume\n")
+            return
+        specs = {spec['section']: spec for spec in job['sections']}
+        for section, xml_source in modules.plan.split_job_output(job, script_scan.xml_source):
+            self.write_section_output(section, xml_source, script_scan.complete, nmap_seconds=round(script_scan.elapsed, 3),
+                                      hosts=len(specs[section]['targets']), ports=len(specs[section]['ports'].split(",")),
+                                      shared_with=len(specs) - 1)
+
+    def run_script_scans(self):
+        '''
+        Runs the script scan sections with matching hosts (already done during enumeration
+        in pipelined mode, and printed instead of run with plan_only)
+        '''
+        if self.quiet:
+            return
+        settings = self.settings
+
+        #Build a script scan job for each config file section with matching hosts, coalesce
+        #compatible sections into shared nmap invocations, and run them side by side up to the
+        #configured concurrency limit
+        if not self.pipelined:
+            script_jobs = modules.sections.build_section_jobs(self.config, self.script_ports)
+            if self.resume:
+                #sections completed before the run was interrupted are not scanned again
+                for job in list(script_jobs):
+                    if modules.state.completed_stage(self.run_state, self.timestamp, "script:"+job['section']) is not None:
+                        print("Resuming - skipping completed section " + job['section'])
+                        script_jobs.remove(job)
+            if settings.coalesce_sections:
+                script_jobs = modules.plan.coalesce_jobs(script_jobs, self.config.get("scan_config","script"))
+            if settings.port_precise_sections:
+                script_jobs = modules.plan.port_precise_jobs(script_jobs, self.script_ports)
+
+        if self.pipelined:
+            for section in modules.sections.script_sections(self.config):
+                if section in self.pipelined_scans:
+                    script_scan = self.pipelined_scans[section]
+                    self.write_section_output(section, script_scan.xml_source, script_scan.complete)
+                else:
+                    print("No "+section+" services found during enumeration scan...skipping...\n")
+        elif self.plan_only:
+            modules.plan.print_plan(script_jobs)
+        else:
+            with modules.metrics.stage("script scans", jobs=len(script_jobs)):
+                modules.scheduler.run_scan_jobs(script_jobs, settings.script_concurrency,
+                                                modules.plan.collect_job_parts(self.write_script_scan_output))
+
+    #-----------------------------------------------------------
+    # Other scans
+
+    def run_nikto(self):
+        '''Runs Nikto against the web hosts found, if the nikto policy allows it'''
+        if self.quiet:
+            return
+        settings = self.settings
+
+        if self.resume and modules.state.completed_stage(self.run_state, self.timestamp, "nikto") is not None:
+            print("Resuming - skipping completed Nikto scan")
+            return
+        if not self.webhosts or self.plan_only:
+            return
+        if not self.confirm("\nWebhosts detected - run Nikto scan? [yes] ", self.nikto, True):
+            return
+
+        #one nikto process per endpoint, so a slow host only holds up its own worker;
+        #endpoints finished before an interrupted run are not scanned again, while endpoints
+        #which failed or ran out of time are left pending for --resume
+        endpoints = [endpoint for endpoint in self.webhosts.splitlines() if endpoint and not
+                     (self.resume and modules.state.completed_stage(self.run_state, self.timestamp, "nikto:"+endpoint) is not None)]
+
+        def nikto_scan_complete(endpoint, report, status, seconds):
+            report_path = os.path.join(self.output_dir_nikto, report)
+            if os.path.exists(report_path) and os.path.getsize(report_path):
+                self.record_report(self.output_dir_nikto, report)
+            if status == "complete":
+                modules.state.record_stage(self.run_state, self.timestamp, "nikto:"+endpoint)
+            modules.metrics.record("nikto:"+endpoint, status=status, wall_seconds=round(seconds, 3),
+                                   bytes=modules.metrics.file_bytes(report_path))
+
+        with modules.metrics.stage("nikto", hosts=len(endpoints)) as metrics:
+            results = modules.nikto.run_nikto_scans(endpoints, self.output_dir_nikto, self.timestamp,
+                                                    settings.nikto_workers, settings.nikto_host_timeout, nikto_scan_complete)
+            metrics['bytes'] = modules.metrics.file_bytes(*[os.path.join(self.output_dir_nikto, report)
+                                                            for endpoint, report, status, seconds in results])
+        unfinished = len(endpoints) - sum(1 for result in results if result[2] == "complete")
+        if unfinished:
+            print("\n[!] %d Nikto scan(s) failed, timed out or did not run - resume the run with --resume %s "
+                  "to scan them again\n" % (unfinished, self.timestamp))
+        else:
+            modules.state.record_stage(self.run_state, self.timestamp, "nikto")
+
+    #-----------------------------------------------------------
+    # Wrap it all up
+
+    def write_outputs(self):
+        '''Waits for the HTML reports still rendering and writes the html index of all output files'''
+        with modules.metrics.stage("render") as metrics:
+            rendered = modules.render.wait_for_renders()
+            metrics.update(reports=len(rendered), render_seconds=round(sum(seconds for path, seconds in rendered), 3),
+                           bytes=modules.metrics.file_bytes(*[path for path, seconds in rendered]))
+
+        with modules.metrics.stage("index") as metrics:
+            modules.output.write_html_index(self.output_dir, self.config, self.run_state, self.timestamp, self.delta)
+            metrics['bytes'] = modules.metrics.file_bytes(os.path.join(self.output_dir, "index.html"))
+
+    def finish(self):
+        '''Writes the run profile (and Prometheus textfile, if configured)'''
+        self.run_profile.finish()
+        if self.settings.metrics_textfile:
+            self.run_profile.write_textfile(self.settings.metrics_textfile)
+
+    def close(self):
+        '''
+        Finishes any queued report renders, stops the render pool and closes the run's
+        databases; safe to call more than once
+        '''
+        modules.render.stop_render_pool()
+        for store in (self.target_store, self.result_store, self.run_state):
+            if store is not None:
+                store.close()
+        self.target_store = self.result_store = self.run_state = None
+
+def run(target, output_dir, config, **options):
+    '''Scans target into output_dir (see AutoenumRun for the options); returns the finished run'''
+    return AutoenumRun(target, output_dir, config, **options).run()
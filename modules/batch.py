@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Batch scanning of many targets for autoenum
+
+Every target from a target file (or stdin) runs as its own unattended autoenum.py
+process writing to its own output subdirectory, several at a time. The number of nmap
+processes across all of them is capped with a shared slot directory (see
+modules.slots), so the batch concurrency only decides how many targets are in
+progress. A combined index of all targets is rewritten as each one finishes.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import re
+import sys
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import modules.output
+from modules.slots import SLOTS_ENV
+
+BATCH_LOG_DIR = "batch_logs"
+
+def read_targets(source):
+    '''
+    Returns the targets listed in a file (or stdin for "-"), one per line; blank lines,
+    comments (#) and repeated targets are skipped
+    '''
+    target_file = sys.stdin if source == "-" else open(source)
+    try:
+        targets = []
+        for line in target_file:
+            line = line.split("#", 1)[0].strip()
+            if line and line not in targets:
+                targets.append(line)
+        return targets
+    finally:
+        if target_file is not sys.stdin:
+            target_file.close()
+
+def target_dir_name(target):
+    '''Returns the output subdirectory name for a target, e.g. 10.0.0.0/24 -> 10.0.0.0_24'''
+    return re.sub(r'[^\w.-]', '_', target)
+
+def run_batch(targets, output_dir, command, jobs, nmap_slots=None):
+    '''
+    Runs command (the autoenum.py command line without target and output directory) for
+    every target, at most jobs at a time, each with its own output subdirectory and log
+    
+    nmap_slots (modules.slots.NmapSlots) is passed to every run to share one limit on the
+    number of nmap processes; returns the list of target dicts written to the index
+    '''
+    if not os.path.exists(os.path.join(output_dir, BATCH_LOG_DIR)):
+        os.makedirs(os.path.join(output_dir, BATCH_LOG_DIR))
+    env = dict(os.environ)
+    if nmap_slots is not None:
+        env[SLOTS_ENV] = str(nmap_slots)
+    
+    batch = []
+    for target in targets:
+        directory = target_dir_name(target)
+        batch.append({'target': target, 'directory': directory, 'status': 'queued', 'seconds': None,
+                      'log': BATCH_LOG_DIR + "/" + directory + ".log"})
+    lock = threading.Lock()
+    stopping = threading.Event()
+    
+    def update_index():
+        with lock:
+            modules.output.write_batch_index(output_dir, batch)
+    
+    def run_target(entry):
+        if stopping.is_set():
+            entry['status'] = 'cancelled'
+            return
+        entry['status'] = 'running'
+        started = time.time()
+        try:
+            with open(os.path.join(output_dir, entry['log']), 'w') as log:
+                process = subprocess.run(command + [entry['target'], "-o", os.path.join(output_dir, entry['directory'])],
+                                         stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, env=env)
+            entry['status'] = 'complete' if process.returncode == 0 else 'failed (exit code %d)' % process.returncode
+        except OSError as exception:
+            entry['status'] = 'failed (%s)' % exception
+        entry['seconds'] = time.time() - started
+        finished = sum(1 for other in batch if other['status'] not in ('queued', 'running'))
+        print("[%d/%d] %s - %s in %d seconds" % (finished, len(batch), entry['target'], entry['status'],
+                                                entry['seconds']))
+        update_index()
+    
+    print("Scanning %d target(s), %d at a time%s...\n" % (
+        len(batch), jobs, " with at most %d nmap processes" % nmap_slots.count if nmap_slots else ""))
+    update_index()
+    executor = ThreadPoolExecutor(max_workers=max(1, int(jobs)))
+    try:
+        for future in [executor.submit(run_target, entry) for entry in batch]:
+            future.result()
+    except KeyboardInterrupt:
+        #running targets get the interrupt too and stop their own scans
+        print("Keyboard Interrupt - cancelling queued targets...")
+        stopping.set()
+    finally:
+        executor.shutdown(wait=True)
+        for entry in batch:
+            if entry['status'] == 'queued':
+                entry['status'] = 'cancelled'
+        update_index()
+    return batch
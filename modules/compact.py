@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Compact scan index for autoenum
+
+ScanIndex keeps an address string and a list of (port, protocol) tuples for every
+host, which adds up to gigabytes on scans of very large ranges (e.g. a /8).
+CompactScanIndex keeps IPv4 addresses packed into 32-bit integers instead: one sorted
+array of live hosts and one sorted array of hosts for each (port, protocol), so the
+whole index costs a few bytes per open port, and section targeting and merges are
+unions of sorted arrays rather than per-host loops. Address strings are only built
+for the lists that are actually handed out (e.g. a section's target list).
+
+The arrays are NumPy arrays when NumPy is installed; without it the standard array
+module is used (same memory use, slower set operations). Addresses that are not IPv4
+(e.g. IPv6) are kept as strings alongside the arrays.
+
+Enabled with compact_index in [scan_config].
+
+See README.md for licensing information and credits
+
+'''
+
+import sys
+import socket
+import struct
+import bisect
+import itertools
+from array import array
+from collections.abc import Mapping
+
+from modules.nmapxml import iter_host_records
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#array module typecode for unsigned 32-bit integers
+UINT32 = 'I' if array('I').itemsize == 4 else 'L'
+
+def pack_address(address):
+    '''Returns a dotted IPv4 address as an integer, or None for any other address (e.g. IPv6)'''
+    if address.count(".") != 3:
+        return None
+    try:
+        return struct.unpack("!I", socket.inet_aton(address))[0]
+    except OSError:
+        return None
+
+if numpy is not None:
+    #octet strings for building dotted addresses a whole array at a time
+    _OCTET_DOT = numpy.array([str(octet) + "." for octet in range(256)], dtype=object)
+    _OCTET = numpy.array([str(octet) for octet in range(256)], dtype=object)
+
+def unpack_addresses(values):
+    '''Returns dotted IPv4 address strings for an array of packed addresses'''
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return (_OCTET_DOT[values >> 24] + _OCTET_DOT[(values >> 16) & 255] +
+                _OCTET_DOT[(values >> 8) & 255] + _OCTET[values & 255]).tolist()
+    packed = array(UINT32, values)
+    if sys.byteorder == "little":
+        packed.byteswap()
+    return list(map("%d.%d.%d.%d".__mod__, struct.iter_unpack("4B", packed.tobytes())))
+
+def _empty():
+    return numpy.empty(0, dtype=numpy.uint32) if numpy is not None else array(UINT32)
+
+def _sorted_unique(values):
+    '''Returns the sorted distinct values of an array module buffer of packed addresses'''
+    if numpy is not None:
+        return numpy.unique(numpy.frombuffer(values, dtype=numpy.uint32 if values.itemsize == 4 else numpy.uint64)
+                            .astype(numpy.uint32))
+    return array(UINT32, sorted(set(values)))
+
+def _union(arrays):
+    '''Returns the sorted union of sorted arrays of packed addresses'''
+    arrays = [values for values in arrays if len(values)]
+    if not arrays:
+        return _empty()
+    if len(arrays) == 1:
+        return arrays[0]
+    if numpy is not None:
+        return numpy.unique(numpy.concatenate(arrays))
+    return array(UINT32, sorted(set(itertools.chain.from_iterable(arrays))))
+
+class AddressSet(object):
+    '''Set of host addresses kept as a sorted array of packed IPv4 addresses'''
+
+    __slots__ = ("_sorted", "_pending", "other")
+
+    def __init__(self):
+        self._sorted = _empty()
+        self._pending = array(UINT32)   #packed addresses added since the array was last sorted
+        self.other = set()              #addresses that are not IPv4
+
+    def add(self, address, value=None):
+        '''Adds an address; value is its packed form, if already known (see pack_address)'''
+        if value is None:
+            value = pack_address(address)
+        if value is None:
+            self.other.add(address)
+        else:
+            self._pending.append(value)
+
+    def update(self, other):
+        '''Adds every address of another AddressSet'''
+        self._sorted = _union([self.values, other.values])
+        self.other |= other.other
+
+    @property
+    def values(self):
+        '''Sorted distinct packed IPv4 addresses'''
+        if len(self._pending):
+            self._sorted = _union([self._sorted, _sorted_unique(self._pending)])
+            self._pending = array(UINT32)
+        return self._sorted
+
+    def __len__(self):
+        return len(self.values) + len(self.other)
+
+    def __contains__(self, address):
+        value = pack_address(address)
+        if value is None:
+            return address in self.other
+        values = self.values
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            position = int(numpy.searchsorted(values, value))
+        else:
+            position = bisect.bisect_left(values, value)
+        return position < len(values) and values[position] == value
+
+    def addresses(self):
+        '''Returns the addresses as strings, IPv4 addresses first in numeric order'''
+        return unpack_addresses(self.values) + sorted(self.other)
+
+def union_addresses(address_sets):
+    '''Returns the addresses in any of the AddressSets as strings (see AddressSet.addresses)'''
+    address_sets = list(address_sets)
+    other = set()
+    for address_set in address_sets:
+        other |= address_set.other
+    return unpack_addresses(_union([address_set.values for address_set in address_sets])) + sorted(other)
+
+class PortHosts(Mapping):
+    '''
+    Hosts by (port, protocol) from a CompactScanIndex, laid out like the dict returned by
+    nmap_parse_hosts_by_port, e.g. {(80, 'tcp'): ['192.168.0.171']}
+
+    Host lists are built from the address arrays as they are looked up; union() returns
+    the hosts with any of several ports open in one pass over the arrays
+    '''
+
+    def __init__(self, port_sets):
+        self.port_sets = port_sets
+
+    def __getitem__(self, port):
+        return self.port_sets[port].addresses()
+
+    def __iter__(self):
+        return iter(self.port_sets)
+
+    def __len__(self):
+        return len(self.port_sets)
+
+    def union(self, ports):
+        '''Returns the hosts with any of the given (port, protocol) tuples open'''
+        return union_addresses(self.port_sets[port] for port in ports if port in self.port_sets)
+
+class HostPorts(Mapping):
+    '''
+    Open ports by host from a CompactScanIndex, laid out like the dict returned by
+    nmap_parse_ports_by_host, e.g. {'192.168.0.171': [(80, 'tcp'), (111, 'tcp')]}
+
+    Each lookup searches every port's address array, so prefer PortHosts for bulk work
+    '''
+
+    def __init__(self, index):
+        self.index = index
+
+    def __getitem__(self, address):
+        if address not in self.index.live:
+            raise KeyError(address)
+        return [port for port, hosts in self.index.port_sets.items() if address in hosts]
+
+    def __iter__(self):
+        return iter(self.index.live_hosts)
+
+    def __len__(self):
+        return len(self.index.live)
+
+class CompactScanIndex(object):
+    '''
+    ScanIndex with hosts kept in address arrays; offers the same live_hosts, hosts, ports,
+    web_endpoints and webhosts views and add_records / add_host / merge, but lists hosts
+    in address order rather than the order they were scanned
+
+    Scan output (XML string or file path) is always read one host at a time
+    '''
+
+    def __init__(self, scan_output=None):
+        self.live = AddressSet()
+        self.port_sets = {}     #(port, protocol) -> AddressSet of hosts with the port open
+        self.web_sets = {}      #port -> AddressSet of hosts with an http service on the port
+        if scan_output:
+            self.add_records(iter_host_records(scan_output))
+
+    def add_records(self, records):
+        '''Adds per-host records from modules.nmapxml.iter_host_records to the index'''
+        for record in records:
+            self.add_host(record['address'], record['open_ports'], record['web_ports'])
+
+    def add_host(self, address, open_ports, web_ports=()):
+        '''Adds a live host with its open (port, protocol) tuples and open http ports'''
+        value = pack_address(address)
+        self.live.add(address, value)
+        for port in open_ports:
+            hosts = self.port_sets.get(port)
+            if hosts is None:
+                hosts = self.port_sets[port] = AddressSet()
+            hosts.add(address, value)
+        for port in web_ports:
+            hosts = self.web_sets.get(port)
+            if hosts is None:
+                hosts = self.web_sets[port] = AddressSet()
+            hosts.add(address, value)
+
+    def merge(self, other):
+        '''Merges another CompactScanIndex (or ScanIndex) into this one and returns self'''
+        if not isinstance(other, CompactScanIndex):
+            for address in other.live_hosts:
+                self.add_host(address, other.hosts[address])
+            for address, port in other.web_endpoints:
+                self.add_host(address, (), [port])
+            return self
+        self.live.update(other.live)
+        for sets, other_sets in ((self.port_sets, other.port_sets), (self.web_sets, other.web_sets)):
+            for port, hosts in other_sets.items():
+                sets.setdefault(port, AddressSet()).update(hosts)
+        return self
+
+    def open_port_count(self):
+        '''Returns the number of open (host, port) pairs in the index'''
+        return sum(len(hosts) for hosts in self.port_sets.values())
+
+    @property
+    def live_hosts(self):
+        return self.live.addresses()
+
+    @property
+    def hosts(self):
+        return HostPorts(self)
+
+    @property
+    def ports(self):
+        return PortHosts(self.port_sets)
+
+    @property
+    def web_endpoints(self):
+        return [(address, port) for port in sorted(self.web_sets) for address in self.web_sets[port].addresses()]
+
+    @property
+    def webhosts(self):
+        '''Web endpoints as text suitable for passing to Nikto (host:port per line)'''
+        return "".join(address + ":" + str(port) + "\n" for address, port in self.web_endpoints)
@@ -13,19 +13,50 @@ import os
 import shutil
 import subprocess
 
+#autoenum program directory; templates and the example config are found relative to it so
+#the modules work from any working directory (e.g. when imported through modules.api)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def app_path(*parts):
+    '''Returns the path of a file shipped with autoenum (e.g. app_path("templates", "index.html"))'''
+    return os.path.join(APP_DIR, *parts)
+
 # exit routine
 def exit_program():
     print("\n\nQuitting...\n")
     sys.exit()
     
+def confirm(question, policy="ask", default=False):
+    '''
+    Returns True / False for a yes / no question according to a policy: "yes" or "no"
+    answer without asking, "ask" prompts the user; an empty answer (or no terminal to
+    read one from) gives the default
+    '''
+    if policy in ("yes", "no"):
+        return policy == "yes"
+    try:
+        response = input(question)
+    except EOFError:
+        print("")
+        return default
+    if "y" in response or "Y" in response:
+        return True
+    if "n" in response or "N" in response:
+        return False
+    return default
+
 # cleanup old or stale files
-def cleanup_routine(output_dir):
-    '''Returns 'False' if the output directory is dirty and users select not to clean'''
+def cleanup_routine(output_dir, policy="ask", confirm=confirm):
+    '''
+    Returns 'False' if the output directory is dirty and users select not to clean
+    
+    policy is passed to confirm(), so "yes" / "no" delete or keep existing output unasked
+    (a different confirm function can be given to answer "ask" without prompting)
+    '''
     
     try:
         if not os.listdir(output_dir) == []:
-            response = input("\nOutput directory is not empty - delete existing contents? (enter no if you want to append data to existing output files)? [no] ")
-            if "y" in response or "Y" in response:
+            if confirm("\nOutput directory is not empty - delete existing contents? (enter no if you want to append data to existing output files)? [no] ", policy):
                 print("Deleting old output files...\n")
                 shutil.rmtree(output_dir, True)
             else:             
@@ -38,7 +69,7 @@ def check_config(config_file):
         pass
     else:
         print("Specified config file not found. Copying example config file...")
-        shutil.copyfile("config/default.example", config_file)
+        shutil.copyfile(app_path("config", "default.example"), config_file)
 
 def execute(command, suppress_stdout=False):
     '''
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Delta scanning functions for autoenum
+
+Compares the enumeration results of the current run against the most recent
+previous run of the same target (found through scan_history.csv) so that script
+scans only need to cover services which are new or have changed.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import csv
+import logging
+
+from modules.nmapxml import iter_host_records, find_xml_file
+from modules.output import write_outfile
+
+ENUM_SCANS = ("nmap_tcp_enum_scan_", "nmap_udp_enum_scan_")
+
+def enum_xml_files(output_dir_nmap_xml, timestamp):
+    '''Returns the enumeration scan XML files (compressed or not) of a run which exist on disk'''
+    paths = [find_xml_file(output_dir_nmap_xml, prefix + timestamp) for prefix in ENUM_SCANS]
+    return [path for path in paths if path is not None]
+
+def previous_run(output_dir_info, output_dir_nmap_xml, target, timestamp):
+    '''
+    Returns the timestamp of the most recent earlier run against the same target which
+    has enumeration XML output, or None if there is no such run
+    '''
+    history_path = os.path.join(output_dir_info, "scan_history.csv")
+    if not os.path.exists(history_path):
+        return None
+    previous = None
+    with open(history_path, 'r') as history_file:
+        history = csv.reader(history_file)
+        next(history, None)
+        for row in history:
+            if len(row) < 2 or row[1] != target or row[0] >= timestamp:
+                continue
+            if enum_xml_files(output_dir_nmap_xml, row[0]) and (previous is None or row[0] > previous):
+                previous = row[0]
+    return previous
+
+def service_tuples(xml_sources):
+    '''
+    Returns the set of open (host, port, protocol, service) tuples from nmap XML outputs
+    
+    e.g. {('192.168.0.171', 80, 'tcp', 'http'), ('192.168.0.171', 111, 'tcp', 'rpcbind')}
+    '''
+    services = set()
+    for xml_source in xml_sources:
+        for record in iter_host_records(xml_source):
+            for port, protocol, service in record['services']:
+                services.add((record['address'], port, protocol, service))
+    return services
+
+def diff_services(old_services, new_services):
+    '''Returns sorted lists of (added, removed) service tuples between two runs'''
+    return sorted(new_services - old_services), sorted(old_services - new_services)
+
+def delta_ports(added):
+    '''
+    Returns a dict of open ports and lists of hosts (same layout as nmap_parse_hosts_by_port)
+    covering only new or changed services, for building script scan jobs
+    '''
+    ports = {}
+    for host, port, protocol, service in added:
+        hosts = ports.setdefault((port, protocol), [])
+        if host not in hosts:
+            hosts.append(host)
+    return ports
+
+def write_delta_summary(output_dir_info, timestamp, previous, added, removed):
+    '''Writes the list of added / removed services to a CSV file in the info directory'''
+    output_text = "Change,Host,Port,Protocol,Service\n"
+    for change, services in (("added", added), ("removed", removed)):
+        for host, port, protocol, service in services:
+            output_text += ",".join((change, host, str(port), protocol, service)) + "\n"
+    write_outfile(output_dir_info, "service_changes_" + timestamp + ".csv", output_text)
+    logging.info("%d service(s) added and %d removed since %s" % (len(added), len(removed), previous))
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Distributed scanning for autoenum
+
+A coordinator (autoenum.py --coordinator) hands its nmap scans - live host and
+enumeration shards and script scan sections - out as work units to any number of
+workers (autoenum.py --worker) over XML-RPC. Workers run each unit through the normal
+run_nmap_scan path and send the XML back, which the coordinator writes out exactly as
+if the scan had run locally, so reports, target lists and the index are unchanged.
+
+Units are leased to a worker, which renews the lease with progress updates while nmap
+runs; a unit whose lease runs out (worker died or lost its connection) goes back on
+the queue for another worker. Every call carries a shared token.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import gzip
+import hmac
+import time
+import socket
+import asyncio
+import logging
+import secrets
+import itertools
+import threading
+import collections
+import xmlrpc.client
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCServer
+
+import modules.nmap
+
+#seconds a worker may go without renewing its lease before the unit is reassigned
+lease_timeout = 60
+#attempts at a unit (leases that expired or failed) before the scan is given up
+max_attempts = 3
+#seconds between worker lease requests while no units are queued
+poll_interval = 2
+#seconds a worker keeps retrying once the coordinator stops answering
+worker_give_up = 60
+
+class DistributedScanError(Exception):
+    pass
+
+def parse_address(address, default_host="0.0.0.0"):
+    '''Returns (host, port) from HOST:PORT or PORT'''
+    host, separator, port = address.rpartition(":")
+    return (host or default_host), int(port)
+
+class _ThreadingXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+class Coordinator(object):
+    '''
+    Queue of scan work units served to workers over XML-RPC
+
+    Install with modules.scheduler.use_coordinator(); ScanScheduler then awaits
+    run_scan() for each job instead of launching nmap itself
+    '''
+
+    def __init__(self, address, token):
+        self.address = address
+        self.token = token
+        self.pending = collections.deque()  #units waiting for a worker
+        self.leases = {}                    #lease id -> unit
+        self.workers = {}                   #worker name -> time last seen
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.closed = threading.Event()
+        self.server = _ThreadingXMLRPCServer(parse_address(address), allow_none=True, logRequests=False)
+        for function in (self.lease, self.heartbeat, self.complete, self.fail):
+            self.server.register_function(function)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reaper, daemon=True).start()
+        host, port = self.server.server_address[:2]
+        print("Coordinator listening on %s:%d - start workers with:\n"
+              "    autoenum.py --worker <this host>:%d --token %s\n" % (host, port, port, self.token))
+        return self
+
+    def close(self):
+        self.closed.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    #-----------------------------------------------------------
+    # Scheduler side (runs on the scheduler's event loop)
+
+    async def run_scan(self, job, progress_callback=None):
+        '''Queues a scan job for the workers and returns its NmapResult once one completes it'''
+        loop = asyncio.get_running_loop()
+        scan = modules.nmap.NmapResult("", rc=None)
+        scan.task = "waiting for a worker"
+        unit = {'id': next(self.ids), 'label': job['section'], 'targets': job['targets'],
+                'options': job['options'], 'attempts': 0, 'lease': None, 'scan': scan,
+                'loop': loop, 'future': loop.create_future()}
+        with self.lock:
+            self.pending.append(unit)
+        if progress_callback:
+            progress_callback(scan)
+        try:
+            return await unit['future']
+        finally:
+            #cancelled or finished - workers still holding the unit are told to stop
+            with self.lock:
+                if unit in self.pending:
+                    self.pending.remove(unit)
+                self.leases.pop(unit['lease'], None)
+
+    def _resolve(self, unit, result=None, exception=None):
+        def resolve():
+            if not unit['future'].done():
+                if exception is not None:
+                    unit['future'].set_exception(exception)
+                else:
+                    unit['future'].set_result(result)
+        unit['loop'].call_soon_threadsafe(resolve)
+
+    def _requeue(self, unit, reason):
+        '''Puts a unit whose lease ended without a result back on the queue (lock held)'''
+        self.leases.pop(unit['lease'], None)
+        unit['lease'] = None
+        if unit['attempts'] >= max_attempts:
+            self._resolve(unit, exception=DistributedScanError(
+                "%s - giving up after %d attempts" % (reason, unit['attempts'])))
+            return
+        print("\n[!] %s - reassigning %s" % (reason, unit['label']))
+        unit['scan'].task = "waiting for a worker"
+        unit['scan'].progress = "0"
+        self.pending.appendleft(unit)
+
+    def _reaper(self):
+        while not self.closed.wait(min(5, lease_timeout / 4.0)):
+            now = time.time()
+            with self.lock:
+                for unit in list(self.leases.values()):
+                    if unit['expires'] < now:
+                        self._requeue(unit, "Worker %s stopped responding" % unit['worker'])
+
+    #-----------------------------------------------------------
+    # XML-RPC interface (runs on server threads)
+
+    def _check(self, token, worker):
+        if not hmac.compare_digest(str(token), self.token):
+            raise DistributedScanError("invalid token")
+        self.workers[worker] = time.time()
+
+    def lease(self, token, worker):
+        '''Returns the next work unit for a worker, or None if nothing is queued'''
+        self._check(token, worker)
+        with self.lock:
+            if not self.pending:
+                return None
+            unit = self.pending.popleft()
+            unit['lease'] = "%d.%d" % (unit['id'], unit['attempts'])
+            unit['attempts'] += 1
+            unit['worker'] = worker
+            unit['expires'] = time.time() + lease_timeout
+            self.leases[unit['lease']] = unit
+            unit['scan'].task = "on " + worker
+        logging.info("Leased %s to %s" % (unit['label'], worker))
+        targets = unit['targets'] if isinstance(unit['targets'], str) else list(unit['targets'])
+        return {'lease': unit['lease'], 'label': unit['label'], 'targets': targets, 'options': unit['options'],
+                'lease_timeout': lease_timeout}
+
+    def heartbeat(self, token, worker, lease, task="", progress="0"):
+        '''Renews a lease with the scan's progress; False tells the worker to stop the scan'''
+        self._check(token, worker)
+        with self.lock:
+            unit = self.leases.get(lease)
+            if unit is None or unit['worker'] != worker:
+                return False
+            unit['expires'] = time.time() + lease_timeout
+            unit['scan'].task = "%s on %s" % (task, worker) if task else "on " + worker
+            unit['scan'].progress = progress
+        return True
+
+    def complete(self, token, worker, lease, xml_data, command, rc, stderr, summary, elapsed):
+        '''Accepts the gzipped XML of a finished unit; False if the lease had been reassigned'''
+        self._check(token, worker)
+        with self.lock:
+            unit = self.leases.pop(lease, None)
+            if unit is None or unit['worker'] != worker:
+                return False
+        xml_bytes = gzip.decompress(xml_data.data)
+        xml_path = modules.nmap.spool_xml_path()
+        if xml_path:
+            with modules.nmap.open_xml_output(xml_path) as xml_file:
+                xml_file.write(xml_bytes)
+            xml_source = xml_path
+        else:
+            xml_source = xml_bytes.decode("utf-8", "replace")
+        scan = modules.nmap.NmapResult.from_xml(xml_source, command="[%s] %s" % (worker, command), rc=rc,
+                                                stderr=stderr, summary=summary, elapsed=elapsed)
+        print("%s finished on %s: %s\n" % (unit['label'], worker, summary if rc == 0 else stderr))
+        self._resolve(unit, scan)
+        return True
+
+    def fail(self, token, worker, lease, message):
+        '''Returns a unit the worker could not run to the queue'''
+        self._check(token, worker)
+        with self.lock:
+            unit = self.leases.get(lease)
+            if unit is not None and unit['worker'] == worker:
+                self._requeue(unit, "Scan failed on %s (%s)" % (worker, message))
+        return True
+
+def start_coordinator(address, token=None):
+    '''Starts a coordinator on address (HOST:PORT or PORT); a token is generated if not given'''
+    return Coordinator(address, token or secrets.token_hex(16)).start()
+
+#-----------------------------------------------------------
+# Worker
+
+def proxy_url(address):
+    return "http://%s:%d/" % parse_address(address, "localhost")
+
+def _run_unit(url, proxy, token, worker, unit, stopping, running, concurrency):
+    '''
+    Runs one leased unit, renewing the lease while nmap runs, and reports the result;
+    concurrency is the number of units the worker runs at once (which share its rate budget)
+    '''
+    finished = threading.Event()
+    
+    def keep_alive():
+        heartbeat_proxy = xmlrpc.client.ServerProxy(url, allow_none=True)
+        while not finished.wait(max(1, unit['lease_timeout'] / 4.0)):
+            scan = running.get(unit['lease'])
+            try:
+                if not heartbeat_proxy.heartbeat(token, worker, unit['lease'], scan.task if scan else "",
+                                                 scan.progress if scan else "0"):
+                    print("[!] Lease on %s was withdrawn - stopping scan" % unit['label'])
+                    if scan:
+                        scan.stop()
+                    return
+            except (OSError, xmlrpc.client.Error) as exception:
+                logging.warning("Heartbeat for %s failed: %s" % (unit['label'], exception))
+    
+    def track(scan):
+        running[unit['lease']] = scan
+    
+    print("Running %s for the coordinator" % unit['label'])
+    threading.Thread(target=keep_alive, daemon=True).start()
+    try:
+        scan = modules.nmap.run_nmap_scan(unit['targets'], unit['options'], track, concurrency)
+    except Exception as exception:
+        scan = None
+        message = str(exception)
+    finally:
+        finished.set()
+        running.pop(unit['lease'], None)
+    
+    for attempt in range(3):
+        try:
+            if scan is None or stopping.is_set():
+                proxy.fail(token, worker, unit['lease'], "worker stopped" if scan else message)
+            else:
+                xml_data = xmlrpc.client.Binary(gzip.compress((scan.stdout or "").encode("utf-8")))
+                proxy.complete(token, worker, unit['lease'], xml_data, scan.command,
+                               scan.rc if scan.rc is not None else -1, scan.stderr or "", scan.summary or "",
+                               scan.elapsed)
+            return
+        except (OSError, xmlrpc.client.ProtocolError) as exception:
+            logging.warning("Could not report %s to the coordinator: %s" % (unit['label'], exception))
+            time.sleep(poll_interval)
+
+def _worker_loop(url, token, worker, stopping, running, concurrency):
+    proxy = xmlrpc.client.ServerProxy(url, allow_none=True)
+    last_contact = None
+    while not stopping.is_set():
+        try:
+            unit = proxy.lease(token, worker)
+            last_contact = time.time()
+        except xmlrpc.client.Fault as fault:
+            print("[!] Coordinator refused worker %s: %s" % (worker, fault.faultString))
+            stopping.set()
+            return
+        except (OSError, xmlrpc.client.ProtocolError):
+            if last_contact is not None and time.time() - last_contact > worker_give_up:
+                print("Coordinator at %s has gone away - worker %s exiting" % (url, worker))
+                return
+            stopping.wait(poll_interval)
+            continue
+        if unit is None:
+            stopping.wait(poll_interval)
+            continue
+        _run_unit(url, proxy, token, worker, unit, stopping, running, concurrency)
+
+def run_worker(address, token, concurrency=1):
+    '''
+    Runs work units leased from the coordinator at address (HOST:PORT), concurrency at a
+    time, until the coordinator goes away or the worker is interrupted; with a rate budget
+    set (see modules.nmap.set_rate_budget) it is split across the running units
+    '''
+    url = proxy_url(address)
+    name = "%s:%d" % (socket.gethostname(), os.getpid())
+    concurrency = max(1, int(concurrency))
+    stopping = threading.Event()
+    running = {}    #lease -> running NmapResult
+    print("Worker %s taking up to %d scan(s) at a time from %s\n" % (name, concurrency, url))
+    threads = []
+    for number in range(concurrency):
+        worker = name if concurrency == 1 else "%s/%d" % (name, number + 1)
+        thread = threading.Thread(target=_worker_loop, args=(url, token, worker, stopping, running, concurrency),
+                                  daemon=True)
+        thread.start()
+        threads.append(thread)
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("Keyboard Interrupt - Killing Running Nmap Scans and returning them to the coordinator!")
+        stopping.set()
+        for scan in list(running.values()):
+            scan.stop()
+        for thread in threads:
+            thread.join(10)
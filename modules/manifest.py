@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Output manifest functions for autoenum
+
+Every HTML report is recorded in the run state database (see modules.state) as soon
+as it is written, along with the run it belongs to, so the HTML index can be built
+from the manifest one run at a time instead of listing every output directory.
+Output trees from before the manifest existed are imported on first use.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import re
+import csv
+import logging
+
+#HTML report kinds, listed under "Enumeration results" and "Service scan results"
+ENUM_REPORTS = "enum"
+SERVICE_REPORTS = "service"
+
+RUN_TIMESTAMP = re.compile(r'_(\d{4}-\d\d-\d\d_\d\d\.\d\d\.\d\d)\.html$')
+
+def open_manifest(conn):
+    '''Creates the manifest tables in the run state database if needed and returns conn'''
+    conn.execute("CREATE TABLE IF NOT EXISTS artifacts (timestamp TEXT, kind TEXT, path TEXT, "
+                 "PRIMARY KEY (timestamp, path))")
+    conn.execute("CREATE TABLE IF NOT EXISTS manifest_meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.commit()
+    return conn
+
+def record_artifact(conn, timestamp, kind, path):
+    '''Records an HTML report (path relative to the main output directory) for a run'''
+    conn.execute("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?)", (timestamp, kind, path.replace(os.sep, "/")))
+    conn.commit()
+
+def import_existing_output(conn, output_dir, output_dir_info, report_dirs):
+    '''
+    Imports runs from scan_history.csv and HTML reports from the report directories (dict
+    of kind -> directory name) of output trees written before the manifest existed; this
+    only happens once per output directory
+    '''
+    if conn.execute("SELECT value FROM manifest_meta WHERE key = 'imported'").fetchone():
+        return
+    history_path = os.path.join(output_dir_info, "scan_history.csv")
+    if os.path.exists(history_path):
+        with open(history_path, 'r') as history_file:
+            history = csv.reader(history_file)
+            next(history, None)
+            conn.executemany("INSERT OR IGNORE INTO runs VALUES (?, ?, ?)",
+                             (row[:3] for row in history if len(row) >= 3))
+    for kind, directory in report_dirs.items():
+        report_path = os.path.join(output_dir, directory)
+        if not os.path.exists(report_path):
+            continue
+        for fname in os.listdir(report_path):
+            match = RUN_TIMESTAMP.search(fname)
+            if match:
+                conn.execute("INSERT OR IGNORE INTO artifacts VALUES (?, ?, ?)",
+                             (match.group(1), kind, directory + "/" + fname))
+            else:
+                logging.debug("No run timestamp in report name " + fname)
+    conn.execute("INSERT OR REPLACE INTO manifest_meta VALUES ('imported', '1')")
+    conn.commit()
+
+def run_count(conn):
+    return conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+def iter_runs(conn, offset=0, limit=-1):
+    '''Yields (timestamp, target, config) for recorded runs in chronological order'''
+    return conn.execute("SELECT timestamp, target, config FROM runs ORDER BY timestamp LIMIT ? OFFSET ?",
+                        (limit, offset))
+
+def get_run(conn, timestamp):
+    '''Returns (timestamp, target, config) for a recorded run, or None'''
+    return conn.execute("SELECT timestamp, target, config FROM runs WHERE timestamp = ?", (timestamp,)).fetchone()
+
+def iter_run_artifacts(conn, timestamp, kind):
+    '''Yields the report paths of a kind recorded for a run, in name order'''
+    for row in conn.execute("SELECT path FROM artifacts WHERE timestamp = ? AND kind = ? ORDER BY path",
+                            (timestamp, kind)):
+        yield row[0]
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Run profile instrumentation for autoenum
+
+Each stage of a run (live host scan, enumeration scans, script sections, nikto, report
+rendering, target list and index writes) is recorded with its wall time, the CPU time
+and peak memory of the child processes (nmap, nikto) it waited for according to
+getrusage, and host / port counts and bytes written where they apply.
+
+Records are appended to profile_<timestamp>.jsonl in the info output directory as
+each stage finishes, so an interrupted run keeps the profile of the stages it got
+through; a Prometheus textfile collector file can also be written at the end.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import sys
+import json
+import time
+import logging
+import resource
+import contextlib
+
+_profile = None
+
+def _child_usage():
+    '''Returns (user seconds, system seconds, peak RSS in KB) of all waited-for children'''
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    max_rss = usage.ru_maxrss
+    if sys.platform == "darwin":
+        max_rss //= 1024    #bytes on macOS, KB elsewhere
+    return usage.ru_utime, usage.ru_stime, max_rss
+
+def file_bytes(*paths):
+    '''Returns the combined size of the files that exist among paths'''
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except (OSError, TypeError):
+            pass
+    return total
+
+class RunProfile(object):
+    '''
+    Collects stage records for one run and appends them to the run's JSONL profile
+
+    Child process usage comes from RUSAGE_CHILDREN, which only covers children once they
+    have exited and been waited for, so a stage's child CPU time is that of the processes
+    it ran to completion; stages which overlap (e.g. script sections running side by side)
+    are recorded with their own wall time and counts, and the child usage of the whole
+    group goes to the enclosing stage. Peak RSS is the largest child seen so far in the
+    run, as getrusage does not report it per child.
+    '''
+
+    def __init__(self, output_dir_info, timestamp):
+        if not os.path.exists(output_dir_info):
+            os.makedirs(output_dir_info)
+        self.path = os.path.join(output_dir_info, "profile_" + timestamp + ".jsonl")
+        self.timestamp = timestamp
+        self.records = []
+        self.started = time.time()
+        self._start_usage = _child_usage()
+
+    def record(self, stage, **fields):
+        '''Appends a record for a stage to the profile and returns it'''
+        record = dict(fields, run=self.timestamp, stage=stage)
+        self.records.append(record)
+        try:
+            with open(self.path, 'a') as profile_file:
+                profile_file.write(json.dumps(record, sort_keys=True) + "\n")
+        except OSError as exception:
+            logging.warning("Could not write run profile %s: %s" % (self.path, exception))
+        return record
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        '''
+        Context manager timing a stage; yields a dict which the stage can fill in with
+        counts (e.g. hosts, ports, bytes) before the record is written
+        '''
+        counts = dict(fields)
+        before = _child_usage()
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield counts
+        except BaseException:
+            counts['interrupted'] = True
+            raise
+        finally:
+            after = _child_usage()
+            self.record(name, start=round(start, 3),
+                        wall_seconds=round(time.perf_counter() - started, 3),
+                        child_user_seconds=round(after[0] - before[0], 3),
+                        child_system_seconds=round(after[1] - before[1], 3),
+                        child_max_rss_kb=after[2],
+                        **counts)
+
+    def finish(self):
+        '''Records the totals for the whole run'''
+        usage = _child_usage()
+        return self.record("run", start=round(self.started, 3),
+                           wall_seconds=round(time.time() - self.started, 3),
+                           child_user_seconds=round(usage[0] - self._start_usage[0], 3),
+                           child_system_seconds=round(usage[1] - self._start_usage[1], 3),
+                           child_max_rss_kb=usage[2])
+
+    def write_textfile(self, path):
+        '''
+        Writes the stage records as Prometheus gauges (for the node_exporter textfile
+        collector), summing repeated stages; the file is replaced in one step so the
+        collector never reads a partial file
+        '''
+        totals = {}     #stage -> {metric: value}
+        for record in self.records:
+            stage_totals = totals.setdefault(record['stage'], {})
+            for field, metric in PROMETHEUS_METRICS:
+                value = record.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    if field == "child_max_rss_kb":
+                        stage_totals[metric] = max(stage_totals.get(metric, 0), value * 1024)
+                    else:
+                        stage_totals[metric] = stage_totals.get(metric, 0) + value
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path + ".tmp", 'w') as textfile:
+            for field, metric in PROMETHEUS_METRICS:
+                textfile.write("# HELP autoenum_%s %s\n# TYPE autoenum_%s gauge\n" %
+                               (metric, PROMETHEUS_HELP[metric], metric))
+                for stage in totals:
+                    if metric in totals[stage]:
+                        textfile.write('autoenum_%s{stage="%s"} %s\n' % (metric, _label(stage), totals[stage][metric]))
+            textfile.write("# HELP autoenum_last_run_timestamp_seconds Start time of the last autoenum run\n"
+                           "# TYPE autoenum_last_run_timestamp_seconds gauge\n"
+                           "autoenum_last_run_timestamp_seconds %d\n" % self.started)
+        os.replace(path + ".tmp", path)
+
+#record field -> Prometheus metric name
+PROMETHEUS_METRICS = [("wall_seconds", "stage_wall_seconds"),
+                      ("nmap_seconds", "stage_nmap_seconds"),
+                      ("child_user_seconds", "stage_child_user_seconds"),
+                      ("child_system_seconds", "stage_child_system_seconds"),
+                      ("child_max_rss_kb", "stage_child_max_rss_bytes"),
+                      ("hosts", "stage_hosts"),
+                      ("ports", "stage_ports"),
+                      ("bytes", "stage_bytes_written")]
+
+PROMETHEUS_HELP = {"stage_wall_seconds": "Wall clock time of the stage",
+                   "stage_nmap_seconds": "Run time of the nmap scans behind the stage",
+                   "stage_child_user_seconds": "User CPU time of child processes run by the stage",
+                   "stage_child_system_seconds": "System CPU time of child processes run by the stage",
+                   "stage_child_max_rss_bytes": "Peak resident memory of any child process so far",
+                   "stage_hosts": "Hosts handled by the stage",
+                   "stage_ports": "Open ports handled by the stage",
+                   "stage_bytes_written": "Bytes of output written by the stage"}
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def start_run_profile(output_dir_info, timestamp):
+    '''Starts recording the profile of a run; returns the RunProfile'''
+    global _profile
+    _profile = RunProfile(output_dir_info, timestamp)
+    return _profile
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    '''Times a stage of the current run (see RunProfile.stage); a no-op without a profile'''
+    if _profile is None:
+        yield dict(fields)
+    else:
+        with _profile.stage(name, **fields) as counts:
+            yield counts
+
+def record(name, **fields):
+    '''Records a stage of the current run that was timed elsewhere'''
+    if _profile is not None:
+        return _profile.record(name, **fields)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Nikto scanning functions for autoenum
+
+Web endpoints are scanned by a pool of concurrent nikto processes, one endpoint per
+process, so a slow or tarpitting host only holds up its own worker. Each endpoint is
+given a time budget (passed to nikto as -maxtime, and enforced by killing the process
+group if nikto overruns it) and gets its own HTML report, with nikto's console output
+kept alongside it in a text file; runs keep both in a nikto subdirectory of the
+service output.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import re
+import time
+import signal
+import asyncio
+import subprocess
+
+#seconds nikto gets past its -maxtime to write its report before it is killed
+kill_grace = 30
+
+class NiktoNotFound(Exception):
+    pass
+
+def report_name(endpoint, timestamp):
+    '''Returns the report file name (without extension) for a host:port endpoint'''
+    return "http-nikto_" + re.sub(r'[^\w.-]', '_', endpoint) + "_" + timestamp
+
+def _kill_process_group(pid, sig):
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+async def _scan_endpoint(endpoint, report_path, host_timeout, semaphore):
+    '''Runs nikto against one endpoint; returns "complete", "failed" or "timeout"'''
+    async with semaphore:
+        with open(report_path + ".txt", 'w') as console:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    "nikto", "-h", endpoint, "-o", report_path + ".html", "-maxtime", "%ds" % host_timeout,
+                    stdin=subprocess.DEVNULL, stdout=console, stderr=subprocess.STDOUT, start_new_session=True)
+            except FileNotFoundError:
+                raise NiktoNotFound()
+            try:
+                returncode = await asyncio.wait_for(process.wait(), host_timeout + kill_grace)
+            except asyncio.TimeoutError:
+                _kill_process_group(process.pid, signal.SIGKILL)
+                await process.wait()
+                return "timeout"
+            except asyncio.CancelledError:
+                _kill_process_group(process.pid, signal.SIGTERM)
+                try:
+                    await asyncio.wait_for(process.wait(), 5)
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    _kill_process_group(process.pid, signal.SIGKILL)
+                raise
+    return "complete" if returncode == 0 else "failed"
+
+async def run_nikto_scans_async(endpoints, output_dir, timestamp, workers, host_timeout, on_complete=None):
+    semaphore = asyncio.Semaphore(max(1, int(workers)))
+    results = []
+
+    async def scan(endpoint):
+        report_path = os.path.join(output_dir, report_name(endpoint, timestamp))
+        started = time.perf_counter()
+        status = await _scan_endpoint(endpoint, report_path, host_timeout, semaphore)
+        result = (endpoint, report_name(endpoint, timestamp) + ".html", status, time.perf_counter() - started)
+        results.append(result)
+        print("[%d/%d] Nikto scan of %s - %s" % (len(results), len(endpoints), endpoint, status))
+        if on_complete:
+            on_complete(*result)
+
+    tasks = [asyncio.ensure_future(scan(endpoint)) for endpoint in endpoints]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return results
+
+def run_nikto_scans(endpoints, output_dir, timestamp, workers=4, host_timeout=600, on_complete=None):
+    '''
+    Scans web endpoints (host:port strings, e.g. from nmap_parse_webhosts) with up to
+    workers nikto processes at once, each limited to host_timeout seconds
+
+    on_complete(endpoint, report file name, status, seconds) is called as each endpoint
+    finishes, where status is "complete", "failed" or "timeout"; returns the list of those
+    tuples. On keyboard interrupt the running nikto processes are killed.
+    '''
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    print("Running Nikto against %d web endpoint(s), %d at a time (%d seconds per host)...\n" %
+          (len(endpoints), workers, host_timeout))
+    try:
+        return asyncio.run(run_nikto_scans_async(endpoints, output_dir, timestamp, workers, host_timeout, on_complete))
+    except KeyboardInterrupt:
+        print("Keyboard Interrupt - Nikto Scan Operation Killed")
+    except NiktoNotFound:
+        print("Nikto could not be executed - ensure it is installed and in your path")
+    return []
@@ -9,28 +9,204 @@ See README.md for licensing information and credits
 
 '''
 
+import re
 import time
+import itertools
+import shlex
+import shutil
+import signal
+import asyncio
 import datetime
 import logging
 import os
 import subprocess
-from libnmap.process import NmapProcess
 from libnmap.parser import NmapParser, NmapParserException
 from modules.output import write_outfile
+from modules.nmapxml import (iter_host_records, is_xml_path, merge_nmap_xml, open_xml_output, open_xml_source,
+                             read_xml_text, xml_extension)
+from modules.render import render_in_background
+from modules.slots import NmapSlots
+from modules.compact import CompactScanIndex
 #from libnmap.objects import NmapReport
 
-def run_nmap_scan(scan_targets, scan_options):
+status_update_interval = 5
+
+#options always passed to nmap: XML output on stdout with regular progress updates
+NMAP_FIXED_OPTIONS = ["-oX", "-", "-vvv", "--stats-every", "1s"]
+
+TASKPROGRESS = re.compile(r'<taskprogress task="([^"]*)" time="\d+" percent="([\d.]+)"(?: remaining="\d+")? etc="(\d+)"')
+FINISHED_SUMMARY = re.compile(r'<finished [^>]*summary="([^"]*)"')
+
+#directory / file extension scan XML is written to as it arrives (see start_xml_spool)
+_spool_dir = None
+_spool_extension = ".xml"
+_spool_names = itertools.count(1)
+
+#machine-wide limit on running nmap processes (see limit_nmap_processes)
+_nmap_slots = None
+
+def limit_nmap_processes(slots):
     '''
-    Accepts scan targets and scan options for NmapProcess and launches scan
-    Prints scan status updates and summary to stdout
-    Returns NmapProcess object for further use
+    Makes every nmap launch wait for a free slot of a modules.slots.NmapSlots limit, which
+    may be shared with other autoenum processes; None removes the limit
+    '''
+    global _nmap_slots
+    _nmap_slots = slots
+
+#packets-per-second budget shared by running scans (see set_rate_budget)
+_rate_budget = None
+
+def set_rate_budget(budget):
+    '''
+    Splits a modules.rate.RateBudget across the scans of this process with --max-rate;
+    None removes the budget
+    '''
+    global _rate_budget
+    _rate_budget = budget
+
+def start_xml_spool(directory, compression=""):
+    '''
+    Makes nmap scans write their XML straight to files in directory (gzip / zstd compressed
+    if requested) as it arrives, instead of collecting it in memory; results then refer
+    to their file through NmapResult.xml_path
     
-    TODO - catch keyboard interrupts and kill tasks so we can exit gracefully!
-            nmap_proc.stop does not appear to fully kill threads in script scans
-            so program will continue to execute but leaves an orphaned nmap process
+    Spooled files are meant to be moved into place as the final XML artifact (see
+    store_xml) or removed once merged into other output (see merge_xml_sources)
     '''
-    status_update_interval = 5
+    global _spool_dir, _spool_extension
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    _spool_dir = directory
+    _spool_extension = xml_extension(compression)
+
+def spool_xml_path():
+    '''Returns a new spool file path, or None if scan XML is kept in memory'''
+    if _spool_dir is None:
+        return None
+    return os.path.join(_spool_dir, ".scan_%d_%d%s" % (os.getpid(), next(_spool_names), _spool_extension))
+
+def _is_spooled(xml_source):
+    return (_spool_dir is not None and is_xml_path(xml_source) and
+            os.path.dirname(xml_source) == _spool_dir and os.path.basename(xml_source).startswith(".scan_"))
+
+def discard_spooled(xml_source):
+    '''Removes a spooled scan XML file once its contents have been used'''
+    if _is_spooled(xml_source) and os.path.exists(xml_source):
+        os.remove(xml_source)
+
+def merge_xml_sources(xml_sources):
+    '''
+    Merges scan XML sources (see NmapResult.xml_source) into a single source, spooled to
+    disk if scan XML is being spooled; spooled inputs are removed once merged
+    '''
+    merged = merge_nmap_xml(xml_sources, spool_xml_path())
+    for xml_source in xml_sources:
+        if xml_source is not merged:
+            discard_spooled(xml_source)
+    return merged
+
+def store_xml(xml_source, xml_path):
+    '''
+    Saves scan XML as the artifact at xml_path; spooled files are moved into place rather
+    than copied, and the compression of xml_path follows its extension
+    '''
+    if _is_spooled(xml_source) and os.path.splitext(xml_source)[1] == os.path.splitext(xml_path)[1]:
+        os.replace(xml_source, xml_path)
+        return
+    outfile = open_xml_output(xml_path)
+    try:
+        if is_xml_path(xml_source):
+            with open_xml_source(xml_source) as infile:
+                shutil.copyfileobj(infile, outfile)
+        else:
+            outfile.write(xml_source.encode("utf-8"))
+    finally:
+        outfile.close()
+    discard_spooled(xml_source)
+
+class NmapResult(object):
+    '''
+    A running or completed nmap scan; exposes the attributes autoenum previously used from
+    libnmap NmapProcess objects (command, stdout, stderr, rc, summary, progress, etc)
+    
+    Scans run while an XML spool is active (see start_xml_spool) keep their XML on disk at
+    xml_path; stdout then reads the whole file back, so prefer passing xml_source to the
+    streaming readers in modules.nmapxml
     
+    Results that were assembled rather than run directly (e.g. merged shards) only have
+    the output attributes filled in
+    '''
+    def __init__(self, command, stdout="", rc=0, stderr="", summary="", xml_path=None, elapsed=0.0):
+        self.command = command
+        self._stdout = stdout
+        self.xml_path = xml_path
+        self.rc = rc
+        self.stderr = stderr
+        self.summary = summary
+        self.task = ""
+        self.progress = "0"
+        self.etc = 0
+        self.pid = None
+        self.elapsed = elapsed      #seconds nmap ran for (summed over merged scans)
+        self.missing = 0            #merged scans (e.g. shards) that did not finish
+    
+    @classmethod
+    def from_xml(cls, xml_source, command="", rc=0, stderr="", summary="", elapsed=0.0):
+        '''Returns a completed result for scan XML given as a string or file path'''
+        if is_xml_path(xml_source):
+            return cls(command, rc=rc, stderr=stderr, summary=summary, xml_path=xml_source, elapsed=elapsed)
+        return cls(command, xml_source, rc=rc, stderr=stderr, summary=summary, elapsed=elapsed)
+    
+    @property
+    def stdout(self):
+        if self.xml_path is not None:
+            return read_xml_text(self.xml_path)
+        return self._stdout
+    
+    @stdout.setter
+    def stdout(self, value):
+        self._stdout = value
+    
+    @property
+    def complete(self):
+        '''True if nmap exited cleanly and every merged scan finished'''
+        return self.rc == 0 and not self.missing
+    
+    @property
+    def xml_source(self):
+        '''The scan XML file path if spooled to disk, otherwise the XML string'''
+        return self.xml_path if self.xml_path is not None else self._stdout
+    
+    def is_running(self):
+        return self.pid is not None and self.rc is None
+    
+    def stop(self):
+        '''Kills the nmap process group (nmap and any helper processes it started)'''
+        if self.is_running():
+            _kill_process_group(self.pid, signal.SIGTERM)
+
+def _kill_process_group(pid, sig):
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def nmap_command(scan_targets, scan_options):
+    '''
+    Returns the nmap command line (as a list) for the targets and options
+    
+    Targets may be a list or a whitespace delimited string; options are split with shell
+    quoting rules so quoted script expressions stay intact
+    '''
+    nmap_binary = shutil.which("nmap")
+    if nmap_binary is None:
+        raise EnvironmentError(1, "nmap is not installed or could not be found in system path")
+    if isinstance(scan_targets, str):
+        scan_targets = scan_targets.split()
+    return [nmap_binary] + NMAP_FIXED_OPTIONS + shlex.split(scan_options) + list(scan_targets)
+
+def privileged_options(scan_options):
+    '''Disables scan options that require root when not running as root'''
     #Check for sudo and disable scan options that require root
     if os.getuid()!=0:
         logging.warn("Certain nmap scans require root privileges (SYN, UDP, ICMP, etc)...")
@@ -41,93 +217,291 @@ def run_nmap_scan(scan_targets, scan_options):
         scan_options = scan_options.replace("-sn", "")
         scan_options = scan_options.replace("-sV", "")
         scan_options = scan_options.replace("-O", "")
+    return scan_options
+
+def print_scan_status(scan):
+    '''Prints the nmap progress line for a running scan'''
+    #Nmap only updates ETC periodically and will sometimes return a result that is behind current system time
+    etctime = datetime.datetime.fromtimestamp(int(scan.etc))
+    systime = datetime.datetime.now().replace(microsecond=0)
+    if etctime < systime:
+        etctime = systime
+    timeleft = etctime - systime
+    print("{0} Timing: About {1}% done; ETC: {2} ({3} remaining)".format(scan.task, scan.progress, etctime, timeleft))
+
+def _release_launch(slot, share):
+    '''Returns the process slot and rate budget share taken to launch a scan'''
+    NmapSlots.release(slot)
+    if share is not None and _rate_budget is not None:
+        _rate_budget.release(share)
+
+async def run_nmap_scan_async(scan_targets, scan_options, progress_callback=None, scan=None, concurrency=1):
+    '''
+    Accepts scan targets and scan options and runs nmap as an asyncio subprocess
+    Returns an NmapResult object once nmap exits
     
-    nmap_proc = NmapProcess(targets=scan_targets, options=scan_options)
-    print("Running scan command:\n"+nmap_proc.command)
-    nmap_proc.run_background()
+    Progress is parsed from the --stats-every updates in the XML stream as it arrives and
+    printed every few seconds; if progress_callback is given it is called with the running
+    NmapResult at launch and on every progress update instead, so that callers running
+    several scans at once can report combined progress
     
-    while nmap_proc.is_running():
-        try:
-            time.sleep(status_update_interval)
-            
-            if float(nmap_proc.progress) > 0:
-                
-                #Nmap only updates ETC periodically and will sometimes return a result that is behind current system time
-                etctime = datetime.datetime.fromtimestamp(int(nmap_proc.etc))
-                systime = datetime.datetime.now().replace(microsecond=0)
-                if etctime < systime:
-                    etctime = systime
-                timeleft = etctime - systime
-                print("{0} Timing: About {1}% done; ETC: {2} ({3} remaining)".format(nmap_proc.current_task.name, nmap_proc.progress, etctime, timeleft))
-        except KeyboardInterrupt:
-            print("Keyboard Interrupt - Killing Current Nmap Scan!")
-            nmap_proc.stop()
+    nmap runs in its own process group, which is killed if the scan task is cancelled; with
+    a process limit set (see limit_nmap_processes) nmap is only launched once a slot is free
+    
+    With a rate budget set (see set_rate_budget) the scan is launched with --max-rate set
+    to its share of the budget, sized for concurrency scans running side by side
+    '''
+    slot = await _nmap_slots.acquire() if _nmap_slots else None
+    share = None
+    try:
+        scan_options = privileged_options(scan_options)
+        if _rate_budget is not None:
+            share = await _rate_budget.acquire(concurrency)
+            scan_options, rate = _rate_budget.apply(scan_options, share)
+            _rate_budget.give_back(share - rate)
+            share = rate
+        command = nmap_command(scan_targets, scan_options)
+        if scan is None:
+            scan = NmapResult(" ".join(shlex.quote(arg) for arg in command), "", rc=None)
+        else:
+            scan.command = " ".join(shlex.quote(arg) for arg in command)
+            scan.rc = None
+        print("Running scan command:\n"+scan.command)
         
-    if nmap_proc.rc == 0:
-        print(nmap_proc.summary + "\n")
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(*command, stdin=subprocess.DEVNULL,
+                                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                                       start_new_session=True)
+    except BaseException:
+        _release_launch(slot, share)
+        raise
+    scan.pid = process.pid
+    if progress_callback:
+        progress_callback(scan)
+    
+    async def read_stderr():
+        return (await process.stderr.read()).decode("utf-8", "replace")
+    stderr_task = asyncio.ensure_future(read_stderr())
+    
+    #XML is written to the spool file as it arrives (or collected in memory without a
+    #spool); only the tail is kept around to pick up the run summary
+    scan.xml_path = spool_xml_path()
+    xml_file = open_xml_output(scan.xml_path) if scan.xml_path else None
+    chunks = []
+    pending = ""
+    tail = ""
+    last_status = time.time()
+    try:
+        while True:
+            chunk = await process.stdout.read(65536)
+            if not chunk:
+                break
+            if xml_file:
+                xml_file.write(chunk)
+            else:
+                chunks.append(chunk)
+            text = chunk.decode("utf-8", "replace")
+            tail = (tail + text)[-4096:]
+            #only look for progress in complete lines
+            lines, newline, pending = (pending + text).rpartition("\n")
+            for match in TASKPROGRESS.finditer(lines):
+                scan.task, scan.progress, scan.etc = match.group(1), match.group(2), int(match.group(3))
+            if lines and progress_callback:
+                progress_callback(scan)
+            elif float(scan.progress) > 0 and time.time() - last_status >= status_update_interval:
+                print_scan_status(scan)
+                last_status = time.time()
+        scan.rc = await process.wait()
+        scan.stderr = await stderr_task
+    except asyncio.CancelledError:
+        _kill_process_group(process.pid, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), 5)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            _kill_process_group(process.pid, signal.SIGKILL)
+        stderr_task.cancel()
+        scan.rc = process.returncode if process.returncode is not None else -signal.SIGKILL
+        raise
+    finally:
+        _release_launch(slot, share)
+        scan.elapsed = time.perf_counter() - started
+        if xml_file:
+            xml_file.close()
+        else:
+            scan.stdout = b"".join(chunks).decode("utf-8", "replace")
+    
+    summary = FINISHED_SUMMARY.search(tail)
+    scan.summary = summary.group(1) if summary else ""
+    
+    if scan.rc == 0:
+        print(scan.summary + "\n")
     else:
-        print(nmap_proc.stderr + "\n")
+        print(scan.stderr + "\n")
     
-    return nmap_proc
+    return scan
+
+def run_nmap_scan(scan_targets, scan_options, progress_callback=None, concurrency=1):
+    '''
+    Accepts scan targets and scan options and launches an nmap scan (see run_nmap_scan_async)
+    Prints scan status updates and summary to stdout
+    Returns NmapResult object for further use
+    
+    concurrency is the number of scans expected to run side by side (e.g. from other
+    threads), which sizes this scan's share of the rate budget
+    
+    On keyboard interrupt the nmap process group is killed and the partial result returned
+    '''
+    scan = NmapResult("", "", rc=None)
+    try:
+        return asyncio.run(run_nmap_scan_async(scan_targets, scan_options, progress_callback, scan, concurrency))
+    except KeyboardInterrupt:
+        print("Keyboard Interrupt - Killing Current Nmap Scan!")
+        if scan.rc is None:
+            scan.stop()
+            scan.rc = -signal.SIGTERM
+        return scan
 
 def nmap_out_to_html(scan_object, output_dir, filename):
     '''
-    accepts an NmapProcess scan object and exports the scan results to HTML
-    Currently works by echoing the XML from the NmapProcess.stdout into xsltproc via pipe
+    accepts an NmapResult scan object and exports the scan results to HTML
+    
+    The report is rendered in-process (see modules.render) on the background render pool;
+    call modules.render.wait_for_renders() before relying on the file being complete
+    '''
+    nmap_xml_to_html(scan_object.xml_source, output_dir, filename)
+
+def nmap_xml_to_html(xml_source, output_dir, filename):
+    '''
+    accepts nmap XML output (string or file path) and queues an HTML export of the scan
+    results on the background render pool
+    '''
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    render_in_background(xml_source, os.path.join(output_dir, filename))
+
+def nmap_xml_to_html_xsltproc(xml_text, output_dir, filename):
+    '''
+    accepts nmap XML output (string) and exports the scan results to HTML via xsltproc
     
-    TODO - find a more pythonic way to do this instead of relying on xsltproc!
+    This was the original export method and is kept for comparison benchmarks; it relies
+    on the nmap.xsl stylesheet referenced by the XML
     '''
     
-    write_outfile(output_dir, 'temp.xml', scan_object.stdout)
-    process = subprocess.Popen(['xsltproc', '-o' , os.path.join(output_dir,filename), os.path.join(output_dir, 'temp.xml')])
+    #temp file is named after the report so that concurrent scans do not clobber each other
+    temp_file = filename + '.temp.xml'
+    write_outfile(output_dir, temp_file, xml_text)
+    process = subprocess.Popen(['xsltproc', '-o' , os.path.join(output_dir,filename), os.path.join(output_dir, temp_file)])
     output = process.communicate()[0] #run our commands
-    os.remove(os.path.join(output_dir,'temp.xml'))
+    os.remove(os.path.join(output_dir,temp_file))
     
 
-def nmap_parse_ports_by_host(scan_output):
-    '''Accepts nmap scan output XML and returns a dict of hosts and tuples of corresponding
-        open ports; only live hosts and open ports should be returned.
+class ScanIndex(object):
+    '''
+    Parses nmap scan output XML once and keeps precomputed lookup maps so that the
+    various views of a scan (ports by host, hosts by port, web hosts, live hosts)
+    do not each need their own pass through NmapParser
     
-        e.g. {'192.168.0.171': [(80, 'tcp'), (111, 'tcp')]}
+    Indexes can be combined with merge() (e.g. TCP and UDP enumeration results) - open
+    ports are unioned per host rather than replaced
     
+    Scan output may be an XML string or file path (e.g. NmapResult.xml_source). With
+    stream=True it is read one host at a time instead of being loaded into a libnmap
+    NmapReport, so parsing only costs the memory of the index itself; that still grows
+    with the number of hosts and open ports (see modules.compact for a smaller index)
     '''
-    try:
-        hosts={}
-        parsed = NmapParser.parse(scan_output)
+    
+    def __init__(self, scan_output=None, stream=False):
+        self.live_hosts = []    #e.g. ['192.168.0.169', '192.168.0.171']
+        self.hosts = {}         #e.g. {'192.168.0.171': [(80, 'tcp'), (111, 'tcp')]}
+        self.ports = {}         #e.g. {(80, 'tcp'): ['192.168.0.171'], (111, 'tcp'): ['192.168.0.169', '192.168.0.171']}
+        self.web_endpoints = [] #e.g. [('192.168.0.171', 80)]
+        self._web_set = set()
         
+        if scan_output and stream:
+            self.add_records(iter_host_records(scan_output))
+        elif scan_output:
+            self.add_report(NmapParser.parse(read_xml_text(scan_output)))
+    
+    def add_records(self, records):
+        '''Adds per-host records from modules.nmapxml.iter_host_records to the index'''
+        for record in records:
+            self.add_host(record['address'], record['open_ports'], record['web_ports'])
+    
+    def add_report(self, parsed):
+        '''Adds all live hosts from a parsed NmapReport object to the index'''
         for host in parsed.hosts:
             if host.is_up():
-                hosts[host.address] =  host.get_open_ports()
+                web_ports = [service.port for service in host.services
+                             if service.state == "open" and service.service[:4] == "http"]
+                self.add_host(host.address, host.get_open_ports(), web_ports)
+        
+    def add_host(self, address, open_ports, web_ports=()):
+        '''
+        Adds a live host with its open (port, protocol) tuples and open http ports;
+        ports already recorded for the host are kept
+        '''
+        if address in self.hosts:
+            host_ports = self.hosts[address]
+        else:
+            logging.debug("live host detected - " + address)
+            self.live_hosts.append(address)
+            host_ports = self.hosts[address] = []
+        
+        for port in open_ports:
+            if port not in host_ports:
+                host_ports.append(port)
+                self.ports.setdefault(port, []).append(address)
         
-        return hosts
+        for port in web_ports:
+            if (address, port) not in self._web_set:
+                self._web_set.add((address, port))
+                self.web_endpoints.append((address, port))
+    
+    def open_port_count(self):
+        '''Returns the number of open (host, port) pairs in the index'''
+        return sum(len(port_list) for port_list in self.hosts.values())
+    
+    def merge(self, other):
+        '''Merges another ScanIndex into this one and returns self'''
+        for address in other.live_hosts:
+            self.add_host(address, other.hosts[address])
+        for address, port in other.web_endpoints:
+            self.add_host(address, (), [port])
+        return self
+    
+    @property
+    def webhosts(self):
+        '''Web endpoints as text suitable for passing to Nikto (host:port per line)'''
+        return "".join(address + ":" + str(port) + "\n" for address, port in self.web_endpoints)
+
+
+def nmap_parse_ports_by_host(scan_output):
+    '''Accepts nmap scan output XML (or a ScanIndex) and returns a dict of hosts and tuples of
+        corresponding open ports; only live hosts and open ports should be returned.
+    
+        e.g. {'192.168.0.171': [(80, 'tcp'), (111, 'tcp')]}
+    
+    '''
+    try:
+        return _scan_index(scan_output).hosts
     except:
         print("\n[!] Error parsing scan output")
         
 def nmap_parse_hosts_by_port(scan_output):
-    '''Accepts nmap scan output XML and returns a dict of open ports and lists of the corresponding
-        hosts with these ports open; only live hosts and open ports should be returned.
+    '''Accepts nmap scan output XML (or a ScanIndex) and returns a dict of open ports and lists
+        of the corresponding hosts with these ports open; only live hosts and open ports should
+        be returned.
         
         e.g. {(80, 'tcp'): ['192.168.0.171'], (111, 'tcp'): ['192.168.0.169', '192.168.0.171']} 
     '''
     try:
-        parsed = NmapParser.parse(scan_output)
-        
-        hosts={}    #e.g. {'192.168.0.171': [(80, 'tcp'), (111, 'tcp')]}
-        ports={}    #e.g. {(80, 'tcp'): ['192.168.0.171'], (111, 'tcp'): ['192.168.0.169', '192.168.0.171']}
-        
-        for host in parsed.hosts:
-            if host.is_up():
-                host_ports =  host.get_open_ports()
-                hosts[host.address] = host_ports
-                for port in host_ports:
-                    ports.setdefault(port,[]).append(host.address)
-        
-        return ports
+        return _scan_index(scan_output).ports
     except:
         print("\n[!] Error parsing scan output")
 
 def nmap_parse_webhosts(scan_output):
-    '''Accepts nmap scan output XML and returns text output suitable for passing to Nikto
+    '''Accepts nmap scan output XML (or a ScanIndex) and returns text output suitable for
+        passing to Nikto
         
         e.g:
         192.168.1.100:80
@@ -135,48 +509,35 @@ def nmap_parse_webhosts(scan_output):
     '''
     
     try:
-        webhosts = ""
-        parsed = NmapParser.parse(scan_output)
-        
-        for host in parsed.hosts:
-            if host.is_up():
-                services = host.services
-                for service in services:
-                    if (service.state == "open") and (service.service[:4]) == "http":
-                        webhosts += host.address+":"+str(service.port)+"\n"
-        
-        return webhosts
-    
+        return _scan_index(scan_output).webhosts
     except:
         print("\n[!] Error parsing scan output")
         
 def nmap_parse_live_hosts(scan_output):
-    '''Accepts nmap scan output XML and returns a list of all live hosts
+    '''Accepts nmap scan output XML (or a ScanIndex) and returns a list of all live hosts
 
     '''
     
     try:
-        live_hosts = []
-        parsed = NmapParser.parse(scan_output)
-        
-        for host in parsed.hosts:
-            if host.is_up():
-                logging.debug ("live host detected - " + host.address)
-                live_hosts.append(host.address)
-        
-        return live_hosts
+        return _scan_index(scan_output).live_hosts
     except:
         print("\n[!] Error parsing scan output")
+
+def _scan_index(scan_output):
+    '''Returns scan_output as-is if already indexed, otherwise parses it into a new ScanIndex'''
+    if isinstance(scan_output, (ScanIndex, CompactScanIndex)):
+        return scan_output
+    return ScanIndex(scan_output)
                 
     
 if __name__ == '__main__':
     #self test code goes here!!!
     target = "localhost"
-    scan_output = run_nmap_scan(target, "-sT").stdout
+    scan_index = ScanIndex(run_nmap_scan(target, "-sT").xml_source)
     
-    hosts = nmap_parse_ports_by_host(scan_output)
-    ports = nmap_parse_hosts_by_port(scan_output)
-    webhosts = nmap_parse_webhosts(scan_output)
+    hosts = nmap_parse_ports_by_host(scan_index)
+    ports = nmap_parse_hosts_by_port(scan_index)
+    webhosts = nmap_parse_webhosts(scan_index)
     print("Host array\n"+str(hosts))
     print("\nPort array \n"+str(ports))
     print("\nWebhosts \n"+ webhosts)
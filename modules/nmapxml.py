@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Nmap XML functions for autoenum
+
+Nmap XML is walked one <host> element at a time with ElementTree.iterparse and each
+element is cleared once it has been handled, so memory use stays flat regardless
+of how many hosts are in the scan output. Also includes helpers for rewriting scan
+output (e.g. splitting combined script scans back into per-section reports) which
+stream from one XML file to another, and for reading and writing gzip / zstd
+compressed XML files.
+
+See README.md for licensing information and credits
+
+'''
+
+import io
+import os
+import gzip
+import fnmatch
+import logging
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+#XML artifact file extension for each compression setting
+XML_EXTENSIONS = {'': ".xml", 'gzip': ".xml.gz", 'zstd': ".xml.zst"}
+
+def xml_extension(compression):
+    '''
+    Returns the XML file extension for a compression setting ('', 'gzip' or 'zstd');
+    zstd falls back to gzip if the zstandard module is not installed
+    '''
+    compression = (compression or "").strip().lower()
+    if compression in ("none", "no", "off"):
+        compression = ""
+    if compression not in XML_EXTENSIONS:
+        logging.warn("Unknown XML compression " + compression + " - writing uncompressed XML")
+        compression = ""
+    if compression == "zstd" and zstandard is None:
+        logging.warn("zstandard module not installed - using gzip XML compression instead")
+        compression = "gzip"
+    return XML_EXTENSIONS[compression]
+
+def find_xml_file(directory, name):
+    '''Returns the path of an existing XML file with any supported extension, or None'''
+    for extension in XML_EXTENSIONS.values():
+        path = os.path.join(directory, name + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+def is_xml_path(source):
+    '''Tells XML file paths apart from XML text when both are passed around as strings'''
+    return isinstance(source, str) and bool(source.strip()) and not source.lstrip().startswith("<")
+
+def open_xml_output(path):
+    '''Opens an XML file for binary writing, compressed according to its extension'''
+    if path.endswith(XML_EXTENSIONS['gzip']):
+        return gzip.open(path, 'wb', compresslevel=6)
+    if path.endswith(XML_EXTENSIONS['zstd']):
+        return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+    return open(path, 'wb')
+
+def open_xml_source(source):
+    '''
+    Accepts nmap XML as a string, bytes, file path (optionally gzip / zstd compressed)
+    or open file object and returns a file-like object suitable for incremental parsing
+    '''
+    if hasattr(source, "read"):
+        return source
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if not is_xml_path(source):
+        return io.StringIO(source)
+    if source.endswith(XML_EXTENSIONS['gzip']):
+        return gzip.open(source, 'rb')
+    if source.endswith(XML_EXTENSIONS['zstd']):
+        return zstandard.ZstdDecompressor().stream_reader(open(source, 'rb'), closefd=True)
+    return open(source, 'rb')
+
+def read_xml_text(source):
+    '''Returns nmap XML from any source accepted by open_xml_source as a string'''
+    if isinstance(source, str) and not is_xml_path(source):
+        return source
+    xml_file = open_xml_source(source)
+    try:
+        xml_text = xml_file.read()
+    finally:
+        if xml_file is not source:
+            xml_file.close()
+    if isinstance(xml_text, bytes):
+        xml_text = xml_text.decode("utf-8", "replace")
+    return xml_text
+
+def xml_tail(path, size=4096):
+    '''Returns the last size characters of an XML file (decompressing it if needed)'''
+    if os.path.splitext(path)[1] == XML_EXTENSIONS['']:
+        with open(path, 'rb') as xml_file:
+            xml_file.seek(0, os.SEEK_END)
+            xml_file.seek(max(0, xml_file.tell() - size))
+            return xml_file.read().decode("utf-8", "replace")
+    tail = b""
+    with open_xml_source(path) as xml_file:
+        while True:
+            chunk = xml_file.read(65536)
+            if not chunk:
+                break
+            tail = (tail + chunk)[-size:]
+    return tail.decode("utf-8", "replace")
+
+def iter_host_elements(source):
+    '''
+    Yields each <host> element from nmap XML output as soon as it has been fully read
+
+    Elements are cleared after the consumer moves on to the next host, so callers
+    must pull out anything they need before asking for the next element
+    '''
+    xml_file = open_xml_source(source)
+    root = None
+    try:
+        for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag == "host":
+                yield elem
+                elem.clear()
+                root.clear()
+    finally:
+        if xml_file is not source:
+            xml_file.close()
+
+def host_record(elem):
+    '''
+    Converts a <host> element into a lightweight per-host record
+
+    e.g. {'address': '192.168.0.171', 'up': True,
+          'open_ports': [(80, 'tcp'), (111, 'tcp')], 'web_ports': [80],
+          'services': [(80, 'tcp', 'http'), (111, 'tcp', 'rpcbind')]}
+    '''
+    addresses = {}
+    for addr in elem.iter("address"):
+        addresses.setdefault(addr.get("addrtype"), addr.get("addr"))
+
+    status = elem.find("status")
+
+    open_ports = []
+    web_ports = []
+    services = []
+    for port in elem.iter("port"):
+        state = port.find("state")
+        if state is None or state.get("state") != "open":
+            continue
+        portid = int(port.get("portid"))
+        open_ports.append((portid, port.get("protocol")))
+        service = port.find("service")
+        service_name = service.get("name", "") if service is not None else ""
+        services.append((portid, port.get("protocol"), service_name))
+        if service_name[:4] == "http":
+            web_ports.append(portid)
+
+    return {
+        'address': addresses.get("ipv4") or addresses.get("ipv6") or "",
+        'up': status is not None and status.get("state") == "up",
+        'open_ports': open_ports,
+        'web_ports': web_ports,
+        'services': services,
+    }
+
+def iter_host_records(source, live_only=True):
+    '''
+    Yields per-host records (see host_record) from nmap XML output without building
+    the full document in memory; by default only live hosts are returned
+    '''
+    for elem in iter_host_elements(source):
+        record = host_record(elem)
+        if record['up'] or not live_only:
+            yield record
+        else:
+            logging.debug("skipping host that is not up - " + record['address'])
+
+def xml_prolog(xml_text):
+    '''
+    Returns everything before the <nmaprun> root element (XML declaration, DOCTYPE and
+    the xml-stylesheet instruction used by xsltproc), which ElementTree does not keep
+    '''
+    root_start = xml_text.find("<nmaprun")
+    if root_start < 0:
+        return ""
+    return xml_text[:root_start]
+
+def _xml_head(source, size=4096):
+    '''Returns the first size characters of an XML string or file'''
+    if hasattr(source, "read"):
+        return ""
+    if isinstance(source, str) and not is_xml_path(source):
+        return source[:size]
+    xml_file = open_xml_source(source)
+    try:
+        head = xml_file.read(size)
+    finally:
+        xml_file.close()
+    if isinstance(head, bytes):
+        head = head.decode("utf-8", "replace")
+    return head
+
+def _is_empty(source):
+    if is_xml_path(source):
+        return not os.path.exists(source) or os.path.getsize(source) == 0
+    return not source or not source.strip()
+
+def _iter_root_children(source):
+    '''
+    Yields the <nmaprun> root element as soon as it starts (only its attributes are
+    filled in at that point), then each direct child of the root once it has been
+    fully read; children are released after the consumer moves on
+    '''
+    xml_file = open_xml_source(source)
+    root = None
+    depth = 0
+    try:
+        for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = elem
+                    yield elem
+                continue
+            depth -= 1
+            if depth == 1:
+                yield elem
+                root.clear()
+    finally:
+        if xml_file is not source:
+            xml_file.close()
+
+def _start_tag(elem):
+    attributes = "".join(" %s=%s" % (name, quoteattr(value)) for name, value in elem.attrib.items())
+    return "<%s%s>\n" % (elem.tag, attributes)
+
+def _open_output(outfile_path):
+    if outfile_path is None:
+        return io.StringIO()
+    return io.TextIOWrapper(open_xml_output(outfile_path), encoding="utf-8")
+
+def _close_output(outfile, outfile_path):
+    if outfile_path is None:
+        return outfile.getvalue()
+    outfile.close()
+    return outfile_path
+
+def _matches_scripts(script_id, script_patterns):
+    for pattern in script_patterns:
+        if fnmatch.fnmatchcase(script_id, pattern):
+            return True
+    return False
+
+def _filter_scripts(parent, script_patterns):
+    for script in parent.findall("script"):
+        if not _matches_scripts(script.get("id", ""), script_patterns):
+            parent.remove(script)
+
+def filter_nmap_xml(xml_source, hosts, ports, script_patterns, outfile_path=None):
+    '''
+    Returns a copy of nmap XML output (string or file) restricted to the given hosts, port
+    numbers and script ids (fnmatch patterns, e.g. 'snmp*'); used to split a combined
+    script scan back into per-section reports
+    
+    The output is streamed one host at a time to outfile_path (compressed according to
+    its extension) and the path returned; without outfile_path the XML is returned as
+    a string
+    '''
+    hosts = set(hosts)
+    ports = set(int(port) for port in ports)
+    outfile = _open_output(outfile_path)
+    try:
+        outfile.write(xml_prolog(_xml_head(xml_source)))
+        children = _iter_root_children(xml_source)
+        outfile.write(_start_tag(next(children)))
+        for child in children:
+            if child.tag == "host":
+                addresses = set(addr.get("addr") for addr in child.findall("address"))
+                if not addresses & hosts:
+                    continue
+                ports_elem = child.find("ports")
+                if ports_elem is not None:
+                    for port in ports_elem.findall("port"):
+                        if int(port.get("portid")) in ports:
+                            _filter_scripts(port, script_patterns)
+                        else:
+                            ports_elem.remove(port)
+                for hostscript in child.findall("hostscript"):
+                    _filter_scripts(hostscript, script_patterns)
+                    if not len(hostscript):
+                        child.remove(hostscript)
+            elif child.tag in ("prescript", "postscript"):
+                _filter_scripts(child, script_patterns)
+            outfile.write(ET.tostring(child, encoding="unicode"))
+        outfile.write("</nmaprun>\n")
+    except:
+        outfile.close()
+        raise
+    return _close_output(outfile, outfile_path)
+
+def merge_nmap_xml(xml_sources, outfile_path=None):
+    '''
+    Merges several nmap XML outputs (strings or files, e.g. from parallel scans of target
+    shards) into a single report; hosts are kept in order, host counts are summed and the
+    run statistics reflect the longest running scan
+    
+    The merged report is streamed one host at a time to outfile_path (compressed according
+    to its extension) and the path returned; without outfile_path the XML is returned as a
+    string. A single non-empty source is returned unchanged
+    '''
+    xml_sources = [xml_source for xml_source in xml_sources if not _is_empty(xml_source)]
+    if not xml_sources:
+        return ""
+    if len(xml_sources) == 1:
+        return xml_sources[0]
+    
+    up = down = 0
+    finished = None
+    outfile = _open_output(outfile_path)
+    try:
+        outfile.write(xml_prolog(_xml_head(xml_sources[0])))
+        for index, xml_source in enumerate(xml_sources):
+            children = _iter_root_children(xml_source)
+            root = next(children)
+            if index == 0:
+                outfile.write(_start_tag(root))
+            for child in children:
+                if child.tag == "runstats":
+                    counts = child.find("hosts")
+                    if counts is not None:
+                        up += int(counts.get("up", 0))
+                        down += int(counts.get("down", 0))
+                    candidate = child.find("finished")
+                    if candidate is not None and (finished is None or
+                            float(candidate.get("elapsed", 0)) >= float(finished.get("elapsed", 0))):
+                        finished = candidate
+                elif child.tag == "host" or index == 0:
+                    outfile.write(ET.tostring(child, encoding="unicode"))
+        
+        runstats = ET.Element("runstats")
+        if finished is not None:
+            finished.set("summary", "Nmap done at %s; %d IP addresses (%d hosts up) scanned in %s seconds" %
+                         (finished.get("timestr", ""), up + down, up, finished.get("elapsed", "0")))
+            finished.tail = None
+            runstats.append(finished)
+        ET.SubElement(runstats, "hosts", up=str(up), down=str(down), total=str(up + down))
+        outfile.write(ET.tostring(runstats, encoding="unicode") + "</nmaprun>\n")
+    except:
+        outfile.close()
+        raise
+    return _close_output(outfile, outfile_path)
+
+if __name__ == '__main__':
+    #self test code goes here!!!
+    import sys
+    for record in iter_host_records(sys.argv[1]):
+        print(record)
@@ -10,7 +10,10 @@ See README.md for licensing information and credits
 '''
 
 import os
-import csv
+from html import escape
+
+import modules.manifest
+from modules.core import app_path
 
 def write_outfile(path, filename, output_text):
     
@@ -19,9 +22,8 @@ def write_outfile(path, filename, output_text):
         
     outfile = os.path.join(path, filename)
     
-    file = open(outfile, 'a+')
-    file.write(output_text)
-    file.close
+    with open(outfile, 'a+') as file:
+        file.write(output_text)
 
 def write_target_lists_by_port(ports, output_dir):
     '''
@@ -52,12 +54,100 @@ def write_target_list(hosts, output_dir):
     
     write_outfile(output_dir, filename, output_text)
     
-def write_html_index(output_dir, config):
+RUNS_PER_PAGE = 100
+
+def _open_page(path, title):
+    '''
+    Opens an HTML page based on templates/index.html for streaming writes; returns the open
+    file and the template text which follows the page body
+    '''
+    with open(app_path("templates", "index.html")) as input_file:
+        template = input_file.read()
+    head, tail = template.replace("<!--title-->", escape(title)).split("<!--body-->", 1)
+    page = open(path + ".tmp", 'w')
+    page.write(head)
+    page.write("<h1>" + escape(title) + "</h1>\n")
+    return page, tail
+
+def _close_page(page, tail, path):
+    '''Writes the footer and template tail, then moves the finished page into place'''
+    page.write("<br><hr><br>\n")
+    page.write("Generated by autoenum enumeration script - ")
+    page.write("<a href=https://github.com/isaudits/autoenum/>https://github.com/isaudits/autoenum/</a><br><br>\n")
+    page.write(tail)
+    page.close()
+    os.replace(path + ".tmp", path)
+
+def _link(href, text):
+    return " <a href='" + escape(href, True) + "'>" + escape(text) + "</a><br>\n"
+
+def _write_links(page, heading, paths, prefix=""):
+    page.write("<h2>" + heading + "</h2>\n")
+    for path in paths:
+        page.write(_link(prefix + path, path.rsplit("/", 1)[-1]))
+    page.write("<br>\n")
+
+def _write_history(page, runs, run_index_prefix):
+    '''Writes the session history table; each timestamp links to the run's own index page'''
+    page.write("<table>\n")
+    page.write("    <tr>\n        <th>Timestamp</th>\n        <th>Scan Target</th>\n        <th>Config</th>\n    </tr>\n")
+    for timestamp, target, config_file in runs:
+        page.write("    <tr>\n")
+        page.write("        <td><a href='" + escape(run_index_prefix + "index_" + timestamp + ".html", True) + "'>" +
+                   escape(timestamp) + "</a></td>\n")
+        page.write("        <td>" + escape(target or "") + "</td>\n")
+        page.write("        <td>" + escape(config_file or "") + "</td>\n")
+        page.write("    </tr>\n")
+    page.write("</table>\n")
+
+def write_run_index(output_dir, output_dir_info, run_state, timestamp, delta=None):
     '''
-    write out an html index page containing links to all of the various files that are
-    in the output directory
+    write out the html index page of a single run (in the info directory) containing links
+    to the enumeration and service scan reports recorded for it in the manifest
+    '''
+    run = modules.manifest.get_run(run_state, timestamp)
+    path = os.path.join(output_dir, output_dir_info, "index_" + timestamp + ".html")
+    page, tail = _open_page(path, "Autoenum scan output - " + timestamp)
+    page.write(_link("../index.html", "Back to index"))
+    if run:
+        page.write("<br>Scan target: " + escape(run[1] or "") + "<br>\n")
+        page.write("Config: " + escape(run[2] or "") + "<br>\n")
+    if delta:
+        _write_delta(page, delta, "")
+    _write_links(page, "Enumeration results",
+                 modules.manifest.iter_run_artifacts(run_state, timestamp, modules.manifest.ENUM_REPORTS), "../")
+    _write_links(page, "Service scan results",
+                 modules.manifest.iter_run_artifacts(run_state, timestamp, modules.manifest.SERVICE_REPORTS), "../")
+    _close_page(page, tail, path)
+
+def _write_history_page(output_dir, output_dir_info, run_state, number):
+    '''writes a page of RUNS_PER_PAGE older runs of the session history'''
+    path = os.path.join(output_dir, output_dir_info, "history_" + str(number) + ".html")
+    page, tail = _open_page(path, "Autoenum session history - page " + str(number))
+    page.write(_link("../index.html", "Back to index"))
+    page.write("<br>\n")
+    _write_history(page, modules.manifest.iter_runs(run_state, (number - 1) * RUNS_PER_PAGE, RUNS_PER_PAGE), "")
+    _close_page(page, tail, path)
+
+def _ensure_run_indexes(output_dir, output_dir_info, run_state, runs):
+    for timestamp, target, config_file in runs:
+        if not os.path.exists(os.path.join(output_dir, output_dir_info, "index_" + timestamp + ".html")):
+            write_run_index(output_dir, output_dir_info, run_state, timestamp)
+
+def write_html_index(output_dir, config, run_state, timestamp, delta=None):
+    '''
+    write out the html index page for the output directory from the output manifest (see
+    modules.manifest) rather than by listing every report directory
     
-    Accepts output_dir (string) and config (configparser object) from main script
+    Accepts output_dir (string), config (configparser object), the run state database and
+    timestamp of the current run from main script, and optionally the service changes found
+    by a delta scan as a dict, e.g.
+    {'timestamp': '...', 'previous': '...', 'added': [(host, port, proto, service)], 'removed': [...]}
+    
+    The index lists the latest page of the session history, with older runs on history
+    pages of RUNS_PER_PAGE runs, and the reports of the current run; every run also gets its
+    own index page in the info directory. Only the current run's page, the main index and
+    pages that are missing are written, so the cost does not grow with the number of runs
     
     NOTE - output directory variables in main module are full paths, while these
             are folder names only; This is to allow building of relative href
@@ -70,87 +160,119 @@ def write_html_index(output_dir, config):
     output_dir_service_info = config.get("main_config", "output_dir_service_info")
     output_dir_target_lists = config.get("main_config", "output_dir_target_lists")
     
+    modules.manifest.open_manifest(run_state)
+    modules.manifest.import_existing_output(run_state, output_dir, os.path.join(output_dir, output_dir_info),
+                                            {modules.manifest.ENUM_REPORTS: output_dir_nmap_enum,
+                                             modules.manifest.SERVICE_REPORTS: output_dir_service_info})
     
-    if os.path.exists(os.path.join(output_dir,"index.html")):
-        os.remove(os.path.join(output_dir,"index.html"))
-    html_title = "Autoenum scan output"
-    html_body = "<h1>"+html_title+"</h1>\n"
+    write_run_index(output_dir, output_dir_info, run_state, timestamp, delta)
     
     #-----------------------------------------------------------
-    # Output session history table
+    # Older session history pages (full pages never change once written)
     
-    html_body += "<h2>Session history</h2>\n"
-    html_body += "<table>\n"
+    runs = modules.manifest.run_count(run_state)
+    full_pages = max(0, runs - 1) // RUNS_PER_PAGE
+    for number in range(1, full_pages + 1):
+        if not os.path.exists(os.path.join(output_dir, output_dir_info, "history_" + str(number) + ".html")):
+            _ensure_run_indexes(output_dir, output_dir_info, run_state,
+                                list(modules.manifest.iter_runs(run_state, (number - 1) * RUNS_PER_PAGE, RUNS_PER_PAGE)))
+            _write_history_page(output_dir, output_dir_info, run_state, number)
     
-    history_file = csv.reader(open(os.path.join(output_dir, output_dir_info, "scan_history.csv"), 'r'))
+    latest_runs = list(modules.manifest.iter_runs(run_state, full_pages * RUNS_PER_PAGE))
+    _ensure_run_indexes(output_dir, output_dir_info, run_state, latest_runs)
     
-    headers = next(history_file)
-    html_body += "    <tr>\n"
-    for header in headers:
-        html_body += "        <th>" + header + "</th>\n"
-    html_body += "    </tr>\n"
-    
-    for row in history_file:
-        html_body += "    <tr>\n"
-        for cell in row:
-            html_body += "        <td>" + cell + "</td>\n"
-        html_body += "    </tr>\n"
-    html_body += "</table>\n"
+    path = os.path.join(output_dir, "index.html")
+    page, tail = _open_page(path, "Autoenum scan output")
     
     #-----------------------------------------------------------
-    # Output hyperlinks to Nmap enumeration scan reports
-    
-    html_body += "<h2>Enumeration results</h2>\n"
-    
-    try:
-        directory = output_dir_nmap_enum +"/"
-        for fname in os.listdir(os.path.join(output_dir,directory)):
-            html_body += " <a href='" + directory + fname + "'>" + fname + "</a><br>\n"
-    except:
-        pass
-    
+    # Output session history table
     
-    html_body += "<br>\n"
+    page.write("<h2>Session history</h2>\n")
+    _write_history(page, latest_runs, output_dir_info + "/")
+    if full_pages:
+        page.write("<br>Older runs:")
+        for number in range(full_pages, 0, -1):
+            page.write(" <a href='" + escape(output_dir_info + "/history_" + str(number) + ".html", True) + "'>" +
+                       str(number) + "</a>")
+        page.write("<br>\n")
     
     #-----------------------------------------------------------
-    # Output hyperlinks to Nmap service scans
+    # Output summary of service changes since the previous run
     
-    html_body += "<h2>Service scan results</h2>\n"
+    if delta:
+        _write_delta(page, delta, output_dir_info + "/")
     
-    try:
-        directory = output_dir_service_info + "/"
-        for fname in os.listdir(os.path.join(output_dir,directory)):
-            html_body += " <a href='" + directory + fname + "'>" + fname + "</a><br>\n"
-    except:
-        pass
+    #-----------------------------------------------------------
+    # Output hyperlinks to Nmap enumeration scan and service scan reports of this run
     
-    html_body += "<br>\n"
+    _write_links(page, "Enumeration results",
+                 modules.manifest.iter_run_artifacts(run_state, timestamp, modules.manifest.ENUM_REPORTS))
+    _write_links(page, "Service scan results",
+                 modules.manifest.iter_run_artifacts(run_state, timestamp, modules.manifest.SERVICE_REPORTS))
     
     #-----------------------------------------------------------
     # Output hyperlinks to target list text files
     
-    html_body += "<h2>Target Listings</h2>\n"
+    page.write("<h2>Target Listings</h2>\n")
     
     try:
-        directory = output_dir_target_lists + "/"
-        for fname in os.listdir(os.path.join(output_dir,directory)):
-            html_body += " <a href='" + directory + fname + "'>" + fname + "</a><br>\n"
-    except:
-        pass 
-    
-    #-----------------------------------------------------------
-    # Output footer
-    
-    html_body += "<br><hr><br>\n"
-    html_body += "Generated by autoenum enumeration script - "
-    html_body += "<a href=https://github.com/isaudits/autoenum/>https://github.com/isaudits/autoenum/</a><br><br>\n"
+        for fname in sorted(os.listdir(os.path.join(output_dir, output_dir_target_lists))):
+            page.write(_link(output_dir_target_lists + "/" + fname, fname))
+    except OSError:
+        pass
     
-    input_file = open(os.path.join("templates","index.html"))
-    html_out = input_file.read()
-    html_out = html_out.replace("<!--title-->",html_title)
-    html_out = html_out.replace("<!--body-->",html_body)
-    write_outfile(output_dir, "index.html", html_out)
+    _close_page(page, tail, path)
 
-if __name__ == '__main__':
-    #self test code goes here!!!
-    write_html_index("../output/")
\ No newline at end of file
+def _write_delta(page, delta, info_prefix, max_rows=500):
+    '''
+    writes the html summary of added / removed services; long lists are truncated with a
+    link to the full CSV in the info directory
+    '''
+    csv_link = info_prefix + "service_changes_" + delta['timestamp'] + ".csv"
+    page.write("<h2>Service changes since " + escape(delta['previous']) + "</h2>\n")
+    page.write(str(len(delta['added'])) + " added, " + str(len(delta['removed'])) + " removed ")
+    page.write("(<a href='" + escape(csv_link, True) + "'>full list</a>)<br><br>\n")
+    
+    rows = [("added", service) for service in delta['added']] + [("removed", service) for service in delta['removed']]
+    if rows:
+        page.write("<table>\n")
+        page.write("    <tr><th>Change</th><th>Host</th><th>Port</th><th>Protocol</th><th>Service</th></tr>\n")
+        for change, (host, port, protocol, service) in rows[:max_rows]:
+            page.write("    <tr><td>" + change + "</td><td>" + escape(host) + "</td><td>" + str(port) + "</td><td>" +
+                       escape(protocol) + "</td><td>" + escape(service) + "</td></tr>\n")
+        page.write("</table>\n")
+        if len(rows) > max_rows:
+            page.write("... " + str(len(rows) - max_rows) + " more<br>\n")
+
+def write_batch_index(output_dir, batch):
+    '''
+    write out the combined html index of a batch run, linking to the output index and log
+    of every target
+    
+    Accepts the output directory of the batch and a list of target dicts as kept by
+    modules.batch.run_batch, e.g.
+    {'target': '10.0.0.0/24', 'directory': '10.0.0.0_24', 'log': 'batch_logs/10.0.0.0_24.log',
+     'status': 'complete', 'seconds': 120.5}
+    '''
+    path = os.path.join(output_dir, "index.html")
+    page, tail = _open_page(path, "Autoenum batch scan output")
+    counts = {}
+    for entry in batch:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    page.write(escape(", ".join("%d %s" % (count, status) for status, count in sorted(counts.items()))) + "<br>\n")
+    page.write("<h2>Targets</h2>\n<table>\n")
+    page.write("    <tr>\n        <th>Scan Target</th>\n        <th>Status</th>\n        <th>Time</th>\n"
+               "        <th>Log</th>\n    </tr>\n")
+    for entry in batch:
+        page.write("    <tr>\n")
+        if os.path.exists(os.path.join(output_dir, entry['directory'], "index.html")):
+            page.write("        <td><a href='" + escape(entry['directory'] + "/index.html", True) + "'>" +
+                       escape(entry['target']) + "</a></td>\n")
+        else:
+            page.write("        <td>" + escape(entry['target']) + "</td>\n")
+        page.write("        <td>" + escape(entry['status']) + "</td>\n")
+        page.write("        <td>" + ("%d s" % entry['seconds'] if entry.get('seconds') is not None else "") + "</td>\n")
+        page.write("        <td><a href='" + escape(entry['log'], True) + "'>log</a></td>\n")
+        page.write("    </tr>\n")
+    page.write("</table>\n")
+    _close_page(page, tail, path)
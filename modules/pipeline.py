@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Pipelined enumeration and script scanning for autoenum
+
+Targets are split into host groups which are enumerated independently; as soon as
+both the TCP and UDP enumeration scans of a group finish, script scan jobs for the
+matching hosts in that group are queued, so script scanning overlaps with the
+enumeration of the remaining groups. Group results are merged at the end so the
+enumeration reports, target lists and per-section reports match the batch flow.
+
+See README.md for licensing information and credits
+
+'''
+
+import math
+
+import modules.nmap
+import modules.plan
+import modules.sections
+from modules.scheduler import ScanScheduler
+from modules.shard import split_targets, target_units
+
+def host_groups(target, hostgroup_size):
+    '''Splits the scan targets into groups of roughly hostgroup_size addresses'''
+    addresses = sum(count for unit, count in target_units(target, 1))
+    groups = max(1, int(math.ceil(addresses / float(max(1, hostgroup_size)))))
+    return split_targets(target, groups)
+
+def run_pipelined_scans(target, config, hostgroup_size, enum_concurrency, script_concurrency,
+                        coalesce=False, port_precise=False, scan_index=None):
+    '''
+    Runs the TCP / UDP enumeration scans and the config file script scans as a pipeline
+    over host groups; scan_index(xml_source, scan_name) parses each group's enumeration
+    output (see AutoenumRun.scan_index), a ScanIndex if None
+    
+    Returns a tuple of (merged TCP enum scan, merged UDP enum scan, dict of section name ->
+    merged script scan) as NmapResults; sections are in config file order and sections
+    without any matching hosts are left out. Results are not complete (see
+    NmapResult.complete) if any of their scans failed or did not finish, and sections are
+    not complete if any host group's enumeration did not finish
+    '''
+    groups = host_groups(target, hostgroup_size)
+    if scan_index is None:
+        scan_index = lambda xml_source, scan_name: modules.nmap.ScanIndex(xml_source)
+    base_script_options = config.get("scan_config", "script")
+    enum_options = {'tcp': config.get("scan_config", "tcp_enum"),
+                    'udp': config.get("scan_config", "udp_enum")}
+    
+    enum_output = {'tcp': {}, 'udp': {}}    #protocol -> {group number: xml}
+    enum_failed = {'tcp': 0, 'udp': 0}      #protocol -> scans that exited with an error
+    section_output = {}                     #section -> {group number: [xml, ...]}
+    section_pending = {}                    #section -> script scans queued but not cleanly finished
+    
+    scheduler = ScanScheduler()
+    scheduler.add_pool("enum", enum_concurrency)
+    scheduler.add_pool("script", script_concurrency)
+    
+    def script_scan_complete(job, scan):
+        if scan is None:
+            return
+        for section, xml_source in modules.plan.split_job_output(job, scan.xml_source):
+            section_output.setdefault(section, {}).setdefault(job['group'], []).append(xml_source)
+            if scan.rc == 0:
+                section_pending[section] -= 1
+    
+    def enum_scan_complete(job, scan):
+        if scan is None:
+            return
+        group = job['group']
+        enum_output[job['protocol']][group] = scan.xml_source
+        if scan.rc != 0:
+            enum_failed[job['protocol']] += 1
+        if group not in enum_output['tcp'] or group not in enum_output['udp']:
+            return
+        #both enumeration scans for this group are done - queue its script scans
+        group_index = scan_index(enum_output['tcp'][group], "tcp enum [group %d]" % group)
+        group_index.merge(scan_index(enum_output['udp'][group], "udp enum [group %d]" % group))
+        script_jobs = modules.sections.build_section_jobs(config, group_index.ports, report_skipped=False)
+        if coalesce:
+            script_jobs = modules.plan.coalesce_jobs(script_jobs, base_script_options)
+        if port_precise:
+            script_jobs = modules.plan.port_precise_jobs(script_jobs, group_index.ports)
+        for script_job in script_jobs:
+            for spec in script_job['sections']:
+                section_pending[spec['section']] = section_pending.get(spec['section'], 0) + 1
+            script_job['group'] = group
+            script_job['section'] += " [group %d/%d]" % (group, len(groups))
+            scheduler.submit(script_job, script_scan_complete, pool="script")
+    
+    print("Pipelining enumeration and script scans over %d host group(s)...\n" % len(groups))
+    for group, group_targets in enumerate(groups, 1):
+        for protocol in ('tcp', 'udp'):
+            job = {'section': "%s enum [group %d/%d]" % (protocol, group, len(groups)),
+                   'targets': group_targets, 'options': enum_options[protocol],
+                   'group': group, 'protocol': protocol}
+            scheduler.submit(job, enum_scan_complete, pool="enum")
+    scheduler.run()
+    
+    def merged(xml_sources, missing, failed=0):
+        scan = modules.nmap.NmapResult.from_xml(modules.nmap.merge_xml_sources(xml_sources), rc=1 if failed else 0)
+        scan.missing = missing
+        return scan
+    
+    #script scans were never queued for groups whose enumeration did not finish
+    unfinished_groups = len(groups) - len(set(enum_output['tcp']) & set(enum_output['udp']))
+    enum_scans = [merged([enum_output[protocol][group] for group in sorted(enum_output[protocol])],
+                         len(groups) - len(enum_output[protocol]), enum_failed[protocol])
+                  for protocol in ('tcp', 'udp')]
+    
+    sections = {}
+    for section in modules.sections.script_sections(config):
+        if section in section_output:
+            by_group = section_output[section]
+            sections[section] = merged([xml_source for group in sorted(by_group) for xml_source in by_group[group]],
+                                       unfinished_groups + section_pending[section])
+    
+    return enum_scans[0], enum_scans[1], sections
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Script scan planning for autoenum
+
+Config sections which use the same scan and script arguments and target overlapping
+host / port sets (e.g. the various netBIOS / SMB sections) are coalesced into a single
+nmap invocation with a combined --script list. The combined output is split back into
+per-section reports afterwards, so each section still gets its own XML / HTML output.
+
+Jobs can also be split by the ports each host actually has open, so hosts are only
+probed on the section ports found open during enumeration rather than on all of them.
+
+See README.md for licensing information and credits
+
+'''
+
+import re
+
+import modules.nmap
+from modules.sections import section_options, section_protocols
+from modules.nmapxml import filter_nmap_xml
+
+#Nmap NSE script categories; a category in a section's script list cannot be mapped back
+#to individual script ids without the nmap script database, so those sections run alone
+NMAP_SCRIPT_CATEGORIES = ("auth", "broadcast", "brute", "default", "discovery", "dos", "exploit",
+                          "external", "fuzzer", "intrusive", "malware", "safe", "version", "vuln")
+
+def script_patterns(scripts):
+    '''
+    Returns the script names / wildcards from a section's script list, or None if the list
+    uses expressions or categories that cannot be split back out of a combined scan
+    
+    e.g. 'banner,ftp-anon,snmp*' -> ['banner', 'ftp-anon', 'snmp*']
+         '"(default or safe) and http*"' -> None
+    '''
+    patterns = [script.strip() for script in scripts.split(",")]
+    for pattern in patterns:
+        if not re.match(r'^[\w.*?-]+$', pattern) or pattern in NMAP_SCRIPT_CATEGORIES:
+            return None
+    return patterns
+
+def _compatibility_key(spec):
+    return (" ".join(sorted(spec['scan_args'].split())), spec['script_args'])
+
+def _overlaps(spec_a, spec_b):
+    ports_a = set(spec_a['ports'].split(","))
+    ports_b = set(spec_b['ports'].split(","))
+    return bool(ports_a & ports_b) and bool(set(spec_a['targets']) & set(spec_b['targets']))
+
+def _unique(values):
+    seen = set()
+    result = []
+    for value in values:
+        if value not in seen:
+            seen.add(value)
+            result.append(value)
+    return result
+
+def coalesce_jobs(jobs, base_options):
+    '''
+    Accepts script scan jobs from modules.sections.build_section_jobs and returns a new
+    job list in which compatible jobs with overlapping host / port sets are merged
+    
+    Merged jobs list every covered section spec in job['sections']; use
+    split_job_output to get the per-section scan output back
+    '''
+    groups = []     #lists of section specs
+    for job in jobs:
+        spec = job['sections'][0]
+        if len(job['sections']) > 1 or script_patterns(spec['scripts']) is None:
+            groups.append(None)
+            continue
+        #merge into every existing group this spec overlaps with (groups may chain together)
+        merged = []
+        for index, group in enumerate(groups):
+            if (group and _compatibility_key(group[0]) == _compatibility_key(spec) and
+                    any(_overlaps(member, spec) for member in group)):
+                merged += group
+                groups[index] = []
+        groups.append(merged + [spec])
+    
+    planned = []
+    for job, group in zip(jobs, groups):
+        if group is None:
+            planned.append(job)
+        elif group:
+            planned.append(_merged_job(group, base_options))
+    return planned
+
+def _merged_job(specs, base_options):
+    if len(specs) == 1:
+        spec = specs[0]
+        return {'section': spec['section'], 'sections': specs, 'targets': spec['targets'],
+                'options': section_options(base_options, spec)}
+    merged_spec = {
+        'section': " + ".join(spec['section'] for spec in specs),
+        'ports': ",".join(_unique(port for spec in specs for port in spec['ports'].split(","))),
+        'scripts': ",".join(_unique(pattern for spec in specs for pattern in script_patterns(spec['scripts']))),
+        'scan_args': specs[0]['scan_args'],
+        'script_args': specs[0]['script_args'],
+    }
+    return {
+        'section': merged_spec['section'],
+        'sections': specs,
+        'targets': _unique(host for spec in specs for host in spec['targets']),
+        'options': section_options(base_options, merged_spec),
+    }
+
+def _job_ports(job):
+    '''Returns the ports passed to nmap with -p for a job, as a list of strings'''
+    if 'ports' in job:
+        return job['ports'].split(",")
+    return _unique(port.strip() for spec in job['sections'] for port in spec['ports'].split(","))
+
+def port_precise_jobs(jobs, ports):
+    '''
+    Accepts script scan jobs (see build_section_jobs / coalesce_jobs) and the dict output
+    from nmap_parse_hosts_by_port, and splits each job so that hosts are only probed on the
+    job ports they actually have open; hosts with the same set of open job ports are
+    grouped into one part job with a narrowed -p list
+    
+    e.g. an http job for ports 80,443,8080 where one host has 80 open and two have 80 and
+    443 open becomes two part jobs, for -p80 and -p80,443
+    
+    Part jobs keep the original job in job['parent']; use collect_job_parts to merge their
+    output back into one result for each original job
+    '''
+    planned = []
+    for job in jobs:
+        job_ports = _job_ports(job)
+        port_option = " -p" + ",".join(job_ports) + " "
+        if len(job_ports) < 2 or port_option not in job['options']:
+            planned.append(job)
+            continue
+        
+        protocols = section_protocols(job['options'])
+        host_ports = {}
+        for port in job_ports:
+            for protocol in protocols:
+                for host in ports.get((int(port), protocol), ()):
+                    open_ports = host_ports.setdefault(host, [])
+                    if not open_ports or open_ports[-1] != port:
+                        open_ports.append(port)
+        
+        groups = {}     #tuple of open job ports -> hosts
+        for host in job['targets']:
+            groups.setdefault(tuple(host_ports.get(host) or job_ports), []).append(host)
+        if len(groups) == 1 and list(groups)[0] == tuple(job_ports):
+            planned.append(job)
+            continue
+        
+        for group_ports, hosts in groups.items():
+            group_ports = ",".join(group_ports)
+            planned.append(dict(job,
+                section="%s [ports %s]" % (job['section'], group_ports),
+                targets=hosts,
+                ports=group_ports,
+                options=job['options'].replace(port_option, " -p" + group_ports + " ", 1),
+                parent=job,
+                parts=len(groups)))
+    return planned
+
+def collect_job_parts(on_complete):
+    '''
+    Wraps a scan completion callback (on_complete(job, scan)) so that the part jobs from
+    port_precise_jobs are merged into a single result for their original job, which is
+    passed on once every part has finished; other jobs are passed straight through
+
+    Parts that could not be run (scan None) are left out of the merged result and parts
+    that exited with an error are merged as they are; either way the merged result is
+    not complete (see NmapResult.complete). The original job gets None if no part ran
+    '''
+    finished = {}   #id(original job) -> part scans (None for parts that failed)
+    def part_complete(job, scan):
+        parent = job.get('parent')
+        if parent is None:
+            on_complete(job, scan)
+            return
+        scans = finished.setdefault(id(parent), [])
+        scans.append(scan)
+        if len(scans) == job['parts']:
+            del finished[id(parent)]
+            on_complete(parent, _merged_result(parent, scans))
+    return part_complete
+
+def _merged_result(job, scans):
+    completed = [scan for scan in scans if scan is not None]
+    failed = len(scans) - sum(1 for scan in completed if scan.rc == 0)
+    if failed:
+        print("[!] %s: %d of %d port group scans failed or did not finish - section output is incomplete\n" %
+              (job['section'], failed, len(scans)))
+    if not completed:
+        return None
+    merged = modules.nmap.NmapResult.from_xml(
+        modules.nmap.merge_xml_sources([scan.xml_source for scan in completed]),
+        command="\n".join(scan.command for scan in completed),
+        rc=max(scan.rc for scan in completed),
+        stderr="".join(scan.stderr for scan in completed if scan.rc != 0),
+        summary="%d of %d port groups scanned" % (len(completed), len(scans)),
+        elapsed=sum(scan.elapsed for scan in completed),
+    )
+    merged.missing = len(scans) - len(completed)
+    return merged
+
+def split_job_output(job, xml_source):
+    '''
+    Returns a list of (section name, scan XML source) tuples for a completed job, where
+    sources are XML strings or spooled files (see NmapResult.xml_source); output from
+    merged jobs is filtered down to each section's own hosts, ports and scripts, and the
+    spooled output of the merged job is removed once split
+    '''
+    if len(job['sections']) == 1:
+        return [(job['sections'][0]['section'], xml_source)]
+    outputs = []
+    for spec in job['sections']:
+        outputs.append((spec['section'], filter_nmap_xml(xml_source, spec['targets'], spec['ports'].split(","),
+                                                         script_patterns(spec['scripts']),
+                                                         modules.nmap.spool_xml_path())))
+    modules.nmap.discard_spooled(xml_source)
+    return outputs
+
+def print_plan(jobs):
+    '''
+    Prints the planned nmap invocations, the number of launches saved by coalescing and
+    the number of host / port probes saved by port-precise targeting
+    '''
+    originals = list({id(job): job for job in (job.get('parent', job) for job in jobs)}.values())
+    sections = sum(len(job['sections']) for job in originals)
+    probes = sum(len(job['targets']) * len(_job_ports(job)) for job in jobs)
+    unsplit_probes = sum(len(job['targets']) * len(_job_ports(job)) for job in originals)
+    print("Script scan plan:\n")
+    for number, job in enumerate(jobs, 1):
+        print("  %d. %s (%d hosts)" % (number, job['section'], len(job['targets'])))
+        print("       nmap " + job['options'])
+    print("\n%d section(s) in %d nmap invocation(s) - %d launch(es) saved by coalescing" %
+          (sections, len(jobs), sections - len(originals)))
+    print("%d host / port probes - %d saved by port-precise targeting\n" % (probes, unsplit_probes - probes))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Packet rate budget for autoenum
+
+A total packets-per-second ceiling (max_rate in [scan_config]) is split across the
+nmap scans of a run: each scan is launched with --max-rate set to its share of the
+budget (and optionally --min-rate set to a fraction of it), and its share goes back
+to the budget when it exits. nmap cannot change the rate of a scan that is already
+running, so returned budget goes to the scans launched after it; shares are sized
+by the number of scans expected to run side by side so the first scans to start do
+not take the whole budget.
+
+See README.md for licensing information and credits
+
+'''
+
+import re
+import asyncio
+import threading
+
+#seconds between attempts to take a share while the budget is used up
+poll_interval = 0.2
+
+RATE_OPTION = re.compile(r'\s--(max|min)-rate[ =](\S+)')
+
+class RateBudget(object):
+    '''Packets-per-second budget shared by concurrently running nmap scans'''
+
+    def __init__(self, total, min_share=10, min_rate_fraction=0.0):
+        self.total = int(total)
+        self.available = self.total
+        self.running = 0
+        self.min_share = max(1, min(int(min_share), self.total))
+        self.min_rate_fraction = float(min_rate_fraction)
+        self.lock = threading.Lock()
+
+    def try_acquire(self, concurrency=1):
+        '''
+        Returns a share of the budget for a scan expected to run alongside concurrency - 1
+        others (including the ones already running), or None if the budget is used up
+        '''
+        with self.lock:
+            if self.available < self.min_share:
+                return None
+            share = int(self.available / max(1, concurrency - self.running))
+            share = min(self.available, max(self.min_share, share))
+            self.available -= share
+            self.running += 1
+            return share
+
+    async def acquire(self, concurrency=1):
+        '''Waits until a share of the budget is free and returns it (see try_acquire)'''
+        while True:
+            share = self.try_acquire(concurrency)
+            if share is not None:
+                return share
+            await asyncio.sleep(poll_interval)
+
+    def give_back(self, amount):
+        '''Returns part of a share that a scan does not need'''
+        with self.lock:
+            self.available += amount
+
+    def release(self, share):
+        '''Returns the share of a finished scan'''
+        with self.lock:
+            self.available += share
+            self.running -= 1
+
+    def apply(self, scan_options, share):
+        '''
+        Returns (scan options limited to the share, packets per second actually used);
+        a lower --max-rate already in the options is kept, and a --min-rate already in the
+        options is kept but capped at the rate (or replaced when min_rate_fraction is set)
+        '''
+        rate = share
+        min_rate = None
+        for kind, value in RATE_OPTION.findall(" " + scan_options):
+            try:
+                if kind == "max":
+                    rate = min(rate, int(float(value)))
+                else:
+                    min_rate = int(float(value))
+            except ValueError:
+                pass
+        options = RATE_OPTION.sub("", " " + scan_options).strip()
+        options += " --max-rate %d" % rate
+        if self.min_rate_fraction > 0:
+            min_rate = max(1, int(rate * self.min_rate_fraction))
+        if min_rate is not None:
+            options += " --min-rate %d" % max(1, min(min_rate, rate))
+        return options, rate
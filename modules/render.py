@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Nmap XML to HTML report rendering for autoenum
+
+Reports are rendered in-process from the scan XML one host at a time and streamed
+straight into the output file (templates/report.html), replacing the earlier
+xsltproc subprocess. Renders can be queued on a background worker pool so they
+never hold up the next scan.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import time
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from html import escape
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.core import app_path
+from modules.nmapxml import open_xml_source
+
+TEMPLATE = app_path("templates", "report.html")
+
+_pool = None
+_pool_lock = threading.Lock()
+_renders = []
+
+def _template_parts(title):
+    '''Returns the report template split into the text before and after the body'''
+    with open(TEMPLATE) as template_file:
+        template = template_file.read()
+    template = template.replace("<!--title-->", escape(title))
+    head, tail = template.split("<!--body-->", 1)
+    return head, tail
+
+def _host_html(host):
+    '''Returns the HTML section for a single <host> element'''
+    addresses = [addr.get("addr", "") for addr in host.findall("address")]
+    hostnames = [hostname.get("name", "") for hostname in host.iter("hostname")]
+    status = host.find("status")
+    state = status.get("state", "") if status is not None else ""
+    
+    title = " / ".join(addresses + hostnames)
+    out = ["<h2 id='%s'>%s (%s)</h2>\n" % (escape(addresses[0] if addresses else "", True), escape(title), escape(state))]
+    
+    ports = host.findall("ports/port")
+    if ports:
+        out.append("<table>\n    <tr><th>Port</th><th>Protocol</th><th>State</th><th>Service</th>"
+                   "<th>Reason</th><th>Product</th><th>Version</th><th>Extra info</th></tr>\n")
+        for port in ports:
+            port_state = port.find("state")
+            service = port.find("service")
+            state_text = port_state.get("state", "") if port_state is not None else ""
+            reason = port_state.get("reason", "") if port_state is not None else ""
+            service = service.attrib if service is not None else {}
+            out.append("    <tr class='%s'><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>\n" % (
+                escape(state_text, True), escape(port.get("portid", "")), escape(port.get("protocol", "")),
+                escape(state_text), escape(service.get("name", "")), escape(reason),
+                escape(service.get("product", "")), escape(service.get("version", "")),
+                escape(service.get("extrainfo", ""))))
+            for script in port.findall("script"):
+                out.append("    <tr><td colspan='8'><pre>%s:\n%s</pre></td></tr>\n" % (
+                    escape(script.get("id", "")), escape(script.get("output", "").strip("\n"))))
+        out.append("</table>\n")
+    
+    hostscripts = host.findall("hostscript/script")
+    if hostscripts:
+        out.append("<h3>Host script results</h3>\n<table>\n")
+        for script in hostscripts:
+            out.append("    <tr><td><pre>%s:\n%s</pre></td></tr>\n" % (
+                escape(script.get("id", "")), escape(script.get("output", "").strip("\n"))))
+        out.append("</table>\n")
+    
+    osmatches = host.findall("os/osmatch")
+    if osmatches:
+        out.append("<h3>OS detection</h3>\n")
+        for osmatch in osmatches:
+            out.append(" %s (%s%%)<br>\n" % (escape(osmatch.get("name", "")), escape(osmatch.get("accuracy", ""))))
+    
+    return "".join(out)
+
+def render_nmap_html(xml_source, outfile_path):
+    '''
+    Renders nmap XML output (string, bytes, file path or file object) to an HTML report
+    
+    The XML is read incrementally and each host is written to the report as soon as it
+    has been parsed, so memory use does not grow with the size of the scan
+    '''
+    xml_file = open_xml_source(xml_source)
+    head, tail = _template_parts("Nmap scan report")
+    down = 0
+    try:
+        with open(outfile_path, 'w') as outfile:
+            outfile.write(head)
+            root = None
+            for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = elem
+                        outfile.write("<h1>Nmap scan report - scanned at %s</h1>\n" % escape(elem.get("startstr", "")))
+                        outfile.write("<pre>%s</pre>\n" % escape(elem.get("args", "")))
+                    continue
+                if elem.tag == "host":
+                    status = elem.find("status")
+                    if status is not None and status.get("state") == "up":
+                        outfile.write(_host_html(elem))
+                    else:
+                        down += 1
+                    elem.clear()
+                    root.clear()
+                elif elem.tag == "finished":
+                    outfile.write("<br><hr><br>\n%s<br>\n" % escape(elem.get("summary", "")))
+                    if down:
+                        outfile.write("%d host(s) not shown (down)<br>\n" % down)
+            outfile.write(tail)
+    finally:
+        if xml_file is not xml_source:
+            xml_file.close()
+
+def start_render_pool(workers=None):
+    '''Starts (or resizes) the background render pool; defaults to one worker per CPU'''
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+def stop_render_pool():
+    '''
+    Finishes every queued report render (reporting any that failed, see wait_for_renders)
+    and shuts the background render pool down
+    '''
+    global _pool
+    if _renders:
+        print("Finishing %d queued HTML report(s)..." % len(_renders))
+    wait_for_renders()
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+def _timed_render(xml_source, outfile_path):
+    started = time.perf_counter()
+    render_nmap_html(xml_source, outfile_path)
+    return time.perf_counter() - started
+
+def render_in_background(xml_source, outfile_path):
+    '''Queues a report render on the background pool and returns its future'''
+    if _pool is None:
+        start_render_pool()
+    future = _pool.submit(_timed_render, xml_source, outfile_path)
+    future.outfile_path = outfile_path
+    _renders.append(future)
+    return future
+
+def wait_for_renders():
+    '''
+    Waits for all queued report renders to finish and reports any that failed; returns a
+    list of (report path, render seconds) tuples for the renders that succeeded
+    '''
+    rendered = []
+    while _renders:
+        future = _renders.pop(0)
+        try:
+            rendered.append((future.outfile_path, future.result()))
+        except Exception as exception:
+            print("\n[!] Error rendering HTML report %s: %s" % (future.outfile_path, exception))
+            logging.debug(exception, exc_info=True)
+    return rendered
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Scan results database for autoenum
+
+Port and script results from every scan are loaded into a SQLite database in the info
+output directory as each scan's XML is saved, indexed on host, port, script id and run,
+so questions like "which hosts allowed anonymous FTP in any run" are answered without
+reading the XML again. Stages recorded in the run state before the database existed
+are imported the first time it is opened.
+
+Results are searched with the query subcommand, which reads the database of an output
+directory and of every batch target directory below it:
+
+    autoenum.py query -o output --script ftp-anon
+    autoenum.py query -o output --ports --service 'http*' --format csv > web.csv
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import csv
+import sys
+import json
+import glob
+import time
+import sqlite3
+import logging
+import argparse
+import itertools
+import configparser
+import xml.etree.ElementTree as ET
+
+from modules.nmapxml import iter_host_elements, host_record, is_xml_path
+from modules.state import STATE_FILE
+
+RESULTS_FILE = "scan_results.sqlite"
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs (run TEXT PRIMARY KEY, target TEXT)",
+    "CREATE TABLE IF NOT EXISTS ingested (run TEXT, stage TEXT, xml_path TEXT, PRIMARY KEY (run, stage))",
+    "CREATE TABLE IF NOT EXISTS ports (run TEXT, stage TEXT, host TEXT, port INTEGER, protocol TEXT, "
+    "state TEXT, service TEXT, product TEXT, version TEXT)",
+    "CREATE TABLE IF NOT EXISTS scripts (run TEXT, stage TEXT, host TEXT, port INTEGER, protocol TEXT, "
+    "script_id TEXT, output TEXT)",
+    "CREATE INDEX IF NOT EXISTS ports_run ON ports (run, stage)",
+    "CREATE INDEX IF NOT EXISTS ports_host ON ports (host, port, protocol)",
+    "CREATE INDEX IF NOT EXISTS ports_port ON ports (port, protocol)",
+    "CREATE INDEX IF NOT EXISTS ports_service ON ports (service)",
+    "CREATE INDEX IF NOT EXISTS scripts_run ON scripts (run, stage)",
+    "CREATE INDEX IF NOT EXISTS scripts_host ON scripts (host, port, protocol)",
+    "CREATE INDEX IF NOT EXISTS scripts_port ON scripts (port, protocol)",
+    "CREATE INDEX IF NOT EXISTS scripts_script ON scripts (script_id)",
+)
+
+def _attribute(elem, name):
+    return elem.get(name, "") if elem is not None else ""
+
+class ResultStore(object):
+    '''
+    Port and script results of every scan saved to an output directory
+
+    Pass the run state connection to import stages completed before the store existed
+    (or saved by a run that was interrupted before they were loaded)
+    '''
+
+    def __init__(self, output_dir_info, run_state=None):
+        if not os.path.exists(output_dir_info):
+            os.makedirs(output_dir_info)
+        self.conn = sqlite3.connect(os.path.join(output_dir_info, RESULTS_FILE))
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+        self.conn.commit()
+        if run_state is not None:
+            self._import_run_state(run_state)
+
+    def _import_run_state(self, run_state):
+        ingested = set(self.conn.execute("SELECT run, stage FROM ingested"))
+        self.conn.executemany("INSERT OR IGNORE INTO runs VALUES (?, ?)",
+                              run_state.execute("SELECT timestamp, target FROM runs"))
+        for run, stage, xml_path in run_state.execute("SELECT timestamp, stage, xml_path FROM stages "
+                                                      "WHERE xml_path IS NOT NULL").fetchall():
+            if (run, stage) in ingested or not os.path.exists(xml_path):
+                continue
+            logging.info("Importing results of " + stage + " from run " + run)
+            self.ingest(run, stage, xml_path)
+        self.conn.commit()
+
+    def record_run(self, run, target):
+        '''Records the target of a run; the target is stored space delimited if given as a list'''
+        if not isinstance(target, str):
+            target = " ".join(target)
+        self.conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?)", (run, target))
+        self.conn.commit()
+
+    def ingest(self, run, stage, xml_source):
+        '''
+        Loads the port and script results of a scan (XML string or possibly compressed file),
+        replacing any results already stored for the run stage; returns the number of
+        (ports, scripts) stored
+        '''
+        self.conn.execute("DELETE FROM ports WHERE run = ? AND stage = ?", (run, stage))
+        self.conn.execute("DELETE FROM scripts WHERE run = ? AND stage = ?", (run, stage))
+        port_count = script_count = 0
+        try:
+            for ports, scripts in self._iter_results(run, stage, xml_source):
+                self.conn.executemany("INSERT INTO ports VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", ports)
+                self.conn.executemany("INSERT INTO scripts VALUES (?, ?, ?, ?, ?, ?, ?)", scripts)
+                port_count += len(ports)
+                script_count += len(scripts)
+        except ET.ParseError as exception:
+            #output of an interrupted scan - keep the hosts that were read
+            logging.warning("Incomplete XML for " + stage + " of run " + run + ": " + str(exception))
+        xml_path = xml_source if is_xml_path(xml_source) else None
+        self.conn.execute("INSERT OR REPLACE INTO ingested VALUES (?, ?, ?)", (run, stage, xml_path))
+        self.conn.commit()
+        return port_count, script_count
+
+    @staticmethod
+    def _iter_results(run, stage, xml_source):
+        '''Yields (port rows, script rows) for each live host in a scan'''
+        for elem in iter_host_elements(xml_source):
+            host = host_record(elem)
+            if not host['up']:
+                continue
+            ports = []
+            scripts = []
+            for port in elem.iter("port"):
+                portid = int(port.get("portid"))
+                protocol = port.get("protocol")
+                service = port.find("service")
+                ports.append((run, stage, host['address'], portid, protocol, _attribute(port.find("state"), "state"),
+                              _attribute(service, "name"), _attribute(service, "product"),
+                              _attribute(service, "version")))
+                for script in port.findall("script"):
+                    scripts.append((run, stage, host['address'], portid, protocol, script.get("id"),
+                                    script.get("output", "")))
+            #host scripts (e.g. smb-os-discovery) have no port
+            for script in elem.findall("hostscript/script"):
+                scripts.append((run, stage, host['address'], None, None, script.get("id"), script.get("output", "")))
+            yield ports, scripts
+
+    def close(self):
+        #keeps the query planner statistics current as the database grows
+        self.conn.execute("PRAGMA optimize")
+        self.conn.commit()
+        self.conn.close()
+
+#-----------------------------------------------------------
+# Queries
+
+def find_databases(output_dir, info_dir_name="info"):
+    '''Returns the results databases of an output directory and the batch target directories in it'''
+    info_dirs = [os.path.join(output_dir, info_dir_name)] + sorted(glob.glob(os.path.join(output_dir, "*", info_dir_name)))
+    return [os.path.join(path, RESULTS_FILE) for path in info_dirs if os.path.exists(os.path.join(path, RESULTS_FILE))]
+
+def _where(filters):
+    '''Returns (SQL conditions, parameters) for the filters shared by both query() modes'''
+    clauses = []
+    params = []
+    for column, value in (("host", filters.get('host')), ("protocol", filters.get('protocol'))):
+        if value:
+            clauses.append("x.%s GLOB ?" % column)
+            params.append(value)
+    for column, value in (("port", filters.get('port')), ("run", filters.get('run'))):
+        if value:
+            clauses.append("x.%s = ?" % column)
+            params.append(value)
+    return clauses, params
+
+def query(conn, ports=False, **filters):
+    '''
+    Yields matching script results (or open ports with ports=True) from a results database
+    as dicts; filters are host, port, protocol, run, script, service and contains, where
+    host, script and service accept shell style wildcards (e.g. 10.0.0.*, smb-vuln-*)
+    '''
+    clauses, params = _where(filters)
+    if ports:
+        sql = ("SELECT DISTINCT x.run, r.target, x.host, x.port, x.protocol, x.state, x.service, x.product, "
+               "x.version FROM ports x LEFT JOIN runs r ON r.run = x.run")
+        clauses.append("x.state GLOB 'open*'")
+        if filters.get('service'):
+            clauses.append("x.service GLOB ?")
+            params.append(filters['service'])
+        if filters.get('script'):
+            sql += (" JOIN scripts s ON s.run = x.run AND s.host = x.host AND s.port = x.port AND "
+                    "s.protocol = x.protocol")
+            clauses.append("s.script_id GLOB ?")
+            params.append(filters['script'])
+    else:
+        sql = ("SELECT x.run, r.target, x.host, x.port, x.protocol, x.script_id, x.output "
+               "FROM scripts x LEFT JOIN runs r ON r.run = x.run")
+        if filters.get('script'):
+            clauses.append("x.script_id GLOB ?")
+            params.append(filters['script'])
+        if filters.get('contains'):
+            clauses.append("x.output LIKE ?")
+            params.append("%" + filters['contains'] + "%")
+        if filters.get('service'):
+            clauses.append("(x.run, x.host, x.port, x.protocol) IN "
+                           "(SELECT run, host, port, protocol FROM ports WHERE service GLOB ?)")
+            params.append(filters['service'])
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY x.run, x.host, x.port"
+    cursor = conn.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    for row in cursor:
+        yield dict(zip(columns, row))
+
+def write_rows(rows, output_format, outfile):
+    '''Writes query results as text, jsonl or csv; returns the number of rows written'''
+    count = 0
+    writer = None
+    for row in rows:
+        count += 1
+        if output_format == "jsonl":
+            outfile.write(json.dumps(row) + "\n")
+        elif output_format == "csv":
+            if writer is None:
+                writer = csv.DictWriter(outfile, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+        else:
+            port = "%s/%s" % (row['port'], row['protocol']) if row['port'] is not None else "host"
+            if 'script_id' in row:
+                outfile.write("%s  %s  %s  %s\n" % (row['run'], row['host'], port, row['script_id']))
+                for line in row['output'].strip("\n").splitlines():
+                    outfile.write("    " + line + "\n")
+            else:
+                outfile.write("%s  %s  %s  %s %s %s\n" % (row['run'], row['host'], port, row['service'],
+                                                         row['product'], row['version']))
+    return count
+
+def query_main(argv):
+    '''Runs the query subcommand (autoenum.py query ...); returns the exit status'''
+    parser = argparse.ArgumentParser(prog="autoenum.py query",
+                                     description="Search the script and port results of previous runs")
+    parser.add_argument('-o','--output', default='output',
+                        help='Output directory to search, including batch target subdirectories (default: "output")')
+    parser.add_argument('-c','--config', default='config/default.cfg',
+                        help='Configuration file naming the info subdirectory (default: config/default.cfg)')
+    parser.add_argument('--script', help='Script id, e.g. ftp-anon or smb-vuln-*')
+    parser.add_argument('--host', help='Host address, e.g. 10.0.0.5 or 10.0.0.*')
+    parser.add_argument('--port', type=int, help='Port number')
+    parser.add_argument('--protocol', help='Port protocol (tcp / udp)')
+    parser.add_argument('--service', help='Service name from the enumeration scans, e.g. http*')
+    parser.add_argument('--run', help='Run timestamp')
+    parser.add_argument('--contains', help='Text appearing in the script output')
+    parser.add_argument('--ports', action='store_true', help='List open ports instead of script results')
+    parser.add_argument('--hosts-only', action='store_true', help='Only list the matching host addresses')
+    parser.add_argument('--format', choices=("text", "jsonl", "csv"), default="text", help='Output format')
+    parser.add_argument('--import', dest='import_runs', action='store_true',
+                        help='Load runs saved before the results database existed before searching')
+    args = parser.parse_args(argv)
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    info_dir_name = config.get("main_config", "output_dir_info", fallback="info")
+
+    if args.import_runs:
+        info_dirs = [os.path.join(args.output, info_dir_name)] + glob.glob(os.path.join(args.output, "*", info_dir_name))
+        for info_dir in info_dirs:
+            if os.path.exists(os.path.join(info_dir, STATE_FILE)):
+                print("Importing results in " + info_dir, file=sys.stderr)
+                run_state = sqlite3.connect(os.path.join(info_dir, STATE_FILE))
+                ResultStore(info_dir, run_state).close()
+                run_state.close()
+
+    databases = find_databases(args.output, info_dir_name)
+    if not databases:
+        print("No results database found in " + args.output + " (use --import to load earlier runs)", file=sys.stderr)
+        return 1
+
+    filters = {'host': args.host, 'port': args.port, 'protocol': args.protocol, 'run': args.run,
+               'script': args.script, 'service': args.service, 'contains': args.contains}
+    started = time.perf_counter()
+    connections = [sqlite3.connect("file:%s?mode=ro" % database, uri=True) for database in databases]
+    try:
+        rows = itertools.chain.from_iterable(query(conn, ports=args.ports, **filters) for conn in connections)
+        if args.hosts_only:
+            hosts = set(row['host'] for row in rows)
+        else:
+            count = write_rows(rows, args.format, sys.stdout)
+    finally:
+        for conn in connections:
+            conn.close()
+    if args.hosts_only:
+        hosts = sorted(hosts, key=_host_sort_key)
+        if args.format == "text":
+            for host in hosts:
+                sys.stdout.write(host + "\n")
+            count = len(hosts)
+        else:
+            count = write_rows(({'host': host} for host in hosts), args.format, sys.stdout)
+    print("%d result(s) from %d database(s) in %.1f ms" % (count, len(databases), (time.perf_counter() - started) * 1000),
+          file=sys.stderr)
+    return 0
+
+def _host_sort_key(host):
+    parts = host.split(".")
+    if len(parts) == 4 and all(part.isdigit() for part in parts):
+        return (0, tuple(int(part) for part in parts), host)
+    return (1, (), host)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Concurrent nmap scan scheduling for autoenum
+
+See README.md for licensing information and credits
+
+'''
+
+import asyncio
+import logging
+
+import modules.nmap
+
+status_update_interval = 5
+
+#coordinator handing scans out to remote workers (see use_coordinator)
+coordinator = None
+
+def use_coordinator(new_coordinator):
+    '''
+    Makes every ScanScheduler hand its scans to a modules.distributed.Coordinator for
+    remote workers to run instead of launching nmap locally; None goes back to local scans
+    '''
+    global coordinator
+    coordinator = new_coordinator
+
+class ScanScheduler(object):
+    '''
+    Runs nmap scan jobs on one or more named worker pools, each with its own concurrency
+    limit. A job is any dict with 'section' (label), 'targets' and 'options' keys (see
+    modules.sections.build_section_jobs)
+
+    Scans run on a single asyncio event loop (see modules.nmap.run_nmap_scan_async).
+    Completion callbacks run on that loop as each scan finishes, so they can write
+    output and submit follow-up jobs (e.g. script scans for a finished enumeration
+    group); run() returns once no jobs are left
+    '''
+
+    def __init__(self, concurrency=1):
+        self.limits = {}        #pool name -> concurrency
+        self.semaphores = {}
+        self.queued = []        #(job, on_complete, pool) submitted before run()
+        self.tasks = set()
+        self.running = {}       #id(job) -> (label, NmapResult)
+        self.completed = 0
+        self.total = 0
+        self.add_pool("default", concurrency)
+
+    def add_pool(self, name, concurrency):
+        '''Adds a named worker pool which runs at most concurrency scans at once'''
+        self.limits[name] = max(1, int(concurrency))
+
+    def submit(self, job, on_complete, pool="default"):
+        '''
+        Queues a scan job; on_complete(job, scan) is called once the scan finishes, with
+        scan None if nmap could not be run
+        '''
+        self.total += 1
+        if self.semaphores:
+            self._start(job, on_complete, pool)
+        else:
+            self.queued.append((job, on_complete, pool))
+
+    def _start(self, job, on_complete, pool):
+        self.tasks.add(asyncio.ensure_future(self._run_job(job, on_complete, pool)))
+
+    async def _run_job(self, job, on_complete, pool):
+        def track(scan):
+            self.running[id(job)] = (job['section'], scan)
+        try:
+            async with self.semaphores[pool]:
+                scan = await self.run_scan(job, track)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exception:
+            print("\n[!] Scan %s failed: %s" % (job['section'], exception))
+            scan = None
+        finally:
+            self.running.pop(id(job), None)
+        self.completed += 1
+        try:
+            on_complete(job, scan)
+        except Exception as exception:
+            print("\n[!] Error handling output of scan %s: %s" % (job['section'], exception))
+            logging.debug(exception, exc_info=True)
+
+    async def run_scan(self, job, progress_callback):
+        '''Runs the nmap scan for a job; override to change how scans are executed'''
+        if coordinator is not None:
+            return await coordinator.run_scan(job, progress_callback)
+        return await modules.nmap.run_nmap_scan_async(job['targets'], job['options'], progress_callback,
+                                                      concurrency=self.expected_concurrency())
+
+    def expected_concurrency(self):
+        '''Number of scans likely to run side by side (used to size rate budget shares)'''
+        return max(1, min(sum(self.limits.values()), self.total - self.completed))
+
+    async def run_async(self):
+        '''Runs all queued jobs (including ones submitted by callbacks) until none are left'''
+        for name, limit in self.limits.items():
+            self.semaphores[name] = asyncio.Semaphore(limit)
+        for job, on_complete, pool in self.queued:
+            self._start(job, on_complete, pool)
+        self.queued = []
+        try:
+            while self.tasks:
+                done = (await asyncio.wait(self.tasks, timeout=status_update_interval,
+                                           return_when=asyncio.FIRST_COMPLETED))[0]
+                self.tasks -= done
+                if self.tasks:
+                    self.print_progress()
+        finally:
+            #cancelled (e.g. keyboard interrupt) - kill any running nmap process groups
+            for task in self.tasks:
+                task.cancel()
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+            self.tasks = set()
+            self.semaphores = {}
+
+    def run(self):
+        '''
+        Waits for all queued jobs to finish
+
+        On keyboard interrupt all running nmap scans are killed and jobs that have not
+        started yet are cancelled
+        '''
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            print("Keyboard Interrupt - Killing Running Nmap Scans!")
+
+    def print_progress(self):
+        '''Prints a single status line covering every running scan'''
+        status = ["%s %s%%" % (label, scan.progress) for label, scan in self.running.values()]
+        print("[%d/%d complete, %d running] %s" % (self.completed, self.total, len(status), "; ".join(status)))
+
+def run_scan_jobs(jobs, concurrency, on_complete):
+    '''
+    Runs scan jobs (see modules.sections.build_section_jobs) with at most concurrency
+    nmap scans at once
+
+    on_complete(job, scan) is called as each scan finishes so output can be written
+    as before (scan is None if nmap could not be run); a combined progress line for all
+    running scans is printed at every status update
+    '''
+    concurrency = max(1, int(concurrency))
+    print("Running %d scan(s), %d at a time...\n" % (len(jobs), concurrency))
+
+    scheduler = ScanScheduler(concurrency)
+    for job in jobs:
+        scheduler.submit(job, on_complete)
+    scheduler.run()
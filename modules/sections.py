@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Script scan section functions for autoenum
+
+See README.md for licensing information and credits
+
+'''
+
+import logging
+
+#config file sections which do not describe script scans
+NON_SCRIPT_SECTIONS = ("scan_config", "main_config")
+
+#nmap -s<type> scan type letters and the port protocol each one scans
+TCP_SCAN_TYPES = "STAWMNFXI"
+SCAN_TYPE_PROTOCOLS = {'U': "udp", 'Y': "sctp", 'Z': "sctp"}
+ALL_PROTOCOLS = ("tcp", "udp", "sctp")
+
+def script_sections(config):
+    '''Returns the names of all script scan sections in the config file, in file order'''
+    return [section for section in config.sections() if section not in NON_SCRIPT_SECTIONS]
+
+def section_protocols(scan_options):
+    '''
+    Returns the set of port protocols (as keyed in nmap_parse_hosts_by_port output) that
+    an nmap scan with the given options covers, e.g. {'tcp', 'udp'} for "-sS -sU"
+
+    Pass the full options of a section (base [scan_config] script options plus the
+    section's scan_args, see section_options): a section adding -sU to the base -sS is
+    probed by nmap on both TCP and UDP, so it matches hosts with either port open. Scans
+    without an explicit scan type use nmap's default TCP scan
+    '''
+    protocols = set()
+    for option in scan_options.split():
+        if option.startswith("-s"):
+            for scan_type in option[2:]:
+                if scan_type in TCP_SCAN_TYPES:
+                    protocols.add("tcp")
+                elif scan_type in SCAN_TYPE_PROTOCOLS:
+                    protocols.add(SCAN_TYPE_PROTOCOLS[scan_type])
+    return protocols or {"tcp"}
+
+def section_targets(config_ports, ports, protocols=None):
+    '''
+    Returns a list of all hosts which have any of the section's ports open
+
+    Accepts the comma delimited ports string from a config section and the dict output
+    from nmap_parse_hosts_by_port, which already maps each (port, protocol) to its hosts;
+    only ports of the given protocols (see section_protocols) are matched, or any
+    protocol if protocols is None
+    '''
+    if protocols is None:
+        protocols = ALL_PROTOCOLS
+    
+    section_ports = [(config_port, protocol) for config_port in map(int,config_ports.split(","))
+                     for protocol in protocols]
+    if hasattr(ports, "union"):
+        #compact index (see modules.compact) - one union of the ports' address arrays
+        targets = ports.union(section_ports)
+    else:
+        #union of the hosts for each (port, protocol) lookup
+        targets = set()
+        for port in section_ports:
+            targets.update(ports.get(port, ()))
+        targets = list(targets)
+    logging.debug(targets)
+    return targets
+
+def section_spec(config, section):
+    '''
+    Reads a script scan section from the config file
+
+    Returns a dict of the section settings with optional values defaulting to an empty
+    string, e.g. {'section': 'ftp', 'ports': '21', 'scripts': 'banner,ftp-anon',
+                  'scan_args': '', 'script_args': ''}
+    '''
+    spec = {'section': section}
+    spec['ports'] = config.get(section, "ports")
+    spec['scripts'] = config.get(section, "scripts")
+    if config.has_option(section, "scan_args"):
+        spec['scan_args'] = config.get(section, "scan_args")
+    else: spec['scan_args'] = ""
+    if config.has_option(section, "script_args"):
+        spec['script_args'] = config.get(section, "script_args")
+    else: spec['script_args'] = ""
+    return spec
+
+def section_options(base_options, spec):
+    '''Returns the nmap options for a script scan of a section spec (see section_spec)'''
+    scan_options = base_options
+    if spec['scan_args']:
+        scan_options += " " + spec['scan_args']
+    scan_options += " -p"+spec['ports']
+    scan_options += " --script "+spec['scripts']
+    if spec['script_args']:
+        scan_options += " --script-args "+spec['script_args']
+    return scan_options
+
+def build_section_job(config, section, ports):
+    '''
+    Builds the script scan job for a single config file section
+
+    Returns a dict with a display label, the section specs covered by the job (see
+    section_spec, with the section's target list added), the job target list and
+    nmap scan options, e.g.
+    {'section': 'ftp', 'sections': [{'section': 'ftp', 'targets': [...], ...}],
+     'targets': ['192.168.0.171'], 'options': '-PN -sS ... -p21 --script banner,ftp-anon'}
+    '''
+    spec = section_spec(config, section)
+    scan_options = section_options(config.get("scan_config","script"), spec)
+    spec['targets'] = section_targets(spec['ports'], ports, section_protocols(scan_options))
+    
+    return {
+        'section': section,
+        'sections': [spec],
+        'targets': spec['targets'],
+        'options': scan_options,
+    }
+
+def build_section_jobs(config, ports, report_skipped=True):
+    '''
+    Returns script scan jobs (see build_section_job) for every config file section with
+    at least one matching host; sections without targets are skipped (and reported
+    unless report_skipped is False)
+    '''
+    jobs = []
+    for section in script_sections(config):
+        job = build_section_job(config, section, ports)
+        if job['targets']:
+            jobs.append(job)
+        elif report_skipped:
+            print("No "+section+" services found during enumeration scan...skipping...\n")
+    return jobs
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Target sharding for autoenum
+
+Splits an nmap target specification into chunks which are scanned by parallel nmap
+processes; the resulting XML is merged back into a single report so the existing
+parse and output functions work unchanged.
+
+See README.md for licensing information and credits
+
+'''
+
+import re
+import ipaddress
+import logging
+
+import modules.nmap
+import modules.scheduler
+
+def _split_network(network, pieces):
+    '''Splits an ip_network into at least the requested number of equal sized subnets'''
+    extra_bits = max(0, (pieces - 1).bit_length())
+    extra_bits = min(extra_bits, network.max_prefixlen - network.prefixlen)
+    return [(str(subnet), subnet.num_addresses) for subnet in network.subnets(prefixlen_diff=extra_bits)]
+
+def _split_range(prefix, first, last, pieces):
+    '''Splits a last-octet nmap range (e.g. 192.168.0.1-254) into up to pieces sub-ranges'''
+    count = last - first + 1
+    pieces = max(1, min(pieces, count))
+    units = []
+    start = first
+    for index in range(pieces):
+        end = first + (count * (index + 1)) // pieces - 1
+        if end == start:
+            units.append(("%s.%d" % (prefix, start), 1))
+        else:
+            units.append(("%s.%d-%d" % (prefix, start, end), end - start + 1))
+        start = end + 1
+    return units
+
+def target_units(target, pieces):
+    '''
+    Breaks a target specification into (target, address count) units, splitting CIDR
+    blocks and last-octet ranges into roughly pieces parts each
+
+    Accepts a space delimited nmap target string or a list of hosts (e.g. live hosts)
+    '''
+    if isinstance(target, str):
+        tokens = target.split()
+    else:
+        tokens = list(target)
+    
+    units = []
+    for token in tokens:
+        range_match = re.match(r'^(\d+\.\d+\.\d+)\.(\d+)-(\d+)$', token)
+        try:
+            if "/" in token:
+                units.extend(_split_network(ipaddress.ip_network(token, strict=False), pieces))
+                continue
+            elif range_match:
+                units.extend(_split_range(range_match.group(1), int(range_match.group(2)),
+                                          int(range_match.group(3)), pieces))
+                continue
+        except ValueError:
+            logging.debug("unable to split target " + token + " - scanning as a single unit")
+        units.append((token, 1))
+    return units
+
+def split_targets(target, shards):
+    '''
+    Splits a target specification into up to shards lists of targets with roughly the
+    same number of addresses in each; target order is preserved
+    
+    e.g. split_targets("10.0.0.0/23", 2) -> [['10.0.0.0/24'], ['10.0.1.0/24']]
+    '''
+    units = target_units(target, shards)
+    total = sum(count for unit, count in units)
+    shard_lists = []
+    current = []
+    assigned = 0
+    for unit, count in units:
+        #start a new shard once this unit would take the current one past its share
+        if (current and len(shard_lists) < shards - 1 and
+                assigned + count / 2.0 > total * (len(shard_lists) + 1) / float(shards)):
+            shard_lists.append(current)
+            current = []
+        current.append(unit)
+        assigned += count
+    if current:
+        shard_lists.append(current)
+    return shard_lists
+
+def shard_options(scan_options, min_hostgroup):
+    '''Sets the --min-hostgroup value used by each shard, if configured'''
+    if not min_hostgroup:
+        return scan_options
+    if re.search(r'--min-hostgroup\s+\d+', scan_options):
+        return re.sub(r'--min-hostgroup\s+\d+', "--min-hostgroup " + str(min_hostgroup), scan_options)
+    return scan_options + " --min-hostgroup " + str(min_hostgroup)
+
+def shard_jobs(scan_targets, scan_options, shards, min_hostgroup=None, label="scan"):
+    '''
+    Returns scheduler jobs (see modules.scheduler) which scan the targets split across
+    up to shards nmap processes; a single job is returned if the targets cannot be split
+    '''
+    shards = int(shards or 1)
+    shard_lists = split_targets(scan_targets, shards) if shards > 1 else []
+    if len(shard_lists) <= 1:
+        return [{'section': label, 'targets': scan_targets, 'options': scan_options}]
+    
+    options = shard_options(scan_options, min_hostgroup)
+    jobs = []
+    for number, shard_targets in enumerate(shard_lists, 1):
+        jobs.append({'section': "%s shard %d/%d" % (label, number, len(shard_lists)),
+                     'targets': shard_targets, 'options': options})
+    return jobs
+
+def merge_shard_results(jobs, results):
+    '''
+    Merges the scans of completed shard jobs into a single NmapResult; results is a dict
+    of job label -> scan, where missing labels are shards that did not complete (counted
+    in NmapResult.missing)
+    '''
+    scans = [results[job['section']] for job in jobs if job['section'] in results]
+    if len(jobs) == 1 and scans:
+        return scans[0]
+    merged = modules.nmap.NmapResult.from_xml(
+        modules.nmap.merge_xml_sources([scan.xml_source for scan in scans]),
+        command="\n".join(scan.command for scan in scans),
+        rc=max([scan.rc for scan in scans] + [0 if len(scans) == len(jobs) else 1]),
+        stderr="".join(scan.stderr for scan in scans if scan.rc != 0),
+        summary="%d of %d shards completed" % (len(scans), len(jobs)),
+        elapsed=sum(scan.elapsed for scan in scans),
+    )
+    merged.missing = len(jobs) - len(scans)
+    return merged
+
+def run_sharded_nmap_scan(scan_targets, scan_options, shards, min_hostgroup=None):
+    '''
+    Runs an nmap scan with the targets split across shards parallel nmap processes
+    
+    Returns an NmapResult (see run_nmap_scan) with stdout holding the merged XML of all
+    shards
+    '''
+    return run_concurrent_nmap_scans(scan_targets, {'scan': scan_options}, shards, min_hostgroup)['scan']
+
+def run_concurrent_nmap_scans(scan_targets, scan_options, shards=1, min_hostgroup=None):
+    '''
+    Runs several scans of the same targets at the same time under one scheduler, each
+    optionally split across shards parallel nmap processes (e.g. the TCP and UDP
+    enumeration scans)
+    
+    Accepts a dict of scan name -> nmap options and returns a dict of scan name -> result
+    (see run_sharded_nmap_scan)
+    '''
+    jobs = {}
+    for name, options in scan_options.items():
+        jobs[name] = shard_jobs(scan_targets, options, shards, min_hostgroup, label=name)
+    job_count = sum(len(name_jobs) for name_jobs in jobs.values())
+    if job_count == 1 and modules.scheduler.coordinator is None:
+        name = list(jobs)[0]
+        return {name: modules.nmap.run_nmap_scan(scan_targets, scan_options[name])}
+    
+    results = {}
+    def collect(job, scan):
+        if scan is not None:
+            results[job['section']] = scan
+    modules.scheduler.run_scan_jobs([job for name_jobs in jobs.values() for job in name_jobs],
+                                    job_count, collect)
+    
+    merged = {}
+    for name, name_jobs in jobs.items():
+        merged[name] = merge_shard_results(name_jobs, results)
+        if len(name_jobs) > 1:
+            print(name + ": " + merged[name].summary + "\n")
+    return merged
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Machine-wide nmap process limit for autoenum
+
+A limit of N nmap processes is enforced across every autoenum process sharing a slot
+directory: each nmap launch first takes an exclusive lock on one of N slot files in
+that directory and holds it until nmap exits. Locks are released by the OS if an
+autoenum process dies, so a crashed run never leaks slots.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import fcntl
+import asyncio
+
+#environment variable passing the slot directory and limit to child processes (DIR:N)
+SLOTS_ENV = "AUTOENUM_NMAP_SLOTS"
+
+#seconds between attempts to take a slot while all of them are busy
+poll_interval = 0.2
+
+class NmapSlots(object):
+    '''Counting semaphore over lock files, shared by all processes using the same directory'''
+
+    def __init__(self, directory, count):
+        self.directory = directory
+        self.count = max(1, int(count))
+
+    def __str__(self):
+        return "%s:%d" % (self.directory, self.count)
+
+    def try_acquire(self):
+        '''Returns an open, locked slot file, or None if every slot is taken'''
+        os.makedirs(self.directory, exist_ok=True)
+        for number in range(self.count):
+            slot = open(os.path.join(self.directory, "nmap_slot_%d.lock" % number), 'a')
+            try:
+                fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot
+            except OSError:
+                slot.close()
+        return None
+
+    async def acquire(self):
+        '''Waits for a free slot and returns it locked; pass it to release() when done'''
+        while True:
+            slot = self.try_acquire()
+            if slot is not None:
+                return slot
+            await asyncio.sleep(poll_interval)
+
+    @staticmethod
+    def release(slot):
+        if slot is not None:
+            fcntl.flock(slot, fcntl.LOCK_UN)
+            slot.close()
+
+def slots_from_env():
+    '''Returns NmapSlots for the limit passed down in the environment, or None'''
+    value = os.environ.get(SLOTS_ENV)
+    if not value:
+        return None
+    directory, count = value.rsplit(":", 1)
+    return NmapSlots(directory, int(count))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Run state (checkpoint / resume) functions for autoenum
+
+Each run is keyed by its timestamp; completed stages (live host scan, enumeration
+scans, script scan sections, nikto) are recorded in a SQLite database in the info
+output directory along with their XML artifact so an interrupted run can be resumed
+with only the unfinished stages rescheduled.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import sqlite3
+import logging
+import datetime
+
+from modules.nmapxml import xml_tail
+
+STATE_FILE = "run_state.sqlite"
+
+def open_run_state(output_dir_info):
+    '''Opens (creating if needed) the run state database in the info output directory'''
+    if not os.path.exists(output_dir_info):
+        os.makedirs(output_dir_info)
+    conn = sqlite3.connect(os.path.join(output_dir_info, STATE_FILE))
+    conn.execute("CREATE TABLE IF NOT EXISTS runs (timestamp TEXT PRIMARY KEY, target TEXT, config TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS stages (timestamp TEXT, stage TEXT, xml_path TEXT, completed TEXT, "
+                 "PRIMARY KEY (timestamp, stage))")
+    conn.commit()
+    return conn
+
+def record_run(conn, timestamp, target, config_file):
+    '''Records a new run; the target is stored space delimited if given as a list'''
+    if not isinstance(target, str):
+        target = " ".join(target)
+    conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?)", (timestamp, target, config_file))
+    conn.commit()
+
+def get_run(conn, timestamp):
+    '''Returns (target, config file) for a recorded run, or None if the run is unknown'''
+    return conn.execute("SELECT target, config FROM runs WHERE timestamp = ?", (timestamp,)).fetchone()
+
+def xml_complete(xml_text=None, xml_path=None):
+    '''
+    Checks that nmap XML output (string, or possibly compressed file at xml_path) was
+    written out in full; output from nmap processes that were killed is missing the
+    closing </nmaprun> tag
+    '''
+    if xml_path is not None:
+        if not os.path.exists(xml_path):
+            return False
+        try:
+            xml_text = xml_tail(xml_path)
+        except (OSError, EOFError) as exception:
+            logging.debug(exception)
+            return False
+    return bool(xml_text) and "</nmaprun>" in xml_text[-4096:]
+
+def record_stage(conn, timestamp, stage, xml_path=None, xml_text=None):
+    '''
+    Records a completed stage and its XML artifact (given as text or read back from
+    xml_path); stages with incomplete XML output are not recorded so they are scheduled
+    again on resume
+    '''
+    if xml_text is not None:
+        complete = xml_complete(xml_text)
+    else:
+        complete = not xml_path or xml_complete(xml_path=xml_path)
+    if not complete:
+        logging.warning("Incomplete XML output for " + stage + " - stage will be re-run on resume")
+        return False
+    conn.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+                 (timestamp, stage, xml_path, datetime.datetime.now().isoformat()))
+    conn.commit()
+    return True
+
+def completed_stage(conn, timestamp, stage):
+    '''
+    Returns the stage record (xml path, or "" for stages without XML) if the stage has
+    completed, otherwise None; stages whose XML artifact is missing or partial are
+    treated as not completed
+    '''
+    row = conn.execute("SELECT xml_path FROM stages WHERE timestamp = ? AND stage = ?", (timestamp, stage)).fetchone()
+    if row is None:
+        return None
+    xml_path = row[0]
+    if xml_path and not xml_complete(xml_path=xml_path):
+        print("[!] Partial or missing XML output for " + stage + " - rescheduling")
+        conn.execute("DELETE FROM stages WHERE timestamp = ? AND stage = ?", (timestamp, stage))
+        conn.commit()
+        return None
+    return xml_path or ""
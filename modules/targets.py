@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Target list store for autoenum
+
+Target list entries (live hosts, hosts by open port, web hosts) from every run are
+kept in a SQLite database in the info output directory, deduplicated on insert.
+The text exports in the target list directory (e.g. tcp_80.txt) are only rewritten
+when a run actually added entries to them, so reusing an output directory across
+many engagements does not mean re-reading and rewriting every list on each run.
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import sqlite3
+import logging
+
+STORE_FILE = "target_lists.sqlite"
+
+def port_list_name(port):
+    '''Returns the target list file name for a (port, protocol) tuple, e.g. tcp_80.txt'''
+    return port[1]+"_"+str(port[0])+'.txt'
+
+class TargetStore(object):
+    '''
+    Deduplicating store of target list entries, exported to one sorted text file per list
+
+    Target list files already in the output directory (e.g. from runs before the store
+    existed) are imported the first time the store sees them
+    '''
+
+    def __init__(self, output_dir_info, output_dir_target_lists):
+        for path in (output_dir_info, output_dir_target_lists):
+            if not os.path.exists(path):
+                os.makedirs(path)
+        self.output_dir = output_dir_target_lists
+        self.conn = sqlite3.connect(os.path.join(output_dir_info, STORE_FILE))
+        self.conn.execute("CREATE TABLE IF NOT EXISTS lists (name TEXT PRIMARY KEY)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (name TEXT, value TEXT, "
+                          "PRIMARY KEY (name, value)) WITHOUT ROWID")
+        self.conn.commit()
+        self.changed = set()
+        self._import_existing()
+
+    def _known_lists(self):
+        return set(row[0] for row in self.conn.execute("SELECT name FROM lists"))
+
+    def _import_existing(self):
+        known = self._known_lists()
+        for name in os.listdir(self.output_dir):
+            if name in known or not name.endswith(".txt"):
+                continue
+            logging.info("Importing existing target list " + name)
+            with open(os.path.join(self.output_dir, name)) as list_file:
+                self.add(name, (line.strip() for line in list_file))
+        self.conn.commit()
+
+    def add(self, name, values):
+        '''Adds entries to a target list; returns the number of entries that were new'''
+        before = self.conn.total_changes
+        self.conn.execute("INSERT OR IGNORE INTO lists VALUES (?)", (name,))
+        self.conn.executemany("INSERT OR IGNORE INTO entries VALUES (?, ?)",
+                              ((name, value) for value in values if value))
+        added = self.conn.total_changes - before
+        if added:
+            self.changed.add(name)
+        return added
+
+    def add_hosts_by_port(self, ports):
+        '''
+        Adds hosts to the per-port target lists
+
+        Accepts dict output from nmap_parse_hosts_by_port as input
+        e.g. {(80, 'tcp'): ['192.168.0.171'], (111, 'tcp'): ['192.168.0.169', '192.168.0.171']}
+        '''
+        for port, hosts in ports.items():
+            self.add(port_list_name(port), hosts)
+        self.conn.commit()
+
+    def add_live_hosts(self, hosts):
+        '''Adds hosts to the list of all live hosts'''
+        self.add("all_live_hosts.txt", hosts)
+        self.conn.commit()
+
+    def add_webhosts(self, webhosts):
+        '''Adds web endpoints (text from nmap_parse_webhosts, host:port per line)'''
+        self.add("all_webhosts.txt", webhosts.splitlines())
+        self.conn.commit()
+
+    def export(self):
+        '''
+        Rewrites the text export of every list that gained entries (or whose export file
+        is missing) with its entries in sorted order; returns the names of the lists written
+        '''
+        names = set(self.changed)
+        for name in self._known_lists():
+            if not os.path.exists(os.path.join(self.output_dir, name)):
+                names.add(name)
+        for name in sorted(names):
+            path = os.path.join(self.output_dir, name)
+            with open(path + ".tmp", 'w') as list_file:
+                for row in self.conn.execute("SELECT value FROM entries WHERE name = ? ORDER BY value", (name,)):
+                    list_file.write(row[0] + "\n")
+            os.replace(path + ".tmp", path)
+        self.changed = set()
+        return sorted(names)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Helpers for the autoenum unit tests
+
+See README.md for licensing information and credits
+
+'''
+
+import configparser
+from xml.sax.saxutils import quoteattr
+
+def nmap_xml(hosts, down=(), elapsed="1.00"):
+    '''
+    Returns a small nmap XML report; hosts maps each live address to a list of
+    (port, protocol, service name[, [script ids]]) tuples, down lists hosts that are down
+
+    e.g. nmap_xml({'10.0.0.1': [(80, 'tcp', 'http', ['http-title'])]}, down=['10.0.0.2'])
+    '''
+    out = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+           '<nmaprun scanner="nmap" args="nmap -sS" start="0" version="7.94" xmloutputversion="1.05">\n',
+           '<scaninfo type="syn" protocol="tcp" numservices="1000" services="1-1000"/>\n']
+    for address, ports in hosts.items():
+        out.append('<host><status state="up" reason="syn-ack"/><address addr=%s addrtype="ipv4"/><ports>' %
+                   quoteattr(address))
+        for port in ports:
+            portid, protocol, service = port[:3]
+            scripts = port[3] if len(port) > 3 else []
+            out.append('<port protocol="%s" portid="%d"><state state="open" reason="syn-ack"/>'
+                       '<service name="%s" method="table" conf="3"/>' % (protocol, portid, service))
+            for script in scripts:
+                out.append('<script id="%s" output="%s output"/>' % (script, script))
+            out.append('</port>')
+        out.append('</ports></host>\n')
+    for address in down:
+        out.append('<host><status state="down" reason="no-response"/><address addr=%s addrtype="ipv4"/></host>\n' %
+                   quoteattr(address))
+    out.append('<runstats><finished time="0" timestr="" elapsed="%s" summary="" exit="success"/>'
+               '<hosts up="%d" down="%d" total="%d"/></runstats>\n</nmaprun>\n' %
+               (elapsed, len(hosts), len(down), len(hosts) + len(down)))
+    return "".join(out)
+
+def config_from_string(text):
+    '''Returns a ConfigParser loaded from config file text'''
+    config = configparser.ConfigParser()
+    config.read_string(text)
+    return config
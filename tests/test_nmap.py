@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Tests for the scan indexes (modules.nmap.ScanIndex and modules.compact.CompactScanIndex)
+
+See README.md for licensing information and credits
+
+'''
+
+import unittest
+
+from modules.compact import CompactScanIndex
+from modules.nmap import NmapResult, ScanIndex
+from tests.helpers import nmap_xml
+
+TCP_XML = nmap_xml({'10.0.0.1': [(80, 'tcp', 'http'), (22, 'tcp', 'ssh')],
+                    '10.0.0.2': [(443, 'tcp', 'https')]},
+                   down=['10.0.0.3'])
+UDP_XML = nmap_xml({'10.0.0.1': [(161, 'udp', 'snmp')],
+                    '10.0.0.4': [(53, 'udp', 'domain')]})
+
+class ScanIndexTest(unittest.TestCase):
+
+    def test_views(self):
+        for stream in (False, True):
+            index = ScanIndex(TCP_XML, stream=stream)
+            self.assertEqual(index.live_hosts, ['10.0.0.1', '10.0.0.2'])
+            self.assertEqual(sorted(index.hosts['10.0.0.1']), [(22, 'tcp'), (80, 'tcp')])
+            self.assertEqual(index.ports[(443, 'tcp')], ['10.0.0.2'])
+            self.assertEqual(sorted(index.web_endpoints), [('10.0.0.1', 80), ('10.0.0.2', 443)])
+            self.assertEqual(index.open_port_count(), 3)
+
+    def test_merge_unions_ports_per_host(self):
+        index = ScanIndex(TCP_XML).merge(ScanIndex(UDP_XML))
+        self.assertEqual(index.live_hosts, ['10.0.0.1', '10.0.0.2', '10.0.0.4'])
+        self.assertEqual(sorted(index.hosts['10.0.0.1']), [(22, 'tcp'), (80, 'tcp'), (161, 'udp')])
+        self.assertEqual(index.ports[(53, 'udp')], ['10.0.0.4'])
+        self.assertEqual(index.open_port_count(), 5)
+
+    def test_merge_does_not_duplicate(self):
+        index = ScanIndex(TCP_XML).merge(ScanIndex(TCP_XML))
+        self.assertEqual(index.live_hosts, ['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(index.ports[(80, 'tcp')], ['10.0.0.1'])
+        self.assertEqual(len(index.hosts['10.0.0.1']), 2)
+        self.assertEqual(index.webhosts, "10.0.0.1:80\n10.0.0.2:443\n")
+
+class CompactScanIndexTest(unittest.TestCase):
+
+    def assertSameIndex(self, compact, index):
+        self.assertEqual(sorted(compact.live_hosts), sorted(index.live_hosts))
+        self.assertEqual(sorted(compact.ports), sorted(index.ports))
+        for port in index.ports:
+            self.assertEqual(sorted(compact.ports[port]), sorted(index.ports[port]))
+        for host in index.hosts:
+            self.assertEqual(sorted(compact.hosts[host]), sorted(index.hosts[host]))
+        self.assertEqual(sorted(compact.web_endpoints), sorted(index.web_endpoints))
+        self.assertEqual(compact.open_port_count(), index.open_port_count())
+
+    def test_matches_scan_index(self):
+        self.assertSameIndex(CompactScanIndex(TCP_XML), ScanIndex(TCP_XML))
+
+    def test_merge(self):
+        expected = ScanIndex(TCP_XML).merge(ScanIndex(UDP_XML))
+        self.assertSameIndex(CompactScanIndex(TCP_XML).merge(CompactScanIndex(UDP_XML)), expected)
+        self.assertSameIndex(CompactScanIndex(TCP_XML).merge(ScanIndex(UDP_XML)), expected)
+
+    def test_non_ipv4_addresses(self):
+        compact = CompactScanIndex()
+        compact.add_host("fe80::1", [(22, 'tcp')])
+        compact.add_host("10.0.0.9", [(22, 'tcp')])
+        self.assertEqual(compact.ports[(22, 'tcp')], ['10.0.0.9', 'fe80::1'])
+        self.assertIn("fe80::1", compact.hosts)
+        self.assertEqual(compact.ports.union([(22, 'tcp'), (80, 'tcp')]), ['10.0.0.9', 'fe80::1'])
+
+class NmapResultTest(unittest.TestCase):
+
+    def test_complete(self):
+        scan = NmapResult.from_xml(TCP_XML)
+        self.assertTrue(scan.complete)
+        scan.missing = 1
+        self.assertFalse(scan.complete)
+        self.assertFalse(NmapResult.from_xml(TCP_XML, rc=1).complete)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Tests for merging and filtering nmap XML output (modules.nmapxml, modules.nmap)
+
+See README.md for licensing information and credits
+
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+import modules.nmap
+from modules.nmap import ScanIndex, merge_xml_sources
+from modules.nmapxml import filter_nmap_xml, merge_nmap_xml, read_xml_text
+from tests.helpers import nmap_xml
+
+SHARD_A = nmap_xml({'10.0.0.1': [(80, 'tcp', 'http')]}, down=['10.0.0.2'], elapsed="5.00")
+SHARD_B = nmap_xml({'10.0.1.1': [(22, 'tcp', 'ssh')], '10.0.1.2': [(443, 'tcp', 'https')]}, elapsed="9.50")
+
+class MergeNmapXmlTest(unittest.TestCase):
+
+    def test_merge(self):
+        merged = merge_nmap_xml([SHARD_A, SHARD_B])
+        root = ET.fromstring(merged)
+        self.assertEqual([host.find("address").get("addr") for host in root.findall("host")],
+                         ['10.0.0.1', '10.0.0.2', '10.0.1.1', '10.0.1.2'])
+        self.assertEqual(len(root.findall("scaninfo")), 1)
+        counts = root.find("runstats/hosts")
+        self.assertEqual((counts.get("up"), counts.get("down"), counts.get("total")), ("3", "1", "4"))
+        self.assertEqual(root.find("runstats/finished").get("elapsed"), "9.50")
+        self.assertEqual(ScanIndex(merged).live_hosts, ['10.0.0.1', '10.0.1.1', '10.0.1.2'])
+
+    def test_empty_and_single_sources(self):
+        self.assertEqual(merge_nmap_xml([]), "")
+        self.assertEqual(merge_nmap_xml(["", SHARD_A]), SHARD_A)
+
+    def test_files(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        paths = []
+        for name, xml in (("a.xml", SHARD_A), ("b.xml", SHARD_B)):
+            paths.append(os.path.join(tmpdir, name))
+            with open(paths[-1], "w") as xml_file:
+                xml_file.write(xml)
+        outfile_path = os.path.join(tmpdir, "merged.xml")
+        self.assertEqual(merge_nmap_xml(paths, outfile_path), outfile_path)
+        self.assertEqual(read_xml_text(outfile_path), merge_nmap_xml([SHARD_A, SHARD_B]))
+
+class MergeXmlSourcesTest(unittest.TestCase):
+
+    def test_in_memory(self):
+        self.assertEqual(merge_xml_sources([SHARD_A, SHARD_B]), merge_nmap_xml([SHARD_A, SHARD_B]))
+
+    def test_spooled(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        modules.nmap.start_xml_spool(tmpdir)
+        self.addCleanup(setattr, modules.nmap, "_spool_dir", None)
+        sources = []
+        for xml in (SHARD_A, SHARD_B):
+            sources.append(modules.nmap.spool_xml_path())
+            with open(sources[-1], "w") as xml_file:
+                xml_file.write(xml)
+        merged = merge_xml_sources(sources)
+        self.assertTrue(os.path.exists(merged))
+        self.assertNotIn(merged, sources)
+        for source in sources:
+            self.assertFalse(os.path.exists(source))
+        self.assertEqual(ScanIndex(merged).live_hosts, ['10.0.0.1', '10.0.1.1', '10.0.1.2'])
+
+class FilterNmapXmlTest(unittest.TestCase):
+
+    XML = nmap_xml({'10.0.0.1': [(161, 'udp', 'snmp', ['snmp-info', 'snmp-sysdescr', 'banner']),
+                                 (445, 'tcp', 'microsoft-ds', ['smb-os-discovery'])],
+                    '10.0.0.2': [(161, 'udp', 'snmp', ['snmp-info'])]})
+
+    def test_hosts_ports_and_scripts(self):
+        filtered = filter_nmap_xml(self.XML, ['10.0.0.1'], ['161'], ['snmp*'])
+        root = ET.fromstring(filtered)
+        hosts = root.findall("host")
+        self.assertEqual([host.find("address").get("addr") for host in hosts], ['10.0.0.1'])
+        self.assertEqual([port.get("portid") for port in hosts[0].findall("ports/port")], ['161'])
+        self.assertEqual([script.get("id") for script in hosts[0].findall("ports/port/script")],
+                         ['snmp-info', 'snmp-sysdescr'])
+        self.assertIsNotNone(root.find("runstats"))
+
+    def test_outfile(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        outfile_path = os.path.join(tmpdir, "filtered.xml")
+        self.assertEqual(filter_nmap_xml(self.XML, ['10.0.0.2'], [161], ['snmp-info'], outfile_path), outfile_path)
+        self.assertEqual(ScanIndex(outfile_path).live_hosts, ['10.0.0.2'])
+
+if __name__ == '__main__':
+    unittest.main()
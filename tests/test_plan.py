@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Tests for script scan planning (modules.plan)
+
+See README.md for licensing information and credits
+
+'''
+
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from modules.nmap import NmapResult, ScanIndex
+from modules.plan import (coalesce_jobs, collect_job_parts, port_precise_jobs, script_patterns,
+                          split_job_output)
+from modules.sections import build_section_jobs
+from tests.helpers import config_from_string, nmap_xml
+
+BASE = "-PN -sS --open"
+
+CONFIG = config_from_string('''
+[scan_config]
+script = -PN -sS --open
+
+[netBIOS - smb]
+ports = 139,445
+scripts = smb-os-discovery
+
+[smb - security]
+ports = 445
+scripts = smb-security-mode,smb2*
+
+[smb - udp]
+ports = 445
+scripts = smb-protocols
+scan_args = -sU
+
+[http]
+ports = 80,443,8080
+scripts = http-title
+
+[vuln]
+ports = 80
+scripts = vuln
+''')
+
+PORTS = {(139, 'tcp'): ['10.0.0.1'],
+         (445, 'tcp'): ['10.0.0.1', '10.0.0.2'],
+         (80, 'tcp'): ['10.0.0.3', '10.0.0.4', '10.0.0.5'],
+         (443, 'tcp'): ['10.0.0.4', '10.0.0.5']}
+
+def section_jobs():
+    return build_section_jobs(CONFIG, PORTS, report_skipped=False)
+
+class ScriptPatternsTest(unittest.TestCase):
+
+    def test_patterns(self):
+        self.assertEqual(script_patterns("banner, ftp-anon,snmp*"), ['banner', 'ftp-anon', 'snmp*'])
+
+    def test_categories_and_expressions(self):
+        self.assertIsNone(script_patterns("vuln"))
+        self.assertIsNone(script_patterns("banner,default"))
+        self.assertIsNone(script_patterns('"(default or safe) and http*"'))
+
+class CoalesceJobsTest(unittest.TestCase):
+
+    def test_overlapping_sections_merged(self):
+        jobs = {job['section']: job for job in coalesce_jobs(section_jobs(), BASE)}
+        merged = jobs['netBIOS - smb + smb - security']
+        self.assertEqual([spec['section'] for spec in merged['sections']], ['netBIOS - smb', 'smb - security'])
+        self.assertEqual(sorted(merged['targets']), ['10.0.0.1', '10.0.0.2'])
+        self.assertIn(" -p139,445 ", merged['options'])
+        self.assertIn("--script smb-os-discovery,smb-security-mode,smb2*", merged['options'])
+
+    def test_incompatible_sections_kept(self):
+        jobs = {job['section']: job for job in coalesce_jobs(section_jobs(), BASE)}
+        #different scan_args
+        self.assertEqual(len(jobs['smb - udp']['sections']), 1)
+        #script category
+        self.assertEqual(len(jobs['vuln']['sections']), 1)
+        self.assertEqual(len(jobs), 4)
+
+    def test_job_order_and_sections_preserved(self):
+        jobs = section_jobs()
+        planned = coalesce_jobs(jobs, BASE)
+        self.assertEqual(sorted(spec['section'] for job in planned for spec in job['sections']),
+                         sorted(job['section'] for job in jobs))
+        self.assertEqual(planned[-1]['section'], 'vuln')
+
+    def test_without_overlap(self):
+        jobs = [job for job in section_jobs() if job['section'] in ('netBIOS - smb', 'http')]
+        self.assertEqual(coalesce_jobs(jobs, BASE), jobs)
+
+class PortPreciseJobsTest(unittest.TestCase):
+
+    def http_job(self):
+        return [job for job in section_jobs() if job['section'] == 'http']
+
+    def test_split_by_open_ports(self):
+        job = self.http_job()[0]
+        parts = port_precise_jobs([job], PORTS)
+        self.assertEqual(sorted((part['ports'], sorted(part['targets'])) for part in parts),
+                         [('80', ['10.0.0.3']), ('80,443', ['10.0.0.4', '10.0.0.5'])])
+        for part in parts:
+            self.assertIs(part['parent'], job)
+            self.assertEqual(part['parts'], 2)
+            self.assertIn(" -p%s " % part['ports'], part['options'])
+            self.assertNotIn("8080", part['options'])
+
+    def test_unsplit_jobs_kept(self):
+        jobs = [job for job in section_jobs() if job['section'] in ('smb - security', 'vuln')]
+        self.assertEqual(port_precise_jobs(jobs, PORTS), jobs)
+        ports = {(port, 'tcp'): ['10.0.0.3'] for port in (80, 443, 8080)}
+        jobs = build_section_jobs(CONFIG, ports, report_skipped=False)
+        http = [job for job in jobs if job['section'] == 'http']
+        self.assertEqual(port_precise_jobs(http, ports), http)
+
+    def test_coalesced_job(self):
+        merged = [job for job in coalesce_jobs(section_jobs(), BASE) if len(job['sections']) > 1]
+        parts = port_precise_jobs(merged, PORTS)
+        self.assertEqual(sorted((part['ports'], part['targets']) for part in parts),
+                         [('139,445', ['10.0.0.1']), ('445', ['10.0.0.2'])])
+
+class CollectJobPartsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.job = [job for job in section_jobs() if job['section'] == 'http'][0]
+        self.parts = port_precise_jobs([self.job], PORTS)
+        self.completed = []
+        self.collect = collect_job_parts(lambda job, scan: self.completed.append((job, scan)))
+        self.scans = [NmapResult.from_xml(nmap_xml({'10.0.0.3': [(80, 'tcp', 'http')]}), command="nmap a"),
+                      NmapResult.from_xml(nmap_xml({'10.0.0.4': [(80, 'tcp', 'http'), (443, 'tcp', 'https')],
+                                                    '10.0.0.5': [(443, 'tcp', 'https')]}), command="nmap b")]
+
+    def test_parts_merged(self):
+        self.collect(self.parts[1], self.scans[1])
+        self.assertEqual(self.completed, [])
+        self.collect(self.parts[0], self.scans[0])
+        job, scan = self.completed[0]
+        self.assertIs(job, self.job)
+        self.assertTrue(scan.complete)
+        self.assertEqual(sorted(ScanIndex(scan.xml_source).live_hosts), ['10.0.0.3', '10.0.0.4', '10.0.0.5'])
+
+    def test_other_jobs_passed_through(self):
+        other = section_jobs()[0]
+        self.collect(other, self.scans[0])
+        self.assertEqual(self.completed, [(other, self.scans[0])])
+
+    def test_failed_part(self):
+        with redirect_stdout(io.StringIO()) as output:
+            self.collect(self.parts[0], None)
+            self.collect(self.parts[1], self.scans[1])
+        job, scan = self.completed[0]
+        self.assertFalse(scan.complete)
+        self.assertEqual(scan.missing, 1)
+        self.assertEqual(sorted(ScanIndex(scan.xml_source).live_hosts), ['10.0.0.4', '10.0.0.5'])
+        self.assertIn("1 of 2 port group scans failed", output.getvalue())
+
+    def test_part_error_exit(self):
+        self.scans[0].rc = 1
+        with redirect_stdout(io.StringIO()):
+            self.collect(self.parts[0], self.scans[0])
+            self.collect(self.parts[1], self.scans[1])
+        scan = self.completed[0][1]
+        self.assertEqual(scan.rc, 1)
+        self.assertFalse(scan.complete)
+
+    def test_no_part_ran(self):
+        with redirect_stdout(io.StringIO()):
+            self.collect(self.parts[0], None)
+            self.collect(self.parts[1], None)
+        self.assertEqual(self.completed, [(self.job, None)])
+
+class SplitJobOutputTest(unittest.TestCase):
+
+    def test_split_merged_output(self):
+        merged = [job for job in coalesce_jobs(section_jobs(), BASE) if len(job['sections']) > 1][0]
+        xml = nmap_xml({'10.0.0.1': [(139, 'tcp', 'netbios-ssn', ['smb-os-discovery']),
+                                     (445, 'tcp', 'microsoft-ds', ['smb-os-discovery', 'smb-security-mode',
+                                                                   'smb2-time'])],
+                        '10.0.0.2': [(445, 'tcp', 'microsoft-ds', ['smb-security-mode'])]})
+        outputs = dict(split_job_output(merged, xml))
+        self.assertEqual(sorted(outputs), ['netBIOS - smb', 'smb - security'])
+
+        netbios = ScanIndex(outputs['netBIOS - smb'])
+        self.assertEqual(sorted(netbios.hosts['10.0.0.1']), [(139, 'tcp'), (445, 'tcp')])
+        self.assertNotIn("smb-security-mode", outputs['netBIOS - smb'])
+
+        security = ScanIndex(outputs['smb - security'])
+        self.assertEqual(sorted(security.live_hosts), ['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(security.ports.get((139, 'tcp')), None)
+        self.assertIn('id="smb2-time"', outputs['smb - security'])
+        self.assertNotIn("smb-os-discovery", outputs['smb - security'])
+
+    def test_single_section_unchanged(self):
+        job = section_jobs()[0]
+        xml = nmap_xml({'10.0.0.1': [(139, 'tcp', 'netbios-ssn')]})
+        self.assertEqual(split_job_output(job, xml), [('netBIOS - smb', xml)])
+
+if __name__ == '__main__':
+    unittest.main()
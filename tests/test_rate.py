@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Tests for the packet rate budget (modules.rate)
+
+See README.md for licensing information and credits
+
+'''
+
+import asyncio
+import unittest
+
+import modules.rate
+from modules.rate import RateBudget
+
+class RateBudgetTest(unittest.TestCase):
+
+    def test_shares(self):
+        budget = RateBudget(1000)
+        self.assertEqual([budget.try_acquire(4) for number in range(4)], [250, 250, 250, 250])
+        self.assertEqual(budget.available, 0)
+        self.assertIsNone(budget.try_acquire(4))
+
+    def test_share_grows_as_scans_finish(self):
+        budget = RateBudget(1000)
+        first = budget.try_acquire(2)
+        self.assertEqual(first, 500)
+        budget.release(first)
+        self.assertEqual(budget.running, 0)
+        self.assertEqual(budget.try_acquire(1), 1000)
+
+    def test_min_share(self):
+        budget = RateBudget(100, min_share=40)
+        self.assertEqual(budget.try_acquire(10), 40)
+        self.assertEqual(budget.try_acquire(10), 40)
+        self.assertIsNone(budget.try_acquire(10))
+        budget.give_back(20)
+        self.assertEqual(budget.try_acquire(10), 40)
+
+    def test_acquire_waits(self):
+        budget = RateBudget(100, min_share=100)
+        share = budget.try_acquire()
+        self.addCleanup(setattr, modules.rate, "poll_interval", modules.rate.poll_interval)
+        modules.rate.poll_interval = 0.01
+        async def waiter():
+            asyncio.get_running_loop().call_later(0.05, budget.release, share)
+            return await budget.acquire()
+        self.assertEqual(asyncio.run(waiter()), 100)
+
+    def test_apply(self):
+        budget = RateBudget(1000)
+        self.assertEqual(budget.apply("-sS -p80", 250), ("-sS -p80 --max-rate 250", 250))
+        self.assertEqual(budget.apply("-sS --max-rate 100 -p80", 250), ("-sS -p80 --max-rate 100", 100))
+        self.assertEqual(budget.apply("-sS --max-rate=900", 250), ("-sS --max-rate 250", 250))
+
+    def test_apply_keeps_min_rate(self):
+        budget = RateBudget(1000)
+        self.assertEqual(budget.apply("-sS --min-rate 50", 250), ("-sS --max-rate 250 --min-rate 50", 250))
+        self.assertEqual(budget.apply("-sS --min-rate=500 -p80", 250), ("-sS -p80 --max-rate 250 --min-rate 250", 250))
+        self.assertEqual(budget.apply("-sS --max-rate 100 --min-rate 300", 250),
+                         ("-sS --max-rate 100 --min-rate 100", 100))
+
+    def test_apply_min_rate_fraction(self):
+        budget = RateBudget(1000, min_rate_fraction=0.5)
+        self.assertEqual(budget.apply("-sS --min-rate 50", 200), ("-sS --max-rate 200 --min-rate 100", 200))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Tests for the background HTML report renders (modules.render)
+
+See README.md for licensing information and credits
+
+'''
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import modules.render
+from tests.helpers import nmap_xml
+
+class RenderPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.addCleanup(modules.render.stop_render_pool)
+
+    def test_stop_finishes_queued_renders(self):
+        modules.render.start_render_pool(1)
+        xml = nmap_xml({'10.0.0.%d' % number: [(80, 'tcp', 'http')] for number in range(1, 200)})
+        paths = [os.path.join(self.tmpdir, "report_%d.html" % number) for number in range(20)]
+        for path in paths:
+            modules.render.render_in_background(xml, path)
+        with redirect_stdout(io.StringIO()):
+            modules.render.stop_render_pool()
+        for path in paths:
+            with open(path) as report:
+                self.assertIn("10.0.0.199", report.read())
+        self.assertEqual(modules.render.wait_for_renders(), [])
+
+    def test_stop_reports_failed_renders(self):
+        path = os.path.join(self.tmpdir, "missing", "report.html")
+        modules.render.render_in_background(nmap_xml({}), path)
+        with redirect_stdout(io.StringIO()) as output:
+            modules.render.stop_render_pool()
+        self.assertIn("Error rendering HTML report " + path, output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Tests for matching script scan sections to hosts (modules.sections)
+
+See README.md for licensing information and credits
+
+'''
+
+import unittest
+
+from modules.compact import CompactScanIndex
+from modules.core import app_path
+from modules.sections import build_section_jobs, section_protocols, section_targets
+from tests.helpers import config_from_string
+
+PORTS = {(445, 'tcp'): ['10.0.0.1'],
+         (137, 'udp'): ['10.0.0.2'],
+         (1433, 'tcp'): ['10.0.0.3'],
+         (161, 'udp'): ['10.0.0.4'],
+         (161, 'tcp'): ['10.0.0.5']}
+
+class SectionProtocolsTest(unittest.TestCase):
+
+    def test_scan_types(self):
+        self.assertEqual(section_protocols("-PN -sS -p21"), {'tcp'})
+        self.assertEqual(section_protocols("-PN -sS --open -sU -p161"), {'tcp', 'udp'})
+        self.assertEqual(section_protocols("-sY -p80"), {'sctp'})
+
+    def test_default_tcp(self):
+        self.assertEqual(section_protocols("-PN -p21"), {'tcp'})
+        self.assertEqual(section_protocols("-PN -sV -p21"), {'tcp'})
+
+class SectionTargetsTest(unittest.TestCase):
+
+    def test_protocol_aware(self):
+        self.assertEqual(section_targets("161", PORTS, {'udp'}), ['10.0.0.4'])
+        self.assertEqual(sorted(section_targets("161", PORTS, {'tcp', 'udp'})), ['10.0.0.4', '10.0.0.5'])
+        self.assertEqual(sorted(section_targets("161", PORTS)), ['10.0.0.4', '10.0.0.5'])
+
+    def test_union_without_duplicates(self):
+        ports = {(80, 'tcp'): ['10.0.0.1', '10.0.0.2'], (443, 'tcp'): ['10.0.0.2', '10.0.0.3']}
+        self.assertEqual(sorted(section_targets("80,443,8080", ports, {'tcp'})), ['10.0.0.1', '10.0.0.2', '10.0.0.3'])
+
+    def test_compact_index(self):
+        compact = CompactScanIndex()
+        for (port, protocol), hosts in PORTS.items():
+            for host in hosts:
+                compact.add_host(host, [(port, protocol)])
+        for config_ports in ("161", "137,139,445", "1433,1434"):
+            self.assertEqual(sorted(section_targets(config_ports, compact.ports, {'tcp', 'udp'})),
+                             sorted(section_targets(config_ports, PORTS, {'tcp', 'udp'})))
+
+class ExampleConfigTest(unittest.TestCase):
+    '''Sections in the shipped example config which add -sU to the base -sS scan'''
+
+    def setUp(self):
+        with open(app_path("config", "default.example")) as config_file:
+            self.config = config_from_string(config_file.read())
+        self.jobs = {job['section']: job for job in build_section_jobs(self.config, PORTS, report_skipped=False)}
+
+    def test_udp_sections_match_tcp_ports(self):
+        #nmap runs these with -sS -sU, so hosts with only the TCP port open are scanned too
+        self.assertEqual(self.jobs['smb']['targets'], ['10.0.0.1'])
+        self.assertEqual(sorted(self.jobs['netBIOS - nbstat']['targets']), ['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(self.jobs['mssql']['targets'], ['10.0.0.3'])
+
+    def test_snmp(self):
+        self.assertEqual(sorted(self.jobs['snmp']['targets']), ['10.0.0.4', '10.0.0.5'])
+
+    def test_job_options(self):
+        job = self.jobs['smb']
+        self.assertIn(" -sU", job['options'])
+        self.assertIn(" -p139,445", job['options'])
+        self.assertEqual(job['sections'][0]['targets'], job['targets'])
+
+    def test_sections_without_hosts_skipped(self):
+        self.assertNotIn('ftp', self.jobs)
+
+if __name__ == '__main__':
+    unittest.main()
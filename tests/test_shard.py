@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+'''
+@author: Matthew C. Jones, CPA, CISA, OSCP
+Symphona LLP
+
+Tests for splitting scans into target shards (modules.shard)
+
+See README.md for licensing information and credits
+
+'''
+
+import unittest
+
+from modules.nmap import NmapResult, ScanIndex
+from modules.shard import merge_shard_results, shard_jobs, shard_options, split_targets
+from tests.helpers import nmap_xml
+
+class SplitTargetsTest(unittest.TestCase):
+
+    def test_cidr(self):
+        self.assertEqual(split_targets("10.0.0.0/23", 2), [['10.0.0.0/24'], ['10.0.1.0/24']])
+        self.assertEqual(split_targets("10.0.0.0/24", 3),
+                         [['10.0.0.0/26'], ['10.0.0.64/26', '10.0.0.128/26'], ['10.0.0.192/26']])
+
+    def test_last_octet_range(self):
+        self.assertEqual(split_targets("192.168.0.1-254", 2), [['192.168.0.1-127'], ['192.168.0.128-254']])
+        self.assertEqual(split_targets("192.168.0.1-2", 4), [['192.168.0.1'], ['192.168.0.2']])
+
+    def test_host_lists(self):
+        hosts = ["10.0.0.%d" % number for number in range(1, 7)]
+        self.assertEqual(split_targets(hosts, 3), [hosts[0:2], hosts[2:4], hosts[4:6]])
+        self.assertEqual(split_targets(" ".join(hosts), 2), [hosts[0:3], hosts[3:6]])
+
+    def test_unsplittable(self):
+        self.assertEqual(split_targets("scanme.nmap.org", 4), [['scanme.nmap.org']])
+        self.assertEqual(split_targets("10.0.0.0/24", 1), [['10.0.0.0/24']])
+
+    def test_weighted_by_address_count(self):
+        shards = split_targets("10.0.0.0/24 10.0.1.1 10.0.1.2", 2)
+        self.assertEqual(shards[-1][-2:], ['10.0.1.1', '10.0.1.2'])
+        self.assertEqual(sum(len(shard) for shard in shards), 4)
+
+class ShardJobsTest(unittest.TestCase):
+
+    def test_jobs(self):
+        jobs = shard_jobs("10.0.0.0/23", "-sS --min-hostgroup 64", 2, min_hostgroup=128, label="enum")
+        self.assertEqual([job['section'] for job in jobs], ['enum shard 1/2', 'enum shard 2/2'])
+        self.assertEqual(jobs[1]['targets'], ['10.0.1.0/24'])
+        self.assertEqual(jobs[0]['options'], "-sS --min-hostgroup 128")
+
+    def test_single_job(self):
+        self.assertEqual(shard_jobs("10.0.0.1", "-sS", 4),
+                         [{'section': 'scan', 'targets': '10.0.0.1', 'options': '-sS'}])
+
+    def test_options(self):
+        self.assertEqual(shard_options("-sS", None), "-sS")
+        self.assertEqual(shard_options("-sS", 32), "-sS --min-hostgroup 32")
+
+class MergeShardResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs = shard_jobs("10.0.0.0/23", "-sS", 2)
+        self.results = {
+            self.jobs[0]['section']: NmapResult.from_xml(nmap_xml({'10.0.0.1': [(80, 'tcp', 'http')]}),
+                                                         command="nmap 1", elapsed=2.0),
+            self.jobs[1]['section']: NmapResult.from_xml(nmap_xml({'10.0.1.1': [(22, 'tcp', 'ssh')]}),
+                                                         command="nmap 2", elapsed=3.0),
+        }
+
+    def test_all_shards(self):
+        merged = merge_shard_results(self.jobs, self.results)
+        self.assertTrue(merged.complete)
+        self.assertEqual(merged.elapsed, 5.0)
+        self.assertEqual(merged.command, "nmap 1\nnmap 2")
+        self.assertEqual(ScanIndex(merged.xml_source).live_hosts, ['10.0.0.1', '10.0.1.1'])
+
+    def test_missing_shard(self):
+        del self.results[self.jobs[1]['section']]
+        merged = merge_shard_results(self.jobs, self.results)
+        self.assertEqual(merged.missing, 1)
+        self.assertFalse(merged.complete)
+        self.assertEqual(merged.summary, "1 of 2 shards completed")
+        self.assertEqual(ScanIndex(merged.xml_source).live_hosts, ['10.0.0.1'])
+
+    def test_single_job(self):
+        jobs = shard_jobs("10.0.0.1", "-sS", 1)
+        scan = NmapResult.from_xml(nmap_xml({'10.0.0.1': []}))
+        self.assertIs(merge_shard_results(jobs, {'scan': scan}), scan)
+
+if __name__ == '__main__':
+    unittest.main()